@@ -6,68 +6,491 @@
 #     "utz",
 # ]
 # ///
-from os import cpu_count
-
 import json
+import os
+import re
+import subprocess
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from itertools import combinations
+from os.path import basename, dirname, exists, expanduser, isdir, join, normpath, relpath
+from typing import BinaryIO, Iterable, Iterator, NamedTuple, Optional
 
 import click
 from utz import process, err
 
+# `conda list --json` output of each image, keyed by image ID (digest)
+CACHE_DIR = os.environ.get('CONDA_LIST_CACHE_DIR') or join(
+    os.environ.get('XDG_CACHE_HOME') or expanduser('~/.cache'),
+    'py-helpers',
+    'conda-list',
+)
+
+
+# Files (within image layers) needed to reconstruct `conda list --json`
+LAYER_FILE_RGX = re.compile(r'(?:^|/)(?:conda-meta/[^/]+\.json|site-packages/[^/]+\.dist-info/METADATA)$')
+CHANNEL_ALIAS = 'https://conda.anaconda.org'
+SUBDIRS = {
+    'noarch', 'emscripten-wasm32', 'wasi-wasm32', 'freebsd-64', 'linux-32', 'linux-64', 'linux-aarch64',
+    'linux-armv6l', 'linux-armv7l', 'linux-ppc64', 'linux-ppc64le', 'linux-riscv64', 'linux-s390x', 'osx-64',
+    'osx-arm64', 'win-32', 'win-64', 'win-arm64', 'zos-z',
+}
+
+
+class LayerDelta(NamedTuple):
+    """Relevant contents of one image layer: added files, and whiteouts (deletions of lower layers' paths)."""
+    files: dict[str, bytes]
+    whiteouts: set[str]
+    opaque_dirs: set[str]
+
+
+def read_layer(fd: BinaryIO) -> LayerDelta:
+    files, whiteouts, opaque_dirs = {}, set(), set()
+    with tarfile.open(fileobj=fd, mode='r|*') as tf:
+        for member in tf:
+            path = normpath(member.name).lstrip('/')
+            parent, name = dirname(path), basename(path)
+            if name == '.wh..wh..opq':
+                opaque_dirs.add(parent)
+            elif name.startswith('.wh.'):
+                whiteouts.add(join(parent, name[len('.wh.'):]))
+            elif member.isfile() and LAYER_FILE_RGX.search(path):
+                files[path] = tf.extractfile(member).read()
+    return LayerDelta(files, whiteouts, opaque_dirs)
+
+
+def tar_members(path: Optional[str] = None, fileobj: Optional[BinaryIO] = None) -> Iterator[tuple[str, BinaryIO]]:
+    with tarfile.open(name=path, fileobj=fileobj, mode='r|*') as tf:
+        for member in tf:
+            if member.isfile():
+                yield normpath(member.name), tf.extractfile(member)
+
+
+def dir_members(path: str) -> Iterator[tuple[str, BinaryIO]]:
+    for root, _, names in os.walk(path):
+        for name in names:
+            with open(join(root, name), 'rb') as fd:
+                yield relpath(join(root, name), path), fd
+
+
+def scan_archive(members: Iterable[tuple[str, BinaryIO]]) -> tuple[dict, dict[str, LayerDelta]]:
+    """Split an image archive's files into JSON metadata (manifests, configs) and (parsed) layers.
+
+    Handles `docker save` tarballs and OCI layouts in one streaming pass, regardless of member order.
+    """
+    meta, layers = {}, {}
+    for name, fd in members:
+        head = fd.peek(1)[:1]
+        if head in (b'{', b'['):
+            meta[name] = json.load(fd)
+        elif head:
+            try:
+                layers[name] = read_layer(fd)
+            except tarfile.ReadError as e:
+                err(f'Skipping unreadable blob {name}: {e}')
+    return meta, layers
+
+
+def blob_name(digest: str) -> str:
+    return join('blobs', *digest.split(':', 1))
+
+
+def resolve_image(meta: dict) -> tuple[str, dict, list[str]]:
+    """Find an archive's image ID, config, and layer names (bottom to top)."""
+    if 'manifest.json' in meta:
+        # `docker save` format
+        [entry, *rest] = meta['manifest.json']
+        if rest:
+            err(f'Archive contains {len(rest) + 1} images; using the first ({entry.get("RepoTags")})')
+        config_name = entry['Config']
+        layer_names = entry['Layers']
+        img_id = f'sha256:{basename(config_name).removesuffix(".json")}'
+    else:
+        # OCI layout
+        manifest = meta['index.json']
+        while 'manifests' in manifest:
+            descs = manifest['manifests']
+            desc = next(
+                (
+                    d for d in descs
+                    if d.get('platform', {}).get('os') == 'linux' and d['platform'].get('architecture') == 'amd64'
+                ),
+                descs[0],
+            )
+            manifest = meta[blob_name(desc['digest'])]
+        img_id = manifest['config']['digest']
+        config_name = blob_name(img_id)
+        layer_names = [ blob_name(layer['digest']) for layer in manifest['layers'] ]
+    return img_id, meta.get(config_name, {}), [ normpath(name) for name in layer_names ]
+
+
+def archive_image_id(path: str) -> Optional[str]:
+    """Read an image archive's ID without scanning its layers (`None` if it can't be determined)."""
+    try:
+        with ExitStack() as stack:
+            if isdir(path):
+                names = { name: name for name in ['manifest.json', 'index.json'] if exists(join(path, name)) }
+                def load(name):
+                    with open(join(path, name)) as f:
+                        return json.load(f)
+            else:
+                tf = stack.enter_context(tarfile.open(path))
+                # Member names may be `./`-prefixed
+                names = { normpath(name): name for name in tf.getnames() }
+                def load(name):
+                    with tf.extractfile(names[normpath(name)]) as f:
+                        return json.load(f)
+            if 'manifest.json' in names:
+                meta = { 'manifest.json': load('manifest.json') }
+            else:
+                # OCI layout (directory or tarball): load (nested) indexes and manifests, for `resolve_image` to choose from
+                meta = { 'index.json': load('index.json') }
+                pending = [ meta['index.json'] ]
+                while pending:
+                    for desc in pending.pop().get('manifests', []):
+                        name = blob_name(desc['digest'])
+                        meta[name] = load(name)
+                        pending.append(meta[name])
+        img_id, _, _ = resolve_image(meta)
+        return img_id
+    except (OSError, KeyError, ValueError, tarfile.TarError):
+        return None
+
+
+def overlay(deltas: Iterable[LayerDelta]) -> dict[str, bytes]:
+    """Apply layers (bottom to top), honoring whiteouts, to get the image's final files."""
+    def hidden(path, delta):
+        while path:
+            parent = dirname(path)
+            if path in delta.whiteouts or parent in delta.opaque_dirs:
+                return True
+            path = parent
+        return False
+
+    files = {}
+    for delta in deltas:
+        if delta.whiteouts or delta.opaque_dirs:
+            files = { path: data for path, data in files.items() if not hidden(path, delta) }
+        files.update(delta.files)
+    return files
+
+
+def channel_fields(channel: Optional[str], url: Optional[str]) -> tuple[str, str]:
+    """Compute `conda list --json`'s `base_url` and `channel` (name) fields from a `conda-meta` record's channel URL."""
+    if not channel and url:
+        channel = dirname(url)
+    channel = (channel or '').rstrip('/')
+    if '://' not in channel:
+        return f'{CHANNEL_ALIAS}/{channel}', channel
+    head, _, last = channel.rpartition('/')
+    if last in SUBDIRS:
+        channel = head
+    name = channel.split('://', 1)[1].partition('/')[2]
+    return channel, name
+
+
+def conda_list_entry(record: dict) -> dict:
+    """Convert a `conda-meta/*.json` record to a `conda list --json` entry (mirroring conda's `dist_fields_dump`)."""
+    base_url, channel = channel_fields(record.get('channel'), record.get('url'))
+    name, version, build = record['name'], record['version'], record['build']
+    subdir = record.get('subdir') or (basename(dirname(record['url'])) if record.get('url') else None)
+    return dict(
+        base_url=base_url,
+        build_number=record.get('build_number', 0),
+        build_string=build,
+        channel=channel,
+        dist_name=f'{name}-{version}-{build}',
+        name=name,
+        platform=subdir,
+        version=version,
+    )
+
+
+def pypi_entry(metadata: bytes) -> Optional[dict]:
+    """`conda list --json` entry for a pip-installed (`.dist-info`) package, as conda reports them."""
+    headers = {}
+    for line in metadata.decode('utf-8', 'replace').splitlines():
+        if not line.strip():
+            break
+        key, sep, value = line.partition(':')
+        if sep and key in ('Name', 'Version'):
+            headers.setdefault(key, value.strip())
+    if 'Name' not in headers or 'Version' not in headers:
+        return None
+    name = headers['Name'].replace('.', '-').replace('_', '-').lower()
+    version = headers['Version']
+    return dict(
+        base_url=f'{CHANNEL_ALIAS}/pypi',
+        build_number=0,
+        build_string='pypi_0',
+        channel='pypi',
+        dist_name=f'{name}-{version}-pypi_0',
+        name=name,
+        platform='pypi',
+        version=version,
+    )
+
+
+def files_conda_list(files: dict[str, bytes], env: Iterable[str] = (), prefix: Optional[str] = None) -> list[dict]:
+    """Reconstruct `conda list --json` from an image's `conda-meta/*.json` (and `site-packages/*.dist-info`) files.
+
+    The listed prefix is `prefix`, else the image's `$CONDA_PREFIX`, else the prefix where conda itself is installed.
+    """
+    prefixes = {}
+    for path, data in files.items():
+        head, sep, _ = f'/{path}'.rpartition('/conda-meta/')
+        if sep:
+            prefixes.setdefault(head or '/', {})[path] = data
+    if not prefix:
+        env_vars = dict( var.split('=', 1) for var in env if '=' in var )
+        prefix = env_vars.get('CONDA_PREFIX')
+    if not prefix:
+        roots = sorted(
+            (
+                pfx for pfx, meta in prefixes.items()
+                if any( basename(path).startswith('conda-') and json.loads(data).get('name') == 'conda' for path, data in meta.items() )
+            ),
+            key=len,
+        )
+        if roots:
+            prefix = roots[0]
+        elif len(prefixes) == 1:
+            [prefix] = prefixes
+    if not prefix or prefix.rstrip('/') not in prefixes and prefix not in prefixes:
+        raise ValueError(f'No conda prefix found (candidates: {sorted(prefixes)})')
+    prefix = prefix.rstrip('/') or '/'
+
+    records = [ json.loads(data) for data in prefixes[prefix].values() ]
+    entries = { record['name']: conda_list_entry(record) for record in records }
+
+    python = next(( record for record in records if record['name'] == 'python' ), None)
+    if python:
+        major_minor = '.'.join(python['version'].split('.')[:2])
+        site_packages = f'lib/python{major_minor}/site-packages'
+        conda_anchors = {
+            path
+            for record in records
+            for path in record.get('files', [])
+            if path.startswith(f'{site_packages}/') and path.endswith('.dist-info/RECORD')
+        }
+        root = prefix.strip('/')
+        sp_dir = f'{root}/{site_packages}' if root else site_packages
+        for path, data in files.items():
+            if dirname(dirname(path)) != sp_dir or not path.endswith('.dist-info/METADATA'):
+                continue
+            anchor = f'{site_packages}/{basename(dirname(path))}/RECORD'
+            if anchor not in conda_anchors and (entry := pypi_entry(data)):
+                entries[entry['name']] = entry
+
+    return sorted(entries.values(), key=lambda entry: entry['name'])
+
+
+def archive_conda_list(members: Iterable[tuple[str, BinaryIO]], prefix: Optional[str] = None) -> list[dict]:
+    """`conda list --json` for an image archive, read from its layers (no container, or daemon, needed)."""
+    meta, layers = scan_archive(members)
+    _, config, layer_names = resolve_image(meta)
+    missing = [ name for name in layer_names if name not in layers ]
+    if missing:
+        raise ValueError(f'Unreadable layers: {missing}')
+    env = config.get('config', {}).get('Env') or []
+    return files_conda_list(overlay( layers[name] for name in layer_names ), env=env, prefix=prefix)
+
+
+def saved_conda_list(img: str, prefix: Optional[str] = None) -> list[dict]:
+    """`archive_conda_list`, streaming the archive from `docker save` (no container is started)."""
+    proc = subprocess.Popen(['docker', 'save', img], stdout=subprocess.PIPE)
+    try:
+        deps = archive_conda_list(tar_members(fileobj=proc.stdout), prefix=prefix)
+    finally:
+        proc.stdout.close()
+        returncode = proc.wait()
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, ['docker', 'save', img])
+    return deps
+
+
+def image_id(img):
+    """Resolve an image reference (or archive path) to its (content-addressed) ID, or `None` if it isn't available locally."""
+    if exists(img):
+        return archive_image_id(img)
+    result = subprocess.run(
+        ['docker', 'image', 'inspect', '--format', '{{.Id}}', img],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip() or None
+
+
+def docker_conda_list(img, verbose=False):
+    kwargs = {} if verbose else { 'log': lambda _: None }
+    return process.json('docker', 'run', '--rm', '--entrypoint', 'conda', img, 'list', '--json', **kwargs)
+
+
+def conda_list(img, layers=False, prefix=None, verbose=False):
+    """List an image's conda packages.
+
+    Archive paths (`docker save` tarballs, OCI layouts) are read from their layers; image references use `docker run`,
+    or (with `layers`) `docker save`, falling back to `docker run` if that fails.
+    """
+    if exists(img):
+        members = dir_members(img) if isdir(img) else tar_members(path=img)
+        return archive_conda_list(members, prefix=prefix)
+    if layers:
+        try:
+            return saved_conda_list(img, prefix=prefix)
+        except (KeyError, ValueError, tarfile.TarError, subprocess.CalledProcessError) as e:
+            err(f'{img}: falling back to `docker run` ({e!r})')
+    return docker_conda_list(img, verbose=verbose)
+
+
+def cached_conda_list(img, img_id, cache=True, layers=False, prefix=None, verbose=False):
+    """`conda_list`, memoized on disk by image ID (when known)."""
+    cache_path = join(CACHE_DIR, f'{img_id.replace(":", "-")}.json') if cache and img_id and not prefix else None
+    if cache_path and exists(cache_path):
+        with open(cache_path, 'r') as f:
+            return json.load(f)
+    deps = conda_list(img, layers=layers, prefix=prefix, verbose=verbose)
+    if cache_path:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(deps, f)
+        os.replace(tmp_path, cache_path)
+    return deps
+
+
+def list_images(imgs, jobs, cache=True, layers=False, prefix=None, verbose=False):
+    """Map each image to its `conda list --json` output.
+
+    Images are resolved to IDs first, so tags sharing an image (and images listed on a previous run) are only listed
+    once; the remaining `docker run`s happen concurrently, at most `jobs` at a time.
+    """
+    with ThreadPoolExecutor(jobs) as executor:
+        img_ids = dict(zip(imgs, executor.map(image_id, imgs)))
+        # One listing per distinct image ID (images that aren't available locally are keyed by name, and pulled)
+        reps = {}
+        for img in imgs:
+            reps.setdefault(img_ids[img] or img, img)
+
+        def list_rep(img):
+            return cached_conda_list(img, img_ids[img], cache=cache, layers=layers, prefix=prefix, verbose=verbose)
+
+        listings = dict(zip(reps.keys(), executor.map(list_rep, reps.values())))
+    return { img: listings[img_ids[img] or img] for img in imgs }
+
+
+# Change categories, and the `conda list` fields that determine each (a package whose version changed is categorized as
+# "version", even if its build and channel changed too)
+ADDED = 'added'
+REMOVED = 'removed'
+CHANGE_FIELDS = {
+    'version': ('version',),
+    'build': ('build_string', 'build_number', 'platform'),
+    'channel': ('channel', 'base_url'),
+}
+CHANGES = [ ADDED, REMOVED, *CHANGE_FIELDS ]
+# Columns emitted by `-f columns` (`before_`/`after_`-prefixed, besides `name` and `change`)
+COLUMN_FIELDS = ('version', 'build_string', 'channel')
+
+
+def change_kind(before_dep: dict, after_dep: dict) -> Optional[str]:
+    for kind, fields in CHANGE_FIELDS.items():
+        if any( before_dep.get(field) != after_dep.get(field) for field in fields ):
+            return kind
+    return None
+
+
+def compute_diffs(before_deps: list[dict], after_deps: list[dict]) -> Iterator[dict]:
+    """Yield `{name, change, before, after}` for each package added, removed, or changed (sorted by name).
+
+    `before` is `None` for added packages, `after` for removed ones.
+    """
+    before_map = { dep['name']: dep for dep in before_deps }
+    after_map = { dep['name']: dep for dep in after_deps }
+    for name in sorted(before_map.keys() | after_map.keys()):
+        before_dep = before_map.get(name)
+        after_dep = after_map.get(name)
+        if before_dep is None:
+            change = ADDED
+        elif after_dep is None:
+            change = REMOVED
+        else:
+            change = change_kind(before_dep, after_dep)
+            if not change:
+                continue
+        yield dict(name=name, change=change, before=before_dep, after=after_dep)
+
+
+def diff_columns(rows: Iterable[tuple[str, str, dict]]) -> dict[str, list]:
+    """Transpose `(before_img, after_img, diff)`s into a dict of columns (e.g. for loading into a dataframe)."""
+    columns = { col: [] for col in [ 'before_img', 'after_img', 'name', 'change' ] }
+    for side in [ 'before', 'after' ]:
+        for field in COLUMN_FIELDS:
+            columns[f'{side}_{field}'] = []
+    for before_img, after_img, diff in rows:
+        columns['before_img'].append(before_img)
+        columns['after_img'].append(after_img)
+        columns['name'].append(diff['name'])
+        columns['change'].append(diff['change'])
+        for side in [ 'before', 'after' ]:
+            dep = diff[side] or {}
+            for field in COLUMN_FIELDS:
+                columns[f'{side}_{field}'].append(dep.get(field))
+    return columns
+
 
 @click.command()
 @click.option('-a', '--after-specs', is_flag=True)
 @click.option('-b', '--before-specs', is_flag=True)
 @click.option('-c', '--compact-json', is_flag=True)
 @click.option('-d', '--diff-specs', is_flag=True)
-@click.option('-p', '--parallel', is_flag=True, help="Parallelize `docker run`s with `joblib`")
+@click.option('-f', '--format', 'fmt', type=click.Choice(['json', 'jsonl', 'columns']), default='json', help="Output format: JSON list of diffs (per image pair, with >2 images), one JSON diff per line (streamed; with before_img/after_img), or a JSON object of columns")
+@click.option('-j', '--jobs', type=int, default=4, help="Max concurrent `docker run`s (default: 4)")
+@click.option('-k', '--change', 'changes', multiple=True, type=click.Choice(CHANGES), help="Only report these kinds of changes (repeatable; default: all)")
+@click.option('-L', '--layers', is_flag=True, help="Read image references' conda metadata from `docker save` output instead of starting containers (falls back to `docker run`)")
+@click.option('-m', '--matrix', is_flag=True, help="With >2 images, diff every pair (default: consecutive pairs)")
+@click.option('--no-cache', is_flag=True, help=f"Don't read or write cached `conda list` outputs (in {CACHE_DIR})")
+@click.option('-p', '--parallel', is_flag=True, help="Deprecated no-op: `docker run`s are always concurrent (see -j/--jobs)")
+@click.option('-P', '--prefix', help="Conda prefix to list, when reading image layers (default: $CONDA_PREFIX from the image config, else the prefix containing conda itself)")
 @click.option('-s', '--short', count=True)
 @click.option('-v', '--verbose', is_flag=True)
-@click.argument('before_img')
-@click.argument('after_img')
-def main(after_specs, before_specs, compact_json, diff_specs, parallel, short, verbose, before_img, after_img):
+@click.argument('imgs', nargs=-1, required=True)
+def main(after_specs, before_specs, compact_json, diff_specs, fmt, jobs, changes, layers, matrix, no_cache, parallel, prefix, short, verbose, imgs):
+    """Diff the conda packages installed in Docker images.
+
+    Each package that was added, removed, or whose version, build, or channel changed is reported, with its "before"
+    and "after" `conda list` entries (`null` for added / removed packages).
+
+    With two IMGS, diff them; with more, diff each consecutive pair (e.g. a release train of tags), or every pair
+    (-m/--matrix).
+
+    IMGS can also be paths to `docker save` tarballs or OCI layout directories, whose layers are read directly (no
+    container, or Docker daemon, needed).
+    """
     if sum(1 if spec_fmt else 0 for spec_fmt in [ after_specs, before_specs, diff_specs ]) > 1:
         raise ValueError("Pass at most one of {-a/--after-specs,-b/--before-specs,-d/--diff-specs}")
+    if len(imgs) < 2:
+        raise click.UsageError("Pass at least two images")
+    if parallel:
+        err("-p/--parallel is deprecated, and has no effect: `docker run`s are always concurrent (see -j/--jobs)")
 
-    def docker_conda_list(img):
-        kwargs = {} if verbose else { 'log': lambda _: None }
-        deps = process.json('docker', 'run', '--rm', '--entrypoint', 'conda', img, 'list', '--json', **kwargs)
-        if short:
-            return [
-                {
-                    k: v
-                    for k, v in dep.items()
-                    if k in { 'name', 'version', 'build_string', 'channel' }
-                }
-                for dep in deps
-            ]
+    def trim(dep):
+        if short and dep:
+            return { k: v for k, v in dep.items() if k in { 'name', 'version', 'build_string', 'channel' } }
         else:
-            return deps
+            return dep
 
-    before_deps = after_deps = None
-    if parallel:
-        try:
-            from joblib import Parallel, delayed
-            parallel = Parallel(cpu_count())
-            fn = delayed(docker_conda_list)
-            before_deps, after_deps = parallel(fn(img) for img in [ before_img, after_img ])
-        except ImportError:
-            pass
-    if before_deps is None:
-        before_deps = docker_conda_list(before_img)
-        after_deps = docker_conda_list(after_img)
-    after_deps_map = { dep['name']: dep for dep in after_deps }
-
-    diffs = []
-    for before_dep in before_deps:
-        name = before_dep['name']
-        if name in after_deps_map:
-            after_dep = after_deps_map[name]
-            if before_dep != after_dep:
-                diffs.append(dict(
-                    name=name,
-                    before=before_dep,
-                    after=after_dep,
-                ))
+    listings = list_images(
+        list(dict.fromkeys(imgs)),
+        jobs,
+        cache=not no_cache,
+        layers=layers,
+        prefix=prefix,
+        verbose=verbose,
+    )
 
     def build_string(dep):
         spec = f'{dep["name"]}=={dep["version"]}'
@@ -80,23 +503,49 @@ def main(after_specs, before_specs, compact_json, diff_specs, parallel, short, v
         else:
             raise ValueError(f'-s/--short should be 0, 1, or 2')
 
-    if diff_specs:
-        for diff in diffs:
-            before = diff['before']
-            after = diff['after']
-            before_str = build_string(before)
-            after_str = build_string(after)
-            if before_str == after_str:
-                err(f"{before_str} == {after_str}: {before}, {after}")
-            print(f'-{before_str}')
-            print(f'+{after_str}')
-    elif before_specs:
-        print(" ".join(build_string(diff['before']) for diff in diffs))
-    elif after_specs:
-        print(" ".join(build_string(diff['after']) for diff in diffs))
-    else:
-        json_kwargs = {} if compact_json else { 'indent': 2 }
-        print(json.dumps(diffs, **json_kwargs))
+    pairs = list(combinations(imgs, 2)) if matrix else list(zip(imgs, imgs[1:]))
+    multi = len(pairs) > 1
+    json_kwargs = {} if compact_json else { 'indent': 2 }
+    results = []
+    rows = []
+    for before_img, after_img in pairs:
+        # Diff full listings (changes can be in fields -s/--short drops), then trim the records that are output
+        diffs = compute_diffs(listings[before_img], listings[after_img])
+        if changes:
+            diffs = ( diff for diff in diffs if diff['change'] in changes )
+        diffs = ( dict(diff, before=trim(diff['before']), after=trim(diff['after'])) for diff in diffs )
+        if diff_specs or before_specs or after_specs:
+            diffs = list(diffs)
+            if multi:
+                print(f'# {before_img} → {after_img}')
+            if diff_specs:
+                for diff in diffs:
+                    before = diff['before']
+                    after = diff['after']
+                    before_str = before and build_string(before)
+                    after_str = after and build_string(after)
+                    if before_str == after_str:
+                        err(f"{before_str} == {after_str}: {before}, {after}")
+                    if before_str:
+                        print(f'-{before_str}')
+                    if after_str:
+                        print(f'+{after_str}')
+            elif before_specs:
+                print(" ".join(build_string(diff['before']) for diff in diffs if diff['before']))
+            elif after_specs:
+                print(" ".join(build_string(diff['after']) for diff in diffs if diff['after']))
+        elif fmt == 'jsonl':
+            for diff in diffs:
+                print(json.dumps(dict(before_img=before_img, after_img=after_img, **diff)), flush=True)
+        elif fmt == 'columns':
+            rows.extend( (before_img, after_img, diff) for diff in diffs )
+        else:
+            results.append(dict(before_img=before_img, after_img=after_img, diffs=list(diffs)))
+
+    if fmt == 'columns' and not (diff_specs or before_specs or after_specs):
+        print(json.dumps(diff_columns(rows), **json_kwargs))
+    elif results:
+        print(json.dumps(results if multi else results[0]['diffs'], **json_kwargs))
 
 
 if __name__ == '__main__':
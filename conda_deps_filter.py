@@ -6,57 +6,568 @@
 #     "utz",
 # ]
 # ///
+"""Inspect the dependencies of conda package builds matching one or more specs.
+
+Builds are found via `conda search --json`, or (with `-r/--repodata` / `-p/--pkgs-cache`) from local `repodata.json`
+files, which are indexed by package name into a SQLite cache once (per channel and repodata ETag / mtime), so later
+queries only load the packages they ask about. Specs the index can't answer run `conda search`, concurrently, and those
+results are cached too (until conda's own repodata cache changes, or `$CONDA_SEARCH_CACHE_TTL` seconds pass).
+"""
 import json
+import operator
+import os
+import re
+import sqlite3
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatchcase, translate
+from functools import total_ordering
+from itertools import zip_longest
+from os.path import abspath, basename, dirname, exists, expanduser, isdir, join
+from typing import Callable, Iterator, NamedTuple, Optional
 
 import click
-from utz import process, singleton
+from utz import process, err
+
+CACHE_PATH = os.environ.get('CONDA_SEARCH_CACHE_PATH') or join(
+    os.environ.get('XDG_CACHE_HOME') or expanduser('~/.cache'),
+    'py-helpers',
+    'conda-search.sqlite',
+)
+SEARCH_TTL = float(os.environ.get('CONDA_SEARCH_CACHE_TTL') or 24 * 60 * 60)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS repodata (
+    url TEXT PRIMARY KEY,
+    version TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS packages (
+    url TEXT NOT NULL,
+    name TEXT NOT NULL,
+    records TEXT NOT NULL,
+    PRIMARY KEY (url, name)
+);
+CREATE INDEX IF NOT EXISTS packages_name ON packages (name);
+CREATE TABLE IF NOT EXISTS searches (
+    key TEXT PRIMARY KEY,
+    result TEXT NOT NULL,
+    time REAL NOT NULL
+);
+'''
+
+# Subset of conda's version / MatchSpec grammar (`conda.models.version`, `conda.models.match_spec`)
+VERSION_CHECK_RGX = re.compile(r'^[*.+!_0-9a-z]+$')
+VERSION_SPLIT_RGX = re.compile(r'([0-9]+|[*]+|[^0-9*]+)')
+VERSION_RELATION_RGX = re.compile(r'^(=|==|!=|<=|>=|<|>|~=)(?![=<>!~])(\S+)$')
+VERSION_PLUS_BUILD_RGX = re.compile(r'((?:.+?)[^><!,|]?)(?:(?<![=!|,<>~])(?:[ =])([^-=,|<>~]+?))?$')
+SPEC_NAME_RGX = re.compile(r'([^ =<>!~]+)?([><!=~ ].+)?')
+REPODATA_URL_RGX = re.compile(rb'"_url":\s*"([^"]*)"')
+REPODATA_VERSION_RGX = re.compile(rb'"_(?:etag|mod)":\s*"([^"]*)"')
+
+
+class UnsupportedSpec(ValueError):
+    """Spec syntax that only `conda search` itself handles (e.g. `pkg[version=...]`, parenthesized version specs)."""
+
+
+@total_ordering
+class Version:
+    """Conda's version ordering (`VersionOrder`): "1.1" == "1.1.0", "1.1a" < "1.1", "1.1.dev" < "1.1a", etc."""
+
+    def __init__(self, vstr: str):
+        version = vstr.strip().lower()
+        if not VERSION_CHECK_RGX.match(version) and '-' in version and '_' not in version:
+            version = version.replace('-', '_')
+        if not VERSION_CHECK_RGX.match(version):
+            raise ValueError(f'Invalid version: {vstr!r}')
+        self.norm = version
+        epoch, _, version = version.rpartition('!')
+        version, _, local = version.partition('+')
+        if not version:
+            raise ValueError(f'Invalid version: {vstr!r}')
+        if version[-1] == '_':
+            segments = version[:-1].replace('_', '.').split('.')
+            segments[-1] += '_'
+        else:
+            segments = version.replace('_', '.').split('.')
+        self.version = [ self.components(segment, vstr) for segment in [ epoch or '0', *segments ] ]
+        self.local = [ self.components(segment, vstr) for segment in local.replace('_', '.').split('.') ] if local else []
+
+    @staticmethod
+    def components(segment: str, vstr: str) -> list:
+        parts = VERSION_SPLIT_RGX.findall(segment)
+        if not parts:
+            raise ValueError(f'Invalid version: {vstr!r}')
+        parts = [
+            int(part) if part.isdigit() else float('inf') if part == 'post' else 'DEV' if part == 'dev' else part
+            for part in parts
+        ]
+        return parts if segment[0].isdigit() else [ 0, *parts ]
+
+    @staticmethod
+    def _eq(t1: list, t2: list) -> bool:
+        return all(
+            c1 == c2
+            for v1, v2 in zip_longest(t1, t2, fillvalue=[])
+            for c1, c2 in zip_longest(v1, v2, fillvalue=0)
+        )
+
+    def __eq__(self, other) -> bool:
+        return self._eq(self.version, other.version) and self._eq(self.local, other.local)
+
+    def __lt__(self, other) -> bool:
+        for t1, t2 in [ (self.version, other.version), (self.local, other.local) ]:
+            for v1, v2 in zip_longest(t1, t2, fillvalue=[]):
+                for c1, c2 in zip_longest(v1, v2, fillvalue=0):
+                    if c1 == c2:
+                        continue
+                    if isinstance(c1, str) != isinstance(c2, str):
+                        return isinstance(c1, str)
+                    return c1 < c2
+        return False
+
+    def startswith(self, other: 'Version') -> bool:
+        if other.local:
+            if not self._eq(self.version, other.version):
+                return False
+            t1, t2 = self.local, other.local
+        else:
+            t1, t2 = self.version, other.version
+        nt = len(t2) - 1
+        if not self._eq(t1[:nt], t2[:nt]):
+            return False
+        v1 = [] if len(t1) <= nt else t1[nt]
+        v2 = t2[nt]
+        nt = len(v2) - 1
+        if not self._eq([v1[:nt]], [v2[:nt]]):
+            return False
+        c1 = 0 if len(v1) <= nt else v1[nt]
+        c2 = v2[nt]
+        if isinstance(c2, str):
+            return isinstance(c1, str) and c1.startswith(c2)
+        return c1 == c2
+
+
+def compatible_release(version: Version, other: Version, other_str: str) -> bool:
+    return version >= other and version.startswith(Version('.'.join(other_str.split('.')[:-1])))
+
+
+VersionMatcher = Callable[[Version], bool]
+
+
+def version_matcher(vspec: str) -> VersionMatcher:
+    """Compile a conda version spec (e.g. `>=1.2,<2|1.0.*`) to a predicate over `Version`s."""
+    vspec = vspec.strip()
+    if any( ch in vspec for ch in '()^$' ):
+        raise UnsupportedSpec(vspec)
+    if '|' in vspec:
+        alternatives = [ version_matcher(alt) for alt in vspec.split('|') ]
+        return lambda v: any( match(v) for match in alternatives )
+    if ',' in vspec:
+        constraints = [ version_matcher(c) for c in vspec.split(',') ]
+        return lambda v: all( match(v) for match in constraints )
+    if vspec in ('', '*'):
+        return lambda v: True
+    if vspec[0] in '=<>!~':
+        m = VERSION_RELATION_RGX.match(vspec)
+        if not m:
+            raise ValueError(f'Invalid version spec: {vspec!r}')
+        op, vo_str = m.groups()
+        if vo_str.endswith('.*'):
+            if op == '~=':
+                raise ValueError(f'Invalid version spec: {vspec!r}')
+            vo_str = vo_str[:-2]
+            if op == '!=':
+                op = '!=startswith'
+        vo = Version(vo_str)
+        if op == '=':
+            return lambda v: v.startswith(vo)
+        if op == '!=startswith':
+            return lambda v: not v.startswith(vo)
+        if op == '~=':
+            return lambda v: compatible_release(v, vo, vo_str)
+        fn = { '==': operator.eq, '!=': operator.ne, '<=': operator.le, '>=': operator.ge, '<': operator.lt, '>': operator.gt }[op]
+        return lambda v: fn(v, vo)
+    if '*' in vspec.rstrip('*'):
+        rgx = re.compile('^(?:%s)$' % vspec.replace('.', r'\.').replace('+', r'\+').replace('*', '.*'))
+        return lambda v: bool(rgx.match(v.norm))
+    if vspec.endswith('*'):
+        vo = Version(vspec.rstrip('*').rstrip('.'))
+        return lambda v: v.startswith(vo)
+    vo = Version(vspec)
+    return lambda v: v == vo
+
+
+class Spec(NamedTuple):
+    """Parsed MatchSpec: `[channel::]name[ version[ build]]` (or `name=version=build`, `name>=1,<2`, etc.)."""
+    channel: Optional[str]
+    name: str
+    version: Optional[VersionMatcher]
+    build: Optional[str]
+
+    def matches(self, record: dict) -> bool:
+        if self.build and not fnmatchcase(record['build'], self.build):
+            return False
+        if self.version:
+            try:
+                return self.version(Version(record['version']))
+            except ValueError:
+                return False
+        return True
+
+
+def parse_spec(spec_str: str) -> Spec:
+    """Parse a MatchSpec string, following `conda.models.match_spec._parse_spec_str` (minus bracket syntax)."""
+    spec_str = spec_str.strip()
+    if '[' in spec_str or '(' in spec_str:
+        raise UnsupportedSpec(spec_str)
+    channel, sep, spec_str = spec_str.rpartition('::')
+    name, rest = SPEC_NAME_RGX.match(spec_str).groups()
+    if not name:
+        raise ValueError(f'Invalid spec: {spec_str!r}')
+    version = build = None
+    if rest and rest.strip():
+        parts = VERSION_PLUS_BUILD_RGX.search(rest.strip())
+        version, build = parts.groups() if parts else (rest, None)
+        version = version and version.replace(' ', '')
+        build = build and build.strip()
+        if version and version[0] == '=':
+            test_str = version[1:]
+            if version[:2] == '==' and build is None:
+                version = version[2:]
+            elif not any( ch in test_str for ch in '=,|' ):
+                version = test_str + '*' if build is None and test_str[-1] != '*' else test_str
+    return Spec(
+        channel=channel or None,
+        name=name,
+        version=version_matcher(version) if version else None,
+        build=build,
+    )
+
+
+def version_key(record: dict):
+    try:
+        version = Version(record['version'])
+    except ValueError:
+        version = Version('0')
+    return version, record.get('build_number', 0), record['build']
+
+
+class Repodata(NamedTuple):
+    """A local `repodata.json`, the channel/subdir URL it describes, and a token that changes when it's updated."""
+    path: str
+    url: str
+    version: str
+
+
+def read_repodata_info(path: str) -> Repodata:
+    """Identify a `repodata.json` (from a local mirror, or conda's pkgs cache) without parsing it.
+
+    Conda's cache records the source URL and ETag / Last-Modified in a `.info.json` sidecar (or, in older versions, in
+    leading `_url` / `_etag` / `_mod` keys); otherwise the URL is the file's directory and the version its mtime.
+    """
+    info_path = f'{path.removesuffix(".json")}.info.json'
+    url = version = None
+    if exists(info_path):
+        with open(info_path) as f:
+            info = json.load(f)
+        url = info.get('url')
+        version = info.get('etag') or info.get('mod')
+    else:
+        with open(path, 'rb') as f:
+            head = f.read(4096)
+        if m := REPODATA_URL_RGX.search(head):
+            url = m.group(1).decode()
+        if m := REPODATA_VERSION_RGX.search(head):
+            version = m.group(1).decode()
+    if not url:
+        url = f'file://{dirname(abspath(path))}'
+    url = re.sub(r'/(current_)?repodata\.json$', '', url)
+    if not version:
+        st = os.stat(path)
+        version = f'{st.st_mtime_ns}:{st.st_size}'
+    return Repodata(path=path, url=url, version=version)
+
+
+def find_repodata(paths: list[str]) -> list[Repodata]:
+    """Find `repodata.json` files (and conda pkgs-cache `cache/*.json` files) under the given files / directories."""
+    repodatas = []
+    for path in paths:
+        if not isdir(path):
+            repodatas.append(read_repodata_info(path))
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted( d for d in dirs if not d.startswith('.') )
+            for name in sorted(files):
+                if name == 'repodata.json' or (
+                    basename(root) == 'cache'
+                    and name.endswith('.json')
+                    and not name.endswith(('.info.json', '.state.json'))
+                ):
+                    repodatas.append(read_repodata_info(join(root, name)))
+    return repodatas
+
+
+def pkgs_cache_dirs() -> list[str]:
+    """Conda's repodata cache directories (`<pkgs_dir>/cache`)."""
+    pkgs_dirs = os.environ.get('CONDA_PKGS_DIRS')
+    if pkgs_dirs:
+        pkgs_dirs = pkgs_dirs.split(',')
+    else:
+        pkgs_dirs = process.json('conda', 'info', '--json', log=lambda _: None)['pkgs_dirs']
+    return [ join(pkgs_dir, 'cache') for pkgs_dir in pkgs_dirs if isdir(join(pkgs_dir, 'cache')) ]
+
+
+def channel_matches(url: str, channel: str) -> bool:
+    return f'/{channel.strip("/")}/' in f'{url}/'
+
+
+class RepodataIndex:
+    """Name-keyed index of package records from local `repodata.json`s, persisted in SQLite.
+
+    Each repodata file is parsed once per (channel URL, version); lookups then read just the requested names' records.
+    """
+
+    def __init__(self, db: sqlite3.Connection, repodatas: list[Repodata]):
+        self.db = db
+        self.urls = list(dict.fromkeys( repodata.url for repodata in repodatas ))
+        for repodata in repodatas:
+            self.load(repodata)
+
+    def load(self, repodata: Repodata):
+        row = self.db.execute('SELECT version FROM repodata WHERE url = ?', (repodata.url,)).fetchone()
+        if row and row[0] == repodata.version:
+            return
+        err(f'Indexing {repodata.path} ({repodata.url})')
+        with open(repodata.path, 'rb') as f:
+            data = json.load(f)
+        subdir = data.get('info', {}).get('subdir') or basename(repodata.url)
+        by_name = {}
+        seen = set()
+        # Prefer `.conda` artifacts over equivalent `.tar.bz2`s, like conda does
+        for key, ext in [ ('packages.conda', '.conda'), ('packages', '.tar.bz2') ]:
+            for fn, record in data.get(key, {}).items():
+                stem = fn.removesuffix(ext)
+                if stem in seen:
+                    continue
+                seen.add(stem)
+                by_name.setdefault(record['name'], []).append({
+                    **record,
+                    'channel': repodata.url,
+                    'fn': fn,
+                    'subdir': record.get('subdir', subdir),
+                    'url': f'{repodata.url}/{fn}',
+                })
+        with self.db:
+            self.db.execute('DELETE FROM packages WHERE url = ?', (repodata.url,))
+            self.db.executemany(
+                'INSERT INTO packages VALUES (?, ?, ?)',
+                ( (repodata.url, name, json.dumps(records)) for name, records in by_name.items() ),
+            )
+            self.db.execute('INSERT OR REPLACE INTO repodata VALUES (?, ?)', (repodata.url, repodata.version))
+
+    def names(self, pattern: str) -> list[str]:
+        if not any( ch in pattern for ch in '*?[' ):
+            return [ pattern ]
+        placeholders = ','.join('?' * len(self.urls))
+        rows = self.db.execute(f'SELECT DISTINCT name FROM packages WHERE url IN ({placeholders})', self.urls)
+        return sorted( name for [name] in rows if fnmatchcase(name, pattern) )
+
+    def search(self, spec: Spec) -> dict[str, list[dict]]:
+        """Builds matching `spec`, grouped by name and sorted like `conda search --json` output."""
+        urls = [ url for url in self.urls if not spec.channel or channel_matches(url, spec.channel) ]
+        if not urls:
+            return {}
+        placeholders = ','.join('?' * len(urls))
+        results = {}
+        for name in self.names(spec.name):
+            records = [
+                record
+                for [records] in self.db.execute(
+                    f'SELECT records FROM packages WHERE name = ? AND url IN ({placeholders})',
+                    [ name, *urls ],
+                )
+                for record in json.loads(records)
+                if spec.matches(record)
+            ]
+            if records:
+                results[name] = sorted(records, key=version_key)
+        return results
+
+
+def conda_search(spec: str, verbose: bool = False) -> dict[str, list[dict]]:
+    kwargs = {} if verbose else { 'log': lambda _: None }
+    return process.json('conda', 'search', '--json', spec, **kwargs)
+
+
+def open_db(enabled: bool = True) -> sqlite3.Connection:
+    """Open the persistent cache (or, if disabled, an in-memory database, so indexing works the same way)."""
+    if enabled:
+        os.makedirs(dirname(CACHE_PATH) or '.', exist_ok=True)
+        db = sqlite3.connect(CACHE_PATH, timeout=30)
+        db.execute('PRAGMA journal_mode=WAL')
+    else:
+        db = sqlite3.connect(':memory:')
+    db.executescript(SCHEMA)
+    return db
+
+
+def search_all(
+    specs: list[str],
+    db: sqlite3.Connection,
+    index: Optional[RepodataIndex] = None,
+    jobs: int = 4,
+    cache: bool = True,
+    verbose: bool = False,
+) -> dict[str, dict[str, list[dict]]]:
+    """Resolve each spec to its matching builds: from `index` where possible, else via (cached, concurrent) `conda search`."""
+    results = {}
+    pending = []
+    for spec in specs:
+        if index:
+            try:
+                if rv := index.search(parse_spec(spec)):
+                    results[spec] = rv
+                    continue
+                err(f'{spec}: no matches in local repodata, running `conda search`')
+            except UnsupportedSpec:
+                pass
+        pending.append(spec)
+
+    if pending:
+        keys = {}
+        if cache:
+            # Invalidate cached searches whenever conda's repodata cache changes
+            state = [ (repodata.url, repodata.version) for repodata in find_repodata(pkgs_cache_dirs()) ]
+            now = time.time()
+            for spec in list(pending):
+                key = keys[spec] = json.dumps([ spec, state ])
+                row = db.execute('SELECT result, time FROM searches WHERE key = ?', (key,)).fetchone()
+                if row and now - row[1] < SEARCH_TTL:
+                    results[spec] = json.loads(row[0])
+                    pending.remove(spec)
+        with ThreadPoolExecutor(max(1, min(jobs, len(pending) or 1))) as executor:
+            rvs = executor.map(lambda spec: conda_search(spec, verbose=verbose), pending)
+            for spec, rv in zip(pending, rvs):
+                results[spec] = rv
+                if cache:
+                    with db:
+                        db.execute(
+                            'INSERT OR REPLACE INTO searches VALUES (?, ?, ?)',
+                            (keys[spec], json.dumps(rv), time.time()),
+                        )
+    return { spec: results[spec] for spec in specs }
+
+
+class DepFilter:
+    """Predicate over `depends` entries, compiled from `-f/--dep-filter`s.
+
+    By default, filters are substrings, combined into one regex. With `match_spec`, each filter is `name[ version]`: a
+    dependency matches if it's on that package (exact name, or glob), and (if a version is given) its constraint admits
+    that version (e.g. `python 3.12` matches `python >=3.12,<3.13.0a0`, not `python >=3.8,<3.9.0a0`). Results are
+    memoized per dependency string, so repeated constraints across many builds are only evaluated once.
+    """
+
+    def __init__(self, filters: tuple[str, ...], match_spec: bool = False):
+        self.memo = {}
+        if not filters:
+            self.rgx = None
+        elif match_spec:
+            self.specs = []
+            for dep_filter in filters:
+                name, rest = SPEC_NAME_RGX.match(dep_filter.strip()).groups()
+                version = rest and rest.strip().lstrip('=').strip()
+                try:
+                    if version and any( ch in version for ch in '<>!~,|*' ):
+                        raise ValueError(f'expected a single version, not a constraint ({version!r})')
+                    self.specs.append((name, Version(version) if version else None))
+                except ValueError as e:
+                    raise click.BadParameter(
+                        f'{dep_filter!r}: {e}; with -m/--match-spec, filters are `name[ version]` (e.g. `python 3.12`)',
+                        param_hint='-f/--dep-filter',
+                    )
+            names = '|'.join( translate(name).removesuffix(r'\Z') for name, _ in self.specs )
+            self.rgx = re.compile(rf'^(?:{names})(?:\s|$)')
+        else:
+            self.specs = None
+            self.rgx = re.compile('|'.join(map(re.escape, filters)))
+
+    def __call__(self, dep: str) -> bool:
+        if self.rgx is None:
+            return False
+        if dep in self.memo:
+            return self.memo[dep]
+        matched = bool(self.rgx.search(dep))
+        if matched and self.specs is not None:
+            matched = self.spec_match(dep)
+        self.memo[dep] = matched
+        return matched
+
+    def spec_match(self, dep: str) -> bool:
+        try:
+            dep_spec = parse_spec(dep)
+        except ValueError:
+            return False
+        for name, version in self.specs:
+            if not fnmatchcase(dep_spec.name, name):
+                continue
+            if version is None or dep_spec.version is None or dep_spec.version(version):
+                return True
+        return False
+
+
+def iter_builds(searches: dict[str, dict[str, list[dict]]]) -> Iterator[tuple[str, dict]]:
+    """Yield `(key, build)` for each distinct build (`name==version[build]`) across all specs' results."""
+    seen = set()
+    for rv in searches.values():
+        for builds in rv.values():
+            for build in builds:
+                key = f"{build['name']}=={build['version']}[{build['build']}]"
+                if key not in seen:
+                    seen.add(key)
+                    yield key, build
 
 
 @click.command()
 @click.option('-h', '--histogram', count=True, help="1x: print number of occurrences of each matching dep constraint, sorted by constraint string; 2x: sorted by occurrence count (increasing); 3x: sorted by occurrence count (decreasing)")
 @click.option('-f', '--dep-filter', 'dep_filters', multiple=True, help="One or more filters to apply to the `depends` array of each returned build")
+@click.option('-j', '--jobs', type=int, default=4, help="Max concurrent `conda search` subprocesses (default: 4)")
+@click.option('-m', '--match-spec', is_flag=True, help="Treat -f/--dep-filter values as `name[ version]` (match deps on that package whose constraint admits that version), instead of substrings")
+@click.option('--no-cache', is_flag=True, help=f"Don't read or write cached repodata indexes / search results (in {CACHE_PATH})")
+@click.option('-n', '--top', type=int, help="Only print the N most common dep constraints (implies -hhh, if -h/--histogram isn't passed)")
+@click.option('-p', '--pkgs-cache', is_flag=True, help="Answer specs from the repodata in conda's package cache (`<pkgs_dir>/cache`), instead of `conda search`")
+@click.option('-r', '--repodata', 'repodata_paths', multiple=True, help="Answer specs from this `repodata.json`, or those under this directory (e.g. a local channel mirror), instead of `conda search` (repeatable)")
 @click.option('-v', '--verbose', is_flag=True, help="Debug-print `conda search --json` commands before executing")
 @click.argument('specs', nargs=-1)
-def main(histogram, dep_filters, verbose, specs):
-    dep_map = {}
-    for spec in specs:
-        kwargs = {} if verbose else { 'log': lambda _: None }
-        rv = process.json('conda', 'search', '--json', spec, **kwargs)
-        _, builds = singleton(rv, dedupe=False)
-        for build in builds:
-            name = f"{build['name']}=={build['version']}[{build['build']}]"
-            deps = [
-                dep
-                for dep in build['depends']
-                if any(
-                    dep_filter in dep
-                    for dep_filter in dep_filters
-                )
-            ]
-            # if len(dep_filters) == 1:
-            #     dep_map[name] = deps[0] if deps else
-            # else:
-            dep_map[name] = deps if deps else [""]
-
-    if histogram:
-        hist = {}
-        for deps in dep_map.values():
-            for dep in deps:
-                if dep not in hist:
-                    hist[dep] = 0
-                hist[dep] += 1
-        if histogram == 1:
-            hist = dict(sorted(hist.items(), key=lambda k: k[0] if k[0] is not None else 'zzz'))
-        elif histogram == 2:
-            hist = dict(sorted(hist.items(), key=lambda k: k[1]))
-        elif histogram == 3:
-            hist = dict(reversed(sorted(hist.items(), key=lambda k: k[1])))
-        else:
-            raise ValueError(f"-h/--histogram should be 0, 1, 2, or 3")
+def main(histogram, dep_filters, jobs, match_spec, no_cache, top, pkgs_cache, repodata_paths, verbose, specs):
+    if histogram > 3:
+        raise click.UsageError("-h/--histogram should be passed at most 3x")
+    if top is not None and not histogram:
+        histogram = 3
 
-        print(json.dumps(hist, indent=2))
-    else:
+    db = open_db(not no_cache)
+    repodata_paths = [ *repodata_paths, *(pkgs_cache_dirs() if pkgs_cache else []) ]
+    index = RepodataIndex(db, find_repodata(repodata_paths)) if repodata_paths else None
+    searches = search_all(list(specs), db, index=index, jobs=jobs, cache=not no_cache, verbose=verbose)
+    dep_filter = DepFilter(dep_filters, match_spec=match_spec)
+
+    def matching_deps(build):
+        return [ dep for dep in build['depends'] if dep_filter(dep) ] or [""]
+
+    if not histogram:
+        dep_map = { key: matching_deps(build) for key, build in iter_builds(searches) }
         print(json.dumps(dep_map, indent=2))
+        return
+
+    hist = Counter()
+    for _, build in iter_builds(searches):
+        hist.update(matching_deps(build))
+    items = hist.most_common(top)
+    if histogram == 1:
+        items.sort(key=lambda item: item[0])
+    elif histogram == 2:
+        items.reverse()
+    print(json.dumps(dict(items), indent=2))
 
 
 if __name__ == '__main__':
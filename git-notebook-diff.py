@@ -3,70 +3,187 @@
 # dependencies = ["click"]
 # ///
 
+import json
 import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from difflib import SequenceMatcher, unified_diff
 from functools import partial
+from hashlib import sha1
 from sys import stderr
-from typing import Optional
+from typing import BinaryIO, Optional
 
 import click
 from click import argument, option
 
+from nb_clear import clear_bytes
+
 err = partial(print, file=stderr)
 
+# Max data bytes per pkt-line (65520, minus the 4-byte length header)
+PKT_MAX = 65516
+DEFAULT_FILTER_PROCESS = 'git-notebook-diff.py filter'
+# Built-in sources-only diff driver (see `diff` subcommand)
+FAST_DIFF_COMMAND = 'git-notebook-diff.py diff'
+
 
-def run_cmd(*args, check=True):
+def run_cmd(*args, check=True, input=None):
     """Run a command and return stdout."""
-    result = subprocess.run(args, capture_output=True, text=True, check=False)
+    result = subprocess.run(args, capture_output=True, text=True, check=False, input=input)
     if check and result.returncode != 0:
         raise subprocess.CalledProcessError(result.returncode, args, result.stdout, result.stderr)
     return result.stdout.strip() if result.returncode == 0 else None
 
 
-def get_nb_attr() -> Optional[str]:
-    """Get the diff attribute type for notebooks."""
-    attr = run_cmd('git', 'attr-diff-type', 'foo.ipynb', check=False)
+class GitConfig:
+    """Batched view of the notebook-related git config (and attributes) for one repo (or `--global`).
+
+    All `diff.*`/`filter.*` keys are read with one `git config -z --get-regexp`, notebook attributes with one
+    `git check-attr --stdin -z`, and writes are queued, then applied by `commit()`. Git has no multi-key write, so each
+    net change still costs one `git config` call, but repeated and no-op writes are coalesced away.
+    """
+    KEY_RGX = r'^(diff|filter)\.|^core\.attributesfile$'
+
+    def __init__(self, is_global: bool = False, repo: Optional[str] = None):
+        self.is_global = is_global
+        self.repo = repo
+        self._values = None
+        self._scope_values = None
+        self._attrs = None
+        self.pending = {}  # key -> value (`None`: unset)
+
+    def git_args(self, *args) -> list[str]:
+        repo_args = ['-C', self.repo] if self.repo else []
+        return ['git', *repo_args, *args]
+
+    def config_args(self, *args) -> list[str]:
+        return self.git_args('config', *(['--global'] if self.is_global else []), *args)
+
+    def read_values(self, *scope_args) -> dict[str, str]:
+        out = subprocess.run(
+            self.git_args('config', *scope_args, '-z', '--get-regexp', self.KEY_RGX),
+            capture_output=True,
+            text=True,
+        ).stdout
+        values = {}
+        for record in out.split('\0'):
+            if record:
+                key, _, value = record.partition('\n')
+                values[key] = value
+        return values
+
+    @property
+    def values(self) -> dict[str, str]:
+        """Effective values (merged from all scopes, unless `--global`)."""
+        if self._values is None:
+            self._values = self.read_values(*(['--global'] if self.is_global else []))
+        return self._values
+
+    @property
+    def scope_values(self) -> dict[str, str]:
+        """Values in the scope writes go to (`--global`, or `--local`)."""
+        if self.is_global:
+            return self.values
+        if self._scope_values is None:
+            self._scope_values = self.read_values('--local')
+        return self._scope_values
+
+    def attrs(self, path: str = 'foo.ipynb') -> dict[str, Optional[str]]:
+        """Notebooks' `diff` and `filter` attributes (driver names), or `None` where unspecified."""
+        if self._attrs is None:
+            out = run_cmd(*self.git_args('check-attr', '--stdin', '-z', 'diff', 'filter'), input=f'{path}\0', check=False) or ''
+            fields = out.split('\0')
+            attrs = {}
+            for _, attr, info in zip(fields[0::3], fields[1::3], fields[2::3]):
+                attrs[attr] = None if info in ('unspecified', 'unset', 'set') else info
+            self._attrs = attrs
+        return self._attrs
+
+    def get(self, key: str) -> Optional[str]:
+        if key in self.pending:
+            return self.pending[key]
+        return self.values.get(key)
+
+    def set(self, key: str, value: str):
+        self.pending[key] = value
+
+    def unset(self, key: str):
+        self.pending[key] = None
+
+    def commit(self):
+        """Apply queued writes that actually change something (in the target scope: a local write of a value that's
+        also set globally still happens)."""
+        for key, value in self.pending.items():
+            current = self.scope_values.get(key)
+            if value == current:
+                continue
+            if value is None:
+                cmd_args = self.config_args('--unset', key)
+                check = False
+            else:
+                cmd_args = self.config_args(key, value)
+                check = True
+            err(' '.join(cmd_args))
+            subprocess.run(cmd_args, check=check)
+            for values in (self.values, self.scope_values):
+                if value is None:
+                    values.pop(key, None)
+                else:
+                    values[key] = value
+        self.pending = {}
+
+
+def get_nb_attr(cfg: GitConfig, attr_name: str = 'diff') -> Optional[str]:
+    """Get the `diff` (or `filter`) attribute type for notebooks, printing setup instructions if it's missing."""
+    attr = cfg.attrs().get(attr_name)
     if attr:
         return attr
 
-    err('No .gitattributes found for *.ipynb; try:')
+    err(f'No {attr_name} attribute found for *.ipynb; try:')
     err('')
-    attrs_file = run_cmd('git', 'config', 'core.attributesfile', check=False)
+    attrs_file = cfg.get('core.attributesfile')
     if not attrs_file:
         err('    git config --global core.attributesfile ~/.gitattributes')
         attrs_file = '~/.gitattributes'
     else:
         attrs_file = f'~/{attrs_file}'
-    err(f'    echo "*.ipynb diff=nb" >> {attrs_file}')
+    err(f'    echo "*.ipynb {attr_name}=nb" >> {attrs_file}')
     return None
 
 
-def get_config(key: str, is_global: bool = False) -> Optional[str]:
-    """Get a git config value."""
-    cmd_args = ['git', 'config']
-    if is_global:
-        cmd_args.append('--global')
-    cmd_args.append(key)
-    return run_cmd(*cmd_args, check=False)
+def require_nb_attr(cfg: GitConfig, attr_name: str = 'diff') -> str:
+    attr = get_nb_attr(cfg, attr_name)
+    if not attr:
+        raise SystemExit(1)
+    return attr
 
 
-def set_config(key: str, value: str, is_global: bool = False):
-    """Set a git config value."""
-    cmd_args = ['git', 'config']
-    if is_global:
-        cmd_args.append('--global')
-    cmd_args.extend([key, value])
-    err(' '.join(cmd_args))
-    subprocess.run(cmd_args, check=True)
+def enable_diff(cfg: GitConfig, attr: str, fast: bool = False):
+    if fast:
+        # Save the current (e.g. nbdime) command, as `disable_diff` does, so a later non-fast `enable` restores it
+        current = cfg.get(f'diff.{attr}.command')
+        if current and current != FAST_DIFF_COMMAND:
+            cfg.set(f'diff.{attr}.command-saved', current)
+        cfg.set(f'diff.{attr}.command', FAST_DIFF_COMMAND)
+        return
 
+    # Check if there's a saved config to restore
+    saved = cfg.get(f'diff.{attr}.command-saved')
+    if saved:
+        cfg.set(f'diff.{attr}.command', saved)
+    else:
+        # Default to sources-only mode
+        cfg.set(f'diff.{attr}.command', 'git-nbdiffdriver diff -s')
 
-def unset_config(key: str, is_global: bool = False):
-    """Unset a git config value."""
-    cmd_args = ['git', 'config']
-    if is_global:
-        cmd_args.append('--global')
-    cmd_args.extend(['--unset', key])
-    err(' '.join(cmd_args))
-    subprocess.run(cmd_args, check=False)
+
+def disable_diff(cfg: GitConfig, attr: str):
+    # Save current config if it exists
+    current = cfg.get(f'diff.{attr}.command')
+    if current:
+        cfg.set(f'diff.{attr}.command-saved', current)
+        cfg.unset(f'diff.{attr}.command')
+    else:
+        err('nbdime already disabled')
 
 
 @click.group()
@@ -77,56 +194,36 @@ def main():
 
 @main.command()
 @option('-g', '--global', 'is_global', is_flag=True, help='Apply globally instead of locally')
-def enable(is_global: bool):
+@option('-f', '--fast', is_flag=True, help="Use this script's lightweight, sources-only `diff` driver instead of nbdime")
+def enable(is_global: bool, fast: bool):
     """Enable nbdime (restore saved config or default to -s)."""
-    attr = get_nb_attr()
-    if not attr:
-        raise SystemExit(1)
-
-    # Check if there's a saved config to restore
-    saved = get_config(f'diff.{attr}.command-saved', is_global)
-    if saved:
-        set_config(f'diff.{attr}.command', saved, is_global)
-    else:
-        # Default to sources-only mode
-        set_config(f'diff.{attr}.command', 'git-nbdiffdriver diff -s', is_global)
+    cfg = GitConfig(is_global)
+    enable_diff(cfg, require_nb_attr(cfg), fast=fast)
+    cfg.commit()
 
 
 @main.command()
 @option('-g', '--global', 'is_global', is_flag=True, help='Apply globally instead of locally')
 def disable(is_global: bool):
     """Disable nbdime (save current config before unsetting)."""
-    attr = get_nb_attr()
-    if not attr:
-        raise SystemExit(1)
-
-    # Save current config if it exists
-    current = get_config(f'diff.{attr}.command', is_global)
-    if current:
-        set_config(f'diff.{attr}.command-saved', current, is_global)
-        unset_config(f'diff.{attr}.command', is_global)
-    else:
-        err('nbdime already disabled')
+    cfg = GitConfig(is_global)
+    disable_diff(cfg, require_nb_attr(cfg))
+    cfg.commit()
 
 
 @main.command()
 @option('-g', '--global', 'is_global', is_flag=True, help='Apply globally instead of locally')
 def toggle(is_global: bool):
     """Toggle nbdime on/off."""
-    attr = get_nb_attr()
-    if not attr:
-        raise SystemExit(1)
+    cfg = GitConfig(is_global)
+    attr = require_nb_attr(cfg)
 
     # Check if currently enabled
-    current = get_config(f'diff.{attr}.command', is_global)
-    if current:
-        # Currently enabled, disable it
-        ctx = click.Context(disable)
-        ctx.invoke(disable, is_global=is_global)
+    if cfg.get(f'diff.{attr}.command'):
+        disable_diff(cfg, attr)
     else:
-        # Currently disabled, enable it
-        ctx = click.Context(enable)
-        ctx.invoke(enable, is_global=is_global)
+        enable_diff(cfg, attr)
+    cfg.commit()
 
 
 @main.command()
@@ -140,13 +237,12 @@ def flags(is_global: bool, flag_args: Optional[str] = None):
         git-notebook-diff.py flags       # show current
         git-notebook-diff.py flags ""    # unfiltered
     """
-    attr = get_nb_attr()
-    if not attr:
-        raise SystemExit(1)
+    cfg = GitConfig(is_global)
+    attr = require_nb_attr(cfg)
 
     if flag_args is None:
         # Print current config
-        current = get_config(f'diff.{attr}.command', is_global)
+        current = cfg.get(f'diff.{attr}.command')
         if current:
             print(current)
         else:
@@ -157,7 +253,244 @@ def flags(is_global: bool, flag_args: Optional[str] = None):
             cmd_value = f'git-nbdiffdriver diff {flag_args}'
         else:
             cmd_value = 'git-nbdiffdriver diff'
-        set_config(f'diff.{attr}.command', cmd_value, is_global)
+        cfg.set(f'diff.{attr}.command', cmd_value)
+        cfg.commit()
+
+
+def repo_status(repo: str, is_global: bool = False) -> dict:
+    """Notebook diff/filter attributes and config for one repo (two `git` calls)."""
+    cfg = GitConfig(is_global, repo=repo)
+    attrs = cfg.attrs()
+    status = dict(repo=repo)
+    for attr_name, key in [('diff', 'command'), ('filter', 'process')]:
+        attr = attrs.get(attr_name)
+        status[attr_name] = attr
+        if attr:
+            status[f'{attr_name}.{key}'] = cfg.get(f'{attr_name}.{attr}.{key}')
+            status[f'{attr_name}.{key}-saved'] = cfg.get(f'{attr_name}.{attr}.{key}-saved')
+    return status
+
+
+@main.command()
+@option('-g', '--global', 'is_global', is_flag=True, help='Read global config (attributes are still per-repo)')
+@option('-j', '--jobs', type=int, default=16, help='Number of repos to query concurrently')
+@argument('repos', nargs=-1)
+def status(is_global: bool, jobs: int, repos: tuple[str, ...]):
+    """Print notebook diff/filter config for one or more repos (default: current), as JSONL."""
+    with ThreadPoolExecutor(jobs) as executor:
+        for record in executor.map(partial(repo_status, is_global=is_global), repos or ['.']):
+            print(json.dumps(record))
+
+
+def load_cells(path: str) -> list[tuple[str, str]]:
+    """Load a notebook's `(cell_type, source)` pairs; `/dev/null` (an added/deleted side) has none."""
+    if path == '/dev/null':
+        return []
+    with open(path, 'rb') as f:
+        nb = json.load(f)
+    cells = []
+    for cell in nb.get('cells', []):
+        source = cell.get('source', '')
+        if isinstance(source, list):
+            source = ''.join(source)
+        cells.append((cell.get('cell_type', ''), source))
+    return cells
+
+
+def cell_hash(cell: tuple[str, str]) -> str:
+    cell_type, source = cell
+    return sha1(f'{cell_type}\0{source}'.encode()).hexdigest()
+
+
+def diff_lines(old: list[str], new: list[str], label: str, context: int = 3) -> list[str]:
+    """Unified-diff two line lists, dropping `---`/`+++` headers and appending `label` to each hunk header."""
+    lines = list(unified_diff(old, new, lineterm='', n=context))[2:]
+    return [ f'{line} {label}' if line.startswith('@@') else line for line in lines ]
+
+
+def diff_cells(old_cells: list[tuple[str, str]], new_cells: list[tuple[str, str]], context: int = 3) -> list[str]:
+    """Diff two notebooks' cell sources.
+
+    Cells are matched by source hash (`SequenceMatcher`'s longest-matching-blocks, i.e. LCS-style); only cells that
+    differ are split into lines and textually diffed.
+    """
+    def split(cell):
+        return cell[1].splitlines()
+
+    out = []
+    matcher = SequenceMatcher(None, list(map(cell_hash, old_cells)), list(map(cell_hash, new_cells)), autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        # Pair up replaced cells in order; any excess were deleted / inserted
+        pairs = list(zip(range(i1, i2), range(j1, j2)))
+        for i, j in pairs:
+            (old_type, _), (new_type, _) = old_cells[i], new_cells[j]
+            types = old_type if old_type == new_type else f'{old_type} → {new_type}'
+            idxs = str(i) if i == j else f'{i} → {j}'
+            out += diff_lines(split(old_cells[i]), split(new_cells[j]), f'cell {idxs} ({types})', context)
+        for i in range(i1 + len(pairs), i2):
+            out += diff_lines(split(old_cells[i]), [], f'cell {i} ({old_cells[i][0]}, deleted)', context)
+        for j in range(j1 + len(pairs), j2):
+            out += diff_lines([], split(new_cells[j]), f'cell {j} ({new_cells[j][0]}, added)', context)
+    return out
+
+
+@main.command()
+@option('-U', '--unified', 'context', type=int, default=3, help='Lines of context around changed source lines')
+@argument('args', nargs=-1)
+def diff(context: int, args: tuple[str, ...]):
+    """Lightweight, sources-only notebook diff driver (`diff.<driver>.command`).
+
+    Git invokes this with `path old-file old-hex old-mode new-file new-hex new-mode` (plus rename info, if any).
+    """
+    if len(args) < 7:
+        # Unmerged path; nothing to diff
+        print(f'* Unmerged path {args[0]}' if args else '')
+        return
+    path, old_file, _, _, new_file = args[:5]
+    new_path = args[7] if len(args) > 7 else path
+    try:
+        lines = diff_cells(load_cells(old_file), load_cells(new_file), context)
+    except ValueError:
+        # Not valid JSON (e.g. a conflicted or truncated notebook); diff raw text
+        with open(old_file) as f_old, open(new_file) as f_new:
+            lines = list(unified_diff(f_old.read().splitlines(), f_new.read().splitlines(), lineterm='', n=context))[2:]
+    if not lines:
+        return
+    print(f'diff --git a/{path} b/{new_path}')
+    print(f'--- a/{path}' if old_file != '/dev/null' else '--- /dev/null')
+    print(f'+++ b/{new_path}' if new_file != '/dev/null' else '+++ /dev/null')
+    print('\n'.join(lines))
+
+
+def read_exactly(fd: BinaryIO, n: int) -> bytes:
+    buf = fd.read(n)
+    while len(buf) < n:
+        chunk = fd.read(n - len(buf))
+        if not chunk:
+            raise EOFError(f'Expected {n} bytes, got {len(buf)}')
+        buf += chunk
+    return buf
+
+
+def read_pkt(fd: BinaryIO) -> Optional[bytes]:
+    """Read one pkt-line; `None` for a flush packet ("0000")."""
+    header = fd.read(4)
+    if not header:
+        raise EOFError
+    if len(header) < 4:
+        header += read_exactly(fd, 4 - len(header))
+    size = int(header, 16)
+    if size == 0:
+        return None
+    return read_exactly(fd, size - 4)
+
+
+def read_text_list(fd: BinaryIO) -> list[str]:
+    """Read text pkt-lines up to a flush packet."""
+    lines = []
+    while (pkt := read_pkt(fd)) is not None:
+        lines.append(pkt.decode().removesuffix('\n'))
+    return lines
+
+
+def read_content(fd: BinaryIO) -> bytes:
+    """Read binary pkt-lines up to a flush packet."""
+    chunks = []
+    while (pkt := read_pkt(fd)) is not None:
+        chunks.append(pkt)
+    return b''.join(chunks)
+
+
+def write_pkt(fd: BinaryIO, data: bytes):
+    fd.write(b'%04x' % (len(data) + 4))
+    fd.write(data)
+
+
+def write_flush(fd: BinaryIO):
+    fd.write(b'0000')
+    fd.flush()
+
+
+def write_text_list(fd: BinaryIO, lines: list[str]):
+    for line in lines:
+        write_pkt(fd, f'{line}\n'.encode())
+    write_flush(fd)
+
+
+def write_content(fd: BinaryIO, data: bytes):
+    for start in range(0, len(data), PKT_MAX):
+        write_pkt(fd, data[start:start + PKT_MAX])
+    write_flush(fd)
+
+
+def serve_filter(stdin: BinaryIO, stdout: BinaryIO):
+    """Speak git's long-running filter protocol (see `gitattributes(5)`, "Long Running Filter Process").
+
+    "clean" strips outputs and execution counts (via `nb_clear`); "smudge" passes content through. Notebooks that fail to
+    parse get "status=error", so git keeps their content as-is (unless `filter.<driver>.required` is set).
+    """
+    welcome = read_text_list(stdin)
+    if welcome[:1] != ['git-filter-client'] or 'version=2' not in welcome[1:]:
+        raise ValueError(f'Unexpected filter handshake: {welcome}')
+    write_text_list(stdout, ['git-filter-server', 'version=2'])
+    capabilities = read_text_list(stdin)
+    write_text_list(stdout, [ c for c in ['capability=clean', 'capability=smudge'] if c in capabilities ])
+
+    while True:
+        try:
+            headers = read_text_list(stdin)
+        except EOFError:
+            return
+        meta = dict( line.split('=', 1) for line in headers )
+        content = read_content(stdin)
+        command = meta.get('command')
+        try:
+            if command == 'clean':
+                content = clear_bytes(content)
+            elif command != 'smudge':
+                raise ValueError(f'Unsupported command: {command}')
+        except ValueError as e:
+            err(f'git-notebook-diff.py filter: {meta.get("pathname")}: {e}')
+            write_text_list(stdout, ['status=error'])
+            continue
+        write_text_list(stdout, ['status=success'])
+        write_content(stdout, content)
+        # Empty list: keep "status=success"
+        write_flush(stdout)
+
+
+@main.command('filter')
+def filter_process():
+    """Run as a long-running git filter process (`filter.<driver>.process`), stripping notebook outputs on "clean"."""
+    serve_filter(sys.stdin.buffer, sys.stdout.buffer)
+
+
+@main.command()
+@option('-g', '--global', 'is_global', is_flag=True, help='Apply globally instead of locally')
+def filter_enable(is_global: bool):
+    """Enable the output-stripping filter process (restore saved config, or default to this script's `filter`)."""
+    cfg = GitConfig(is_global)
+    attr = require_nb_attr(cfg, 'filter')
+    saved = cfg.get(f'filter.{attr}.process-saved')
+    cfg.set(f'filter.{attr}.process', saved or DEFAULT_FILTER_PROCESS)
+    cfg.commit()
+
+
+@main.command()
+@option('-g', '--global', 'is_global', is_flag=True, help='Apply globally instead of locally')
+def filter_disable(is_global: bool):
+    """Disable the output-stripping filter process (save current config before unsetting)."""
+    cfg = GitConfig(is_global)
+    attr = require_nb_attr(cfg, 'filter')
+    current = cfg.get(f'filter.{attr}.process')
+    if current:
+        cfg.set(f'filter.{attr}.process-saved', current)
+        cfg.unset(f'filter.{attr}.process')
+        cfg.commit()
+    else:
+        err('Notebook filter process already disabled')
 
 
 if __name__ == '__main__':
@@ -5,23 +5,179 @@
 #     "click",
 # ]
 # ///
+import errno
+import fcntl
+import json
+import os
+import selectors
+import socket
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
 from hashlib import sha256
 from os import getcwd
-from os.path import basename
+from os.path import basename, dirname, expanduser, join
+from typing import Iterable
 
 import click
 
+REGISTRY_PATH = os.environ.get('HASH_PORT_REGISTRY') or join(
+    os.environ.get('XDG_STATE_HOME') or expanduser('~/.local/state'),
+    'py-helpers',
+    'hash-ports.json',
+)
+# Max sockets open at once while probing
+PROBE_BATCH = 256
+
+
+def hash_port(name: str, start: int, end: int) -> int:
+    digest = sha256(name.encode('utf-8')).hexdigest()
+    return start + int(digest, 16) % (end - start)
+
+
+def live_ports(ports: Iterable[int], host: str = '127.0.0.1', timeout: float = 0.2) -> set[int]:
+    """Return the subset of `ports` accepting TCP connections on `host`.
+
+    Connections are attempted concurrently (non-blocking sockets, multiplexed with `selectors`), in batches of
+    `PROBE_BATCH`; ports that neither accept nor refuse within `timeout` are considered free.
+    """
+    ports = list(ports)
+    live = set()
+    for i in range(0, len(ports), PROBE_BATCH):
+        with selectors.DefaultSelector() as sel:
+            for port in ports[i:i + PROBE_BATCH]:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.setblocking(False)
+                rc = sock.connect_ex((host, port))
+                if rc == 0:
+                    live.add(port)
+                    sock.close()
+                elif rc in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN):
+                    sel.register(sock, selectors.EVENT_WRITE, port)
+                else:
+                    sock.close()
+            deadline = time.monotonic() + timeout
+            while sel.get_map() and (remaining := deadline - time.monotonic()) > 0:
+                for key, _ in sel.select(remaining):
+                    sock = key.fileobj
+                    if sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                        live.add(key.data)
+                    sel.unregister(sock)
+                    sock.close()
+            for key in list(sel.get_map().values()):
+                sel.unregister(key.fileobj)
+                key.fileobj.close()
+    return live
+
+
+@contextmanager
+def locked_registry(path: str):
+    """Load the registry (`{name: port}`) under an exclusive lock, and atomically save it on exit."""
+    os.makedirs(dirname(path) or '.', exist_ok=True)
+    with open(f'{path}.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with open(path, 'r') as f:
+                registry = json.load(f)
+        except FileNotFoundError:
+            registry = {}
+        before = dict(registry)
+        yield registry
+        if registry != before:
+            fd, tmp_path = tempfile.mkstemp(dir=dirname(path) or '.', prefix=f'.{basename(path)}.', suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(dict(sorted(registry.items())), f, indent=2)
+                f.write('\n')
+            os.replace(tmp_path, path)
+
+
+def allocate(
+    names: list[str],
+    registry: dict[str, int],
+    start: int,
+    end: int,
+    probe: bool = True,
+    host: str = '127.0.0.1',
+    timeout: float = 0.2,
+) -> dict[str, int]:
+    """Assign each name a port, recording new assignments in `registry`.
+
+    Registered names keep their ports. Each new name starts at its hash slot and probes linearly (wrapping around the
+    range) past ports that are registered to other names, assigned earlier in this batch, or (with `probe`) currently
+    accepting connections; each probing round checks all names' current candidates concurrently.
+    """
+    size = end - start
+    taken = { port for port in registry.values() }
+    assigned = {}
+    candidates = {}
+    for name in dict.fromkeys(names):
+        port = registry.get(name)
+        if port is not None and start <= port < end:
+            assigned[name] = port
+        else:
+            candidates[name] = hash_port(name, start, end)
+            taken.discard(port)
+
+    attempts = dict.fromkeys(candidates, 0)
+    while candidates:
+        # Resolve in-batch collisions (in input order), then check the survivors' liveness all at once
+        claimed = {}
+        for name, port in candidates.items():
+            while port in taken or port in claimed:
+                attempts[name] += 1
+                if attempts[name] >= size:
+                    raise click.ClickException(f"No free ports left in [{start}, {end}) for {name}")
+                port = start + (port - start + 1) % size
+            claimed[port] = name
+            candidates[name] = port
+        live = live_ports(claimed, host=host, timeout=timeout) if probe else set()
+        for port, name in claimed.items():
+            if port in live:
+                taken.add(port)
+            else:
+                assigned[name] = registry[name] = port
+                taken.add(port)
+                del candidates[name]
+    return { name: assigned[name] for name in dict.fromkeys(names) }
+
 
 @click.command()
+@click.option('-b', '--batch', is_flag=True, help='Assign collision-free ports to NAMES (or names read from stdin, one per line), persisted in a registry file; prints "<name> <port>" lines')
+@click.option('-H', '--host', default='127.0.0.1', help='-b/--batch: host to probe for ports in use (default: 127.0.0.1)')
+@click.option('-j', '--json', 'as_json', is_flag=True, help='-b/--batch: print a JSON object mapping names to ports')
+@click.option('-P', '--no-probe', is_flag=True, help="-b/--batch: don't skip ports that are currently accepting connections")
 @click.option('-r', '--range', 'port_range', default=f'{2**10}:{2**16}', help='Half-open range of ports to map <name> into')
-@click.argument('name', required=False)
-def main(port_range, name):
-    """Map a string to a port number, by hashing it."""
+@click.option('-R', '--registry', 'registry_path', default=REGISTRY_PATH, help=f'-b/--batch: registry file (default: $HASH_PORT_REGISTRY, or {REGISTRY_PATH})')
+@click.option('-t', '--timeout', type=float, default=0.2, help='-b/--batch: seconds to wait for each round of liveness probes (default: 0.2)')
+@click.option('-x', '--release', is_flag=True, help='-b/--batch: remove NAMES from the registry, instead of assigning them')
+@click.argument('names', nargs=-1)
+def main(batch, host, as_json, no_probe, port_range, registry_path, timeout, release, names):
+    """Map a string to a port number, by hashing it.
+
+    With -b/--batch, many names are assigned at once: each starts at its hash slot, and probes linearly past ports that
+    are registered to other names or in use, so assignments are collision-free and stable across runs.
+    """
     start, end = map(int, port_range.split(':'))
-    name = name or basename(getcwd())
-    digest = sha256(name.encode('utf-8')).hexdigest()
-    port = start + int(digest, 16) % (end - start)
-    print(port)
+    if not batch:
+        if len(names) > 1:
+            raise click.UsageError("Pass -b/--batch to map multiple names")
+        name = names[0] if names else basename(getcwd())
+        print(hash_port(name, start, end))
+        return
+
+    names = list(names) or [ line.strip() for line in sys.stdin if line.strip() ]
+    with locked_registry(registry_path) as registry:
+        if release:
+            for name in names:
+                registry.pop(name, None)
+            return
+        ports = allocate(names, registry, start, end, probe=not no_probe, host=host, timeout=timeout)
+    if as_json:
+        print(json.dumps(ports, indent=2))
+    else:
+        for name, port in ports.items():
+            print(f'{name} {port}')
 
 
 if __name__ == '__main__':
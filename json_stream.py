@@ -0,0 +1,225 @@
+"""Minimal streaming JSON pull-parser (`JsonStream`), for walking large notebooks without materializing them.
+
+Used by `summarize-nb.py` (summaries / batch measurements of cells' outputs) and `jupyter-parse-table.py` (streaming
+one output's HTML lines).
+"""
+import json
+import re
+from typing import BinaryIO, Iterator, Optional
+
+CHUNK_SIZE = 2 ** 16
+
+WS = b' \t\n\r'
+NON_WS = re.compile(rb'[^ \t\n\r]')
+STRING_SPECIAL = re.compile(rb'["\\]')
+STRUCTURAL = re.compile(rb'["\[\]{}]')
+SCALAR_END = re.compile(rb'[ \t\n\r,\]}]')
+# Every UTF-8-encoded codepoint has exactly one byte outside the 0b10xxxxxx "continuation" range
+NON_CONTINUATION = bytes(b for b in range(256) if not 0x80 <= b < 0xC0)
+QUOTE = ord('"')
+OPENERS = b'[{'
+
+
+class JsonStream:
+    """Minimal pull-parser over a binary JSON stream, in the style of `ijson`.
+
+    Callers walk the document with `iter_object`/`iter_array`, and either materialize values (`parse_value`), or scan
+    past them (`skip_value`, `scan_string`) without buffering more than a chunk at a time.
+    """
+
+    def __init__(self, fd: BinaryIO, chunk_size: int = CHUNK_SIZE):
+        self.fd = fd
+        self.chunk_size = chunk_size
+        self.buf = bytearray()
+        self.pos = 0
+        self.base = 0  # Offset (in the stream) of `buf[0]`
+        self.mark = None  # While set, `buf[mark:]` is retained (for `parse_value`)
+        self.eof = False
+
+    @property
+    def offset(self) -> int:
+        return self.base + self.pos
+
+    def error(self, msg: str) -> ValueError:
+        return ValueError(f'{msg} at offset {self.offset}')
+
+    def fill(self, n: int = 1) -> bool:
+        """Ensure at least `n` unread bytes are buffered; return `False` if EOF prevents it."""
+        buf = self.buf
+        if len(buf) - self.pos >= n:
+            return True
+        while len(buf) - self.pos < n and not self.eof:
+            chunk = self.fd.read(self.chunk_size)
+            if not chunk:
+                self.eof = True
+                break
+            drop = self.pos if self.mark is None else self.mark
+            if drop:
+                del buf[:drop]
+                self.base += drop
+                self.pos -= drop
+                if self.mark is not None:
+                    self.mark = 0
+            buf.extend(chunk)
+        return len(buf) - self.pos >= n
+
+    def peek(self) -> bytes:
+        """Skip whitespace, and return the next byte (without consuming it); `b''` at EOF."""
+        buf, pos = self.buf, self.pos
+        if pos < len(buf) and buf[pos] not in WS:
+            return bytes(buf[pos:pos + 1])
+        while self.fill():
+            m = NON_WS.search(self.buf, self.pos)
+            if m:
+                self.pos = m.start()
+                return bytes(self.buf[self.pos:self.pos + 1])
+            self.pos = len(self.buf)
+        return b''
+
+    def expect(self, ch: bytes):
+        c = self.peek()
+        if c != ch:
+            raise self.error(f'Expected {ch!r}, found {c!r}')
+        self.pos += 1
+
+    def iter_object(self) -> Iterator[str]:
+        """Yield each key of an object, leaving the stream positioned at its value.
+
+        Values the caller doesn't consume are skipped.
+        """
+        self.expect(b'{')
+        if self.peek() == b'}':
+            self.pos += 1
+            return
+        while True:
+            key = self.parse_value()
+            self.expect(b':')
+            self.peek()
+            start = self.offset
+            yield key
+            if self.offset == start:
+                self.skip_value()
+            c = self.peek()
+            self.pos += 1
+            if c == b'}':
+                return
+            elif c != b',':
+                raise self.error(f"Expected ',' or '}}', found {c!r}")
+
+    def iter_array(self) -> Iterator[int]:
+        """Yield the index of each element of an array, leaving the stream positioned at that element.
+
+        Elements the caller doesn't consume are skipped.
+        """
+        self.expect(b'[')
+        if self.peek() == b']':
+            self.pos += 1
+            return
+        idx = 0
+        while True:
+            self.peek()
+            start = self.offset
+            yield idx
+            if self.offset == start:
+                self.skip_value()
+            c = self.peek()
+            self.pos += 1
+            if c == b']':
+                return
+            elif c != b',':
+                raise self.error(f"Expected ',' or ']', found {c!r}")
+            idx += 1
+
+    def scan_string(self, keep: int = 0) -> tuple[Optional[str], int]:
+        """Consume a string, returning its first `keep` characters (if `keep` is nonzero) and its length.
+
+        Length is in codepoints (as with jq's `length`, or Python's `len` of the decoded string), computed from the
+        encoded bytes, so the full string is never decoded or held in memory.
+        """
+        self.expect(b'"')
+        length = 0
+        prefix = bytearray() if keep else None
+        while True:
+            if not self.fill():
+                raise self.error('Unterminated string')
+            buf, pos = self.buf, self.pos
+            m = STRING_SPECIAL.search(buf, pos)
+            end = m.start() if m else len(buf)
+            seg = buf[pos:end]
+            # Keep accumulating until `keep + 1` codepoints have started, so the first `keep` are complete
+            if prefix is not None and length <= keep:
+                prefix += seg
+            length += len(seg) - len(seg.translate(None, NON_CONTINUATION))
+            self.pos = end
+            if not m:
+                continue
+            if buf[end] == QUOTE:
+                self.pos = end + 1
+                break
+            # Backslash escape
+            if not self.fill(2):
+                raise self.error('Unterminated escape')
+            buf, pos = self.buf, self.pos
+            if buf[pos + 1] == ord('u'):
+                if not self.fill(6):
+                    raise self.error('Unterminated escape')
+                buf, pos = self.buf, self.pos
+                esc = buf[pos:pos + 6]
+                # Low surrogates complete a pair whose high surrogate was already counted
+                n = 0 if 0xDC00 <= int(esc[2:], 16) < 0xE000 else 1
+            else:
+                esc = buf[pos:pos + 2]
+                n = 1
+            if prefix is not None and length <= keep:
+                prefix += esc
+            length += n
+            self.pos = pos + len(esc)
+
+        if prefix is None:
+            return None, length
+        # `prefix` may end in a truncated UTF-8 sequence (past the first `keep` codepoints); drop it before decoding
+        text = prefix.decode('utf-8', 'ignore')
+        return json.loads(f'"{text}"')[:keep], length
+
+    def skip_value(self):
+        """Consume a value without materializing it."""
+        c = self.peek()
+        if c == b'"':
+            self.scan_string()
+        elif c and c in OPENERS:
+            self.pos += 1
+            depth = 1
+            while depth:
+                if not self.fill():
+                    raise self.error('Unterminated container')
+                m = STRUCTURAL.search(self.buf, self.pos)
+                if not m:
+                    self.pos = len(self.buf)
+                    continue
+                self.pos = m.start()
+                c = self.buf[self.pos]
+                if c == QUOTE:
+                    self.scan_string()
+                else:
+                    self.pos += 1
+                    depth += 1 if c in OPENERS else -1
+        elif c:
+            # Number, `true`, `false`, or `null`
+            while self.fill():
+                m = SCALAR_END.search(self.buf, self.pos)
+                if m:
+                    self.pos = m.start()
+                    return
+                self.pos = len(self.buf)
+        else:
+            raise self.error('Unexpected EOF')
+
+    def parse_value(self):
+        """Consume and materialize a value."""
+        self.peek()
+        self.mark = self.pos
+        try:
+            self.skip_value()
+            return json.loads(self.buf[self.mark:self.pos])
+        finally:
+            self.mark = None
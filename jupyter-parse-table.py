@@ -3,34 +3,551 @@
 # requires-python = ">=3.10"
 # dependencies = [
 #     "click",
-#     "pandas",
-#     "utz",
+#     "pyarrow",
 # ]
 # ///
+"""Extract an HTML table (e.g. a rendered DataFrame) from a notebook cell's output, as CSV, JSONL, or Parquet.
+
+The output's `text/html` lines are streamed out of the notebook one at a time (by `json_stream.JsonStream`, so neither
+the notebook nor the output is loaded whole), and fed to an incremental parser (`html.parser`), which yields rows as
+each `</tr>` is reached; selected rows are written out immediately, and parsing stops once the requested row range is done. Rowspans and
+colspans are expanded (like `pandas.read_html`), `<thead>` rows form the header, and nothing is imported from pandas or
+lxml.
+
+With -b/--batch, every HTML and `application/vnd.dataresource+json` table in every output of many notebooks is
+extracted (across a process pool, with per-notebook results cached by content; see `nb_cache.py`) into one "long"
+dataset: one row per table cell, keyed by notebook, cell, output, table, and row index.
+"""
+import csv
 import json
-from io import StringIO
+import sys
+from collections import deque
+from html.parser import HTMLParser
+from os.path import splitext
+from typing import Iterable, Iterator, Optional
 
 import click
-import pandas as pd
-from utz import singleton
 
+from json_stream import JsonStream
+from nb_batch import cached_map, find_notebooks
+from nb_cache import open_cache
 
-@click.command()
-@click.option('-c', '--cell-idx', type=int, required=True)
-@click.argument('nb_path')
-def main(cell_idx, nb_path):
+FORMATS = ('csv', 'jsonl', 'parquet')
+PARQUET_BATCH_SIZE = 10_000
+DATARESOURCE_MIMETYPE = 'application/vnd.dataresource+json'
+# `nb_cache` kind for -b/--batch per-notebook results; bump the suffix when their format changes
+BATCH_KIND = 'jupyter-parse-table/batch/1'
+# -b/--batch dataset columns
+BATCH_COLUMNS = ('notebook', 'cell_idx', 'output_idx', 'table_idx', 'mimetype', 'row_idx', 'column', 'value')
+
+
+class TableParser(HTMLParser):
+    """Push-parser collecting the rows of the `table_idx`-th top-level `<table>` (or, if `None`, of every top-level
+    table), as `(table_idx, is_header, cells)` tuples.
+
+    Call `feed` with successive chunks of HTML, and drain `rows` after each; `done` is set after the table's `</table>`.
+    """
+
+    def __init__(self, table_idx: Optional[int] = 0):
+        super().__init__(convert_charrefs=True)
+        self.table_idx = table_idx
+        self.tables_seen = 0
+        self.depth = 0
+        self.in_target = False
+        self.done = False
+        self.current_idx = 0
+        self.in_thead = False
+        self.skip = 0
+        self.rows = []
+        self.row = None
+        self.row_is_header = False
+        self.row_all_th = False
+        self.body_started = False
+        self.cell = None
+        self.cell_span = (1, 1)
+        # Column index → (text, remaining rows) for cells with rowspan > 1
+        self.rowspans = {}
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('style', 'script'):
+            self.skip += 1
+        elif tag == 'table':
+            self.depth += 1
+            if self.depth == 1:
+                self.in_target = self.table_idx is None or self.tables_seen == self.table_idx
+                self.current_idx = self.tables_seen
+                self.tables_seen += 1
+                self.body_started = False
+                self.rowspans = {}
+        if not self.in_target or self.depth != 1:
+            return
+        if tag == 'thead':
+            self.in_thead = True
+        elif tag == 'tr':
+            self.row = []
+            self.row_is_header = self.in_thead
+            self.row_all_th = True
+        elif tag in ('td', 'th') and self.row is not None:
+            attrs = dict(attrs)
+            self.row_all_th = self.row_all_th and tag == 'th'
+            self.cell = []
+            self.cell_span = (span(attrs.get('rowspan')), span(attrs.get('colspan')))
+
+    def handle_endtag(self, tag):
+        if tag in ('style', 'script'):
+            self.skip = max(0, self.skip - 1)
+        elif tag == 'table':
+            if self.depth == 1 and self.in_target:
+                self.end_row()
+                self.in_target = False
+                self.done = self.table_idx is not None
+            self.depth = max(0, self.depth - 1)
+        if not self.in_target or self.depth != 1:
+            return
+        if tag == 'thead':
+            self.in_thead = False
+        elif tag in ('td', 'th'):
+            self.end_cell()
+        elif tag == 'tr':
+            self.end_row()
+
+    def handle_data(self, data):
+        if self.cell is not None and not self.skip:
+            self.cell.append(data)
+
+    def fill_rowspans(self):
+        while len(self.row) in self.rowspans:
+            col = len(self.row)
+            text, remaining = self.rowspans[col]
+            self.row.append(text)
+            if remaining > 1:
+                self.rowspans[col] = (text, remaining - 1)
+            else:
+                del self.rowspans[col]
+
+    def end_cell(self):
+        if self.cell is None:
+            return
+        text = ' '.join(''.join(self.cell).split())
+        rowspan, colspan = self.cell_span
+        self.fill_rowspans()
+        for _ in range(colspan):
+            if rowspan > 1:
+                self.rowspans[len(self.row)] = (text, rowspan - 1)
+            self.row.append(text)
+        self.cell = None
+
+    def end_row(self):
+        self.end_cell()
+        if self.row is None:
+            return
+        self.fill_rowspans()
+        if self.row:
+            # Without a `<thead>`, leading rows of only `<th>`s are header rows
+            is_header = self.row_is_header or (self.row_all_th and not self.body_started)
+            self.body_started = self.body_started or not is_header
+            self.rows.append((self.current_idx, is_header, self.row))
+        self.row = None
+
+
+def span(value: Optional[str]) -> int:
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return 1
+
+
+def iter_table(html_lines: Iterable[str], table_idx: int = 0) -> Iterator[tuple[bool, list[str]]]:
+    """Yield `(is_header, cells)` for each row of the `table_idx`-th top-level table in some HTML (given as lines)."""
+    parser = TableParser(table_idx)
+    for line in html_lines:
+        parser.feed(line)
+        yield from ( (is_header, cells) for _, is_header, cells in parser.rows )
+        parser.rows.clear()
+        if parser.done:
+            return
+    parser.close()
+    yield from ( (is_header, cells) for _, is_header, cells in parser.rows )
+    if not parser.tables_seen > table_idx:
+        raise click.ClickException(f"Table {table_idx} not found ({parser.tables_seen} table(s) in output)")
+
+
+def merge_header(rows: list[list[str]]) -> list[str]:
+    """Collapse multiple header rows (e.g. a DataFrame's column names + index names) into one, joining non-empty parts."""
+    width = max(map(len, rows))
+    return [
+        ' '.join( row[col] for row in rows if col < len(row) and row[col] )
+        for col in range(width)
+    ]
+
+
+def parse_columns(columns: Optional[str], header: list[str]) -> Optional[list[int]]:
+    """Resolve a comma-separated list of column names / indices to indices."""
+    if not columns:
+        return None
+    idxs = []
+    for col in columns.split(','):
+        if col in header:
+            idxs.append(header.index(col))
+        elif col.lstrip('-').isdigit():
+            idx = int(col)
+            if -len(header) <= idx < 0:
+                idx += len(header)
+            elif not 0 <= idx < len(header):
+                raise click.BadParameter(f"Column index {idx} out of range ({len(header)} columns)", param_hint='-C/--columns')
+            idxs.append(idx)
+        else:
+            raise click.BadParameter(f"Column {col!r} not found in {header}", param_hint='-C/--columns')
+    return idxs
+
+
+def parse_range(rows: Optional[str]) -> tuple[int, Optional[int]]:
+    """Parse a `START:END` (either optional) or `N` (just row N) body-row range."""
+    if not rows:
+        return 0, None
+    if ':' not in rows:
+        return int(rows), int(rows) + 1
+    start, end = rows.split(':', 1)
+    return int(start or 0), int(end) if end else None
+
+
+def select_rows(
+    events: Iterator[tuple[bool, list[str]]],
+    columns: Optional[str] = None,
+    rows: Optional[str] = None,
+) -> tuple[list[str], Iterator[list[str]]]:
+    """Split a table's rows into a header and (lazily) selected body rows."""
+    header_rows = []
+    first = None
+    for is_header, cells in events:
+        if is_header:
+            header_rows.append(cells)
+        else:
+            first = cells
+            break
+    header = merge_header(header_rows) if header_rows else [ str(col) for col in range(len(first or [])) ]
+    col_idxs = parse_columns(columns, header)
+    start, end = parse_range(rows)
+
+    def body() -> Iterator[list[str]]:
+        if first is None:
+            return
+        for idx, cells in enumerate(chain_first(first, events)):
+            if end is not None and idx >= end:
+                return
+            if idx < start:
+                continue
+            if col_idxs is not None:
+                cells = [ cells[col] if col < len(cells) else '' for col in col_idxs ]
+            yield cells
+
+    if col_idxs is not None:
+        header = [ header[col] if col < len(header) else str(col) for col in col_idxs ]
+    return header, body()
+
+
+def chain_first(first: list[str], events: Iterator[tuple[bool, list[str]]]) -> Iterator[list[str]]:
+    yield first
+    for _, cells in events:
+        yield cells
+
+
+def write_csv(header: list[str], rows: Iterable[list[str]], fd):
+    writer = csv.writer(fd)
+    writer.writerow(header)
+    writer.writerows(rows)
+
+
+def write_jsonl(header: list[str], rows: Iterable[list[str]], fd):
+    names = dedupe_names(header)
+    for cells in rows:
+        print(json.dumps(dict(zip(names, cells))), file=fd)
+
+
+def write_parquet(header: list[str], rows: Iterable[list[str]], path: str, batch_size: int = PARQUET_BATCH_SIZE):
+    """Write string columns to Parquet, one row group per `batch_size` rows (so memory is bounded by the batch size)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    names = dedupe_names(header)
+    schema = pa.schema([ (name, pa.string()) for name in names ])
+    with pq.ParquetWriter(path, schema) as writer:
+        batch = []
+
+        def flush():
+            columns = [ [ row[col] if col < len(row) else None for row in batch ] for col in range(len(names)) ]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+            batch.clear()
+
+        for cells in rows:
+            batch.append(cells)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+
+def dedupe_names(header: list[str]) -> list[str]:
+    """Make column names unique and non-empty (for JSONL keys / Parquet fields), like pandas' `a`, `a.1`, `Unnamed: 2`."""
+    names = []
+    seen = {}
+    for col, name in enumerate(header):
+        name = name or f'Unnamed: {col}'
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def html_tables(html_lines: Iterable[str]) -> Iterator[tuple[int, list[str], list[list[str]]]]:
+    """Yield `(table_idx, header, rows)` for every top-level table in some HTML."""
+    parser = TableParser(None)
+    for line in html_lines:
+        parser.feed(line)
+    parser.close()
+    tables = {}
+    for table_idx, is_header, cells in parser.rows:
+        tables.setdefault(table_idx, ([], []))[0 if is_header else 1].append(cells)
+    for table_idx, (header_rows, rows) in tables.items():
+        width = max(map(len, header_rows + rows))
+        header = merge_header(header_rows) if header_rows else [ str(col) for col in range(width) ]
+        yield table_idx, dedupe_names(header + [ str(col) for col in range(len(header), width) ]), rows
+
+
+def dataresource_table(resource: dict) -> tuple[list[str], list[list[str]]]:
+    """Header and rows of an `application/vnd.dataresource+json` (Table Schema) output, with values as strings."""
+    names = [ field['name'] for field in resource.get('schema', {}).get('fields', []) ]
+    rows = []
+    for record in resource.get('data', []):
+        rows.append([
+            value if isinstance(value, str) or value is None else json.dumps(value)
+            for value in ( record.get(name) for name in names )
+        ])
+    return names, rows
+
+
+def extract_nb_tables(nb_path: str) -> dict[str, list]:
+    """Every table in a notebook's outputs, as `BATCH_COLUMNS` columns (minus `notebook`), one entry per table cell."""
     with open(nb_path, 'r') as f:
         nb = json.load(f)
-    cells = nb['cells']
-    cell = cells[cell_idx]
-    outputs = cell['outputs']
-    output = singleton(outputs, dedupe=False)
-    data = output['data']
-    html_rows = data['text/html']
-    html = '\n'.join(html_rows)
-    tbls = pd.read_html(StringIO(html))
-    for tbl in tbls:
-        print(tbl)
+    columns = { name: [] for name in BATCH_COLUMNS[1:] }
+
+    def add(cell_idx, output_idx, table_idx, mimetype, header, rows):
+        for row_idx, cells in enumerate(rows):
+            for column, value in zip(header, cells):
+                columns['cell_idx'].append(cell_idx)
+                columns['output_idx'].append(output_idx)
+                columns['table_idx'].append(table_idx)
+                columns['mimetype'].append(mimetype)
+                columns['row_idx'].append(row_idx)
+                columns['column'].append(column)
+                columns['value'].append(value)
+
+    for cell_idx, cell in enumerate(nb.get('cells', [])):
+        for output_idx, output in enumerate(cell.get('outputs', [])):
+            data = output.get('data', {})
+            if DATARESOURCE_MIMETYPE in data:
+                resource = data[DATARESOURCE_MIMETYPE]
+                if isinstance(resource, str):
+                    resource = json.loads(resource)
+                header, rows = dataresource_table(resource)
+                add(cell_idx, output_idx, 0, DATARESOURCE_MIMETYPE, header, rows)
+            elif 'text/html' in data:
+                html = data['text/html']
+                lines = html.splitlines(True) if isinstance(html, str) else html
+                for table_idx, header, rows in html_tables(lines):
+                    add(cell_idx, output_idx, table_idx, 'text/html', header, rows)
+    return columns
+
+
+def try_extract_nb_tables(nb_path: str) -> tuple[Optional[dict[str, list]], Optional[str]]:
+    try:
+        return extract_nb_tables(nb_path), None
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        return None, f'{type(e).__name__}: {e}'
+
+
+def batch_extract(nb_paths: list[str], jobs: Optional[int] = None, cache=None) -> Iterator[tuple[str, dict[str, list]]]:
+    """Yield `(nb_path, columns)` for each notebook (in order); cache misses are extracted across a process pool."""
+    for nb_path, columns, error in cached_map(try_extract_nb_tables, nb_paths, BATCH_KIND, cache=cache, jobs=jobs):
+        if error:
+            print(f'Error extracting tables from {nb_path}: {error}', file=sys.stderr)
+            continue
+        yield nb_path, columns
+
+
+def write_batch(results: Iterable[tuple[str, dict[str, list]]], fmt: str, output_path: str):
+    """Write per-notebook table columns as one dataset (one Parquet row group per notebook)."""
+    if fmt == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([
+            ('notebook', pa.string()),
+            ('cell_idx', pa.int32()),
+            ('output_idx', pa.int32()),
+            ('table_idx', pa.int32()),
+            ('mimetype', pa.string()),
+            ('row_idx', pa.int64()),
+            ('column', pa.string()),
+            ('value', pa.string()),
+        ])
+        with pq.ParquetWriter(output_path, schema) as writer:
+            for nb_path, columns in results:
+                num_values = len(columns['value'])
+                if num_values:
+                    arrays = [ [nb_path] * num_values, *( columns[name] for name in BATCH_COLUMNS[1:] ) ]
+                    writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        return
+
+    fd = sys.stdout if output_path == '-' else open(output_path, 'w', newline='')
+    try:
+        writer = csv.writer(fd) if fmt == 'csv' else None
+        if writer:
+            writer.writerow(BATCH_COLUMNS)
+        for nb_path, columns in results:
+            for row in zip(*( columns[name] for name in BATCH_COLUMNS[1:] )):
+                if writer:
+                    writer.writerow([ nb_path, *row ])
+                else:
+                    print(json.dumps(dict(zip(BATCH_COLUMNS, [ nb_path, *row ]))), file=fd)
+    finally:
+        if fd is not sys.stdout:
+            fd.close()
+
+
+def iter_cells(stream: JsonStream) -> Iterator[int]:
+    """Position `stream` (at the start of a notebook) at each of its cells, in turn."""
+    for key in stream.iter_object():
+        if key == 'cells':
+            yield from stream.iter_array()
+
+
+def cell_html_outputs(stream: JsonStream) -> tuple[int, list[int]]:
+    """Consume a cell, returning its number of outputs, and the indices of those with `text/html` data."""
+    num_outputs = 0
+    html_idxs = []
+    for key in stream.iter_object():
+        if key != 'outputs' or stream.peek() != b'[':
+            continue
+        for output_idx in stream.iter_array():
+            num_outputs += 1
+            for output_key in stream.iter_object():
+                if output_key == 'data' and stream.peek() == b'{':
+                    # Exhaust the keys (skipping their values), so the stream ends up past `data`
+                    if 'text/html' in list(stream.iter_object()):
+                        html_idxs.append(output_idx)
+    return num_outputs, html_idxs
+
+
+def locate_html_output(nb_path: str, cell_idx: int, output_idx: Optional[int] = None) -> tuple[int, int]:
+    """Resolve (possibly negative) cell / output indices to an output with `text/html` data (by default, the cell's only
+    such output), in one streaming pass over the notebook that skips over (rather than parses) outputs."""
+    # For a negative `cell_idx`, keep the last few cells' output info, until the number of cells is known
+    recent = deque(maxlen=-cell_idx) if cell_idx < 0 else None
+    found = None
+    num_cells = 0
+    with open(nb_path, 'rb') as fd:
+        stream = JsonStream(fd)
+        for idx in iter_cells(stream):
+            num_cells = idx + 1
+            if recent is not None:
+                recent.append((idx, cell_html_outputs(stream)))
+            elif idx == cell_idx:
+                found = (idx, cell_html_outputs(stream))
+                break
+    if recent is not None and len(recent) == recent.maxlen:
+        found = recent[0]
+    if found is None:
+        raise click.ClickException(f"Cell {cell_idx} not found ({num_cells} cells)")
+    cell_idx, (num_outputs, html_idxs) = found
+
+    if output_idx is None:
+        if len(html_idxs) != 1:
+            raise click.ClickException(
+                f"Cell {cell_idx} has {len(html_idxs)} HTML outputs{f' ({html_idxs})' if html_idxs else ''}; pass -O/--output-idx"
+            )
+        [output_idx] = html_idxs
+    elif -num_outputs <= output_idx < 0:
+        output_idx += num_outputs
+    if output_idx not in html_idxs:
+        raise click.ClickException(f"Cell {cell_idx} output {output_idx} has no text/html data ({num_outputs} outputs)")
+    return cell_idx, output_idx
+
+
+def iter_html_lines(nb_path: str, cell_idx: int, output_idx: int) -> Iterator[str]:
+    """Stream the `text/html` lines of a cell's output (as located by `locate_html_output`), one line at a time."""
+    with open(nb_path, 'rb') as fd:
+        stream = JsonStream(fd)
+        for idx in iter_cells(stream):
+            if idx != cell_idx:
+                continue
+            for cell_key in stream.iter_object():
+                if cell_key != 'outputs':
+                    continue
+                for idx in stream.iter_array():
+                    if idx != output_idx:
+                        continue
+                    for output_key in stream.iter_object():
+                        if output_key != 'data':
+                            continue
+                        for mimetype in stream.iter_object():
+                            if mimetype != 'text/html':
+                                continue
+                            if stream.peek() == b'[':
+                                for _ in stream.iter_array():
+                                    yield stream.parse_value()
+                            else:
+                                yield from stream.parse_value().splitlines(True)
+                            return
+
+
+@click.command()
+@click.option('-b', '--batch', is_flag=True, help="Extract every table from every output of NB_PATHS (notebooks, directories, or git pathspecs) into one dataset")
+@click.option('-c', '--cell-idx', type=int, help="Index of the cell whose output to parse (required without -b/--batch)")
+@click.option('-C', '--columns', help="Comma-separated column names / indices to output (default: all)")
+@click.option('-f', '--format', 'fmt', type=click.Choice(FORMATS), help="Output format (default: inferred from -o/--output-path's extension, else csv; with -b/--batch, parquet)")
+@click.option('-j', '--jobs', type=int, help='-b/--batch: number of worker processes (default: CPU count)')
+@click.option('--no-cache', is_flag=True, help="-b/--batch: don't read or write the content-hash cache (see `nb_cache.py`)")
+@click.option('-o', '--output-path', default='-', help='Output path ("-", the default: stdout; required for Parquet)')
+@click.option('-O', '--output-idx', type=int, help="Index of the cell output to parse (default: the cell's only output with HTML)")
+@click.option('-r', '--rows', help="Body rows to output: `START:END` (0-based, end-exclusive; either side optional), or `N`")
+@click.option('-t', '--table-idx', type=int, default=0, help="Index of the table within the output (default: 0)")
+@click.argument('nb_paths', nargs=-1)
+def main(batch, cell_idx, columns, fmt, jobs, no_cache, output_path, output_idx, rows, table_idx, nb_paths):
+    """Extract an HTML table from a notebook cell's output (or, with -b/--batch, all tables from many notebooks)."""
+    if not fmt:
+        ext = splitext(output_path)[1].lstrip('.')
+        fmt = ext if ext in FORMATS else 'parquet' if batch else 'csv'
+    if fmt == 'parquet' and output_path == '-':
+        raise click.UsageError("Parquet output requires -o/--output-path")
+
+    if batch:
+        paths = list(find_notebooks(nb_paths or ['.']))
+        with open_cache(not no_cache) as cache:
+            write_batch(batch_extract(paths, jobs=jobs, cache=cache), fmt, output_path)
+        return
+
+    if cell_idx is None:
+        raise click.UsageError("Pass -c/--cell-idx (or -b/--batch)")
+    if len(nb_paths) != 1:
+        raise click.UsageError("Pass exactly one NB_PATH (or -b/--batch)")
+    [nb_path] = nb_paths
+    cell_idx, output_idx = locate_html_output(nb_path, cell_idx, output_idx)
+    html_lines = iter_html_lines(nb_path, cell_idx, output_idx)
+    header, body = select_rows(iter_table(html_lines, table_idx), columns=columns, rows=rows)
+    if fmt == 'parquet':
+        write_parquet(header, body, output_path)
+        return
+    writer = write_csv if fmt == 'csv' else write_jsonl
+    if output_path == '-':
+        writer(header, body, sys.stdout)
+    else:
+        with open(output_path, 'w', newline='') as f:
+            writer(header, body, f)
 
 
 if __name__ == '__main__':
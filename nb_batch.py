@@ -0,0 +1,93 @@
+"""Batch-mode helpers shared by notebook tools (`summarize-nb.py -b`, `jupyter-parse-table.py -b`).
+
+`find_notebooks` expands directories, files, and git pathspecs into `.ipynb` paths; `cached_map` maps a per-notebook
+function over them across a process pool, reusing results cached by notebook content (see `nb_cache.py`).
+"""
+import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from os.path import isdir, isfile, join
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+import click
+
+from nb_cache import NbCache, NullCache
+
+
+def find_notebooks(paths: Iterable[str]) -> Iterator[str]:
+    """Expand directories (recursively, skipping dot-dirs), files, and git pathspecs into `.ipynb` paths.
+
+    Raises `click.UsageError` if pathspecs (args that aren't existing files or dirs) can't be resolved, e.g. outside a
+    git repo.
+    """
+    pathspecs = []
+    for path in paths:
+        if isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames[:] = sorted( d for d in dirnames if not d.startswith('.') )
+                for name in sorted(filenames):
+                    if name.endswith('.ipynb'):
+                        yield join(dirpath, name)
+        elif isfile(path):
+            yield path
+        else:
+            pathspecs.append(path)
+    if pathspecs:
+        proc = subprocess.run(['git', 'ls-files', '-z', '--', *pathspecs], capture_output=True)
+        if proc.returncode:
+            msg = proc.stderr.decode().strip()
+            raise click.UsageError(f"{', '.join(pathspecs)}: not files or dirs, and not resolvable as git pathspecs ({msg})")
+        stdout = proc.stdout
+        for path in stdout.decode().split('\0'):
+            if path.endswith('.ipynb'):
+                yield path
+
+
+def cached_map(
+    fn: Callable[[str], tuple[Any, Optional[str]]],
+    nb_paths: list[str],
+    kind: str,
+    cache: NbCache | NullCache | None = None,
+    params: tuple = (),
+    jobs: Optional[int] = None,
+) -> Iterator[tuple[str, Any, Optional[str]]]:
+    """Yield `(nb_path, value, error)` for each notebook (in order), where `fn(nb_path)` returns `(value, error)`.
+
+    Results are cached under `kind`, keyed by notebook content and `params`; errors aren't cached. Notebooks whose stat
+    info the cache doesn't know are hashed in the process pool, and cache misses are then computed there too (`fn` must
+    be picklable). Cached values are only loaded as they're yielded, so large batches stream.
+    """
+    cache = cache or NullCache()
+    num_jobs = jobs or os.cpu_count() or 1
+    executor = None
+
+    def pmap(f, items: list):
+        nonlocal executor
+        if num_jobs == 1 or len(items) <= 1:
+            return map(f, items)
+        if executor is None:
+            executor = ProcessPoolExecutor(num_jobs)
+        # Small chunks keep workers balanced (notebook sizes vary wildly), while amortizing IPC for small notebooks
+        return executor.map(f, items, chunksize=max(1, len(items) // (num_jobs * 16)))
+
+    try:
+        keys = cache.keys(nb_paths, *params, map_fn=pmap)
+        cached = cache.cached(kind, keys)
+        misses = [ nb_path for nb_path, key in zip(nb_paths, keys) if key not in cached ]
+        computed = pmap(fn, misses)
+        for nb_path, key in zip(nb_paths, keys):
+            if key in cached:
+                hit = cache.get(kind, key)
+                if hit is not None:
+                    yield nb_path, hit, None
+                    continue
+                # Evicted since (e.g. by this batch's own `put`s); compute it here
+                value, error = fn(nb_path)
+            else:
+                value, error = next(computed)
+            if error is None:
+                cache.put(kind, key, value)
+            yield nb_path, value, error
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
@@ -0,0 +1,226 @@
+"""Persistent, size-capped cache of notebook-derived results (summaries, parsed tables), keyed by file content.
+
+Entries are keyed by the file's git blob id (computed in-process, so it matches `git hash-object`), which is itself
+cached against the file's (path, mtime, size, inode), so unchanged files aren't even re-read. Values are pickled into a
+SQLite database, and least-recently-used entries are evicted once their total size exceeds a cap.
+
+Environment:
+    NB_CACHE_PATH: SQLite file to use (default: $XDG_CACHE_HOME/py-helpers/nb-cache.sqlite)
+    NB_CACHE_MAX_BYTES: total size (of pickled values) to evict down to (default: 256MiB)
+"""
+import os
+import pickle
+import sqlite3
+import time
+from hashlib import sha1
+from os.path import dirname, expanduser, join, realpath
+from typing import Any, Callable, Optional
+
+CACHE_PATH = os.environ.get('NB_CACHE_PATH') or join(
+    os.environ.get('XDG_CACHE_HOME') or expanduser('~/.cache'),
+    'py-helpers',
+    'nb-cache.sqlite',
+)
+MAX_BYTES = int(os.environ.get('NB_CACHE_MAX_BYTES') or 2 ** 28)
+CHUNK_SIZE = 2 ** 20
+# Files modified this recently may change again within the same mtime tick ("racily clean", in git's terms), so their
+# stat info isn't trusted to identify their content
+RACY_NS = 2 * 10 ** 9
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS stats (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    ino INTEGER NOT NULL,
+    oid TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    atime REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+);
+CREATE INDEX IF NOT EXISTS entries_atime ON entries (atime);
+'''
+
+
+def blob_id(path: str) -> str:
+    """Compute a file's git blob id (as `git hash-object` would), streaming its contents."""
+    size = os.stat(path).st_size
+    h = sha1(f'blob {size}\0'.encode())
+    with open(path, 'rb') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def try_blob_id(path: str) -> Optional[str]:
+    try:
+        return blob_id(path)
+    except OSError:
+        return None
+
+
+class NbCache:
+    """SQLite-backed LRU cache; see module docstring."""
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = MAX_BYTES):
+        os.makedirs(dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript(SCHEMA)
+        self.max_bytes = max_bytes
+        self.oids = {}
+
+    def cached_content_id(self, path: str, st: os.stat_result) -> Optional[str]:
+        """Return `path`'s (a realpath's) git blob id if it was hashed before with the same stat info, else `None`."""
+        if path in self.oids:
+            return self.oids[path]
+        row = self.db.execute('SELECT mtime_ns, size, ino, oid FROM stats WHERE path = ?', (path,)).fetchone()
+        if row and row[:3] == (st.st_mtime_ns, st.st_size, st.st_ino):
+            self.oids[path] = row[3]
+            return row[3]
+        return None
+
+    def record_content_id(self, path: str, st: os.stat_result, oid: str):
+        if time.time_ns() - st.st_mtime_ns > RACY_NS:
+            self.db.execute(
+                'INSERT OR REPLACE INTO stats VALUES (?, ?, ?, ?, ?)',
+                (path, st.st_mtime_ns, st.st_size, st.st_ino, oid),
+            )
+        self.oids[path] = oid
+
+    def content_id(self, path: str) -> str:
+        """Return `path`'s git blob id, reusing a previous hash if its stat info is unchanged."""
+        path = realpath(path)
+        st = os.stat(path)
+        oid = self.cached_content_id(path, st)
+        if oid is None:
+            oid = blob_id(path)
+            self.record_content_id(path, st, oid)
+        return oid
+
+    def key(self, path: str, *params) -> Optional[str]:
+        """Build a cache key from `path`'s content and any parameters the cached value depends on.
+
+        Returns `None` (don't cache) if `path` can't be read.
+        """
+        try:
+            oid = self.content_id(path)
+        except OSError:
+            return None
+        return ':'.join([ oid, *map(str, params) ])
+
+    def keys(self, paths: list[str], *params, map_fn: Callable = map) -> list[Optional[str]]:
+        """`key` for many paths; files whose stat info isn't cached are hashed via `map_fn` (e.g. a process pool's
+        `map`), rather than one at a time in this process."""
+        real_paths = [ realpath(path) for path in paths ]
+        oids = {}
+        unknown = {}
+        for path in dict.fromkeys(real_paths):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            oid = self.cached_content_id(path, st)
+            if oid is None:
+                unknown[path] = st
+            else:
+                oids[path] = oid
+        for path, oid in zip(unknown, map_fn(try_blob_id, list(unknown))):
+            if oid is not None:
+                self.record_content_id(path, unknown[path], oid)
+                oids[path] = oid
+        return [ ':'.join([ oids[path], *map(str, params) ]) if path in oids else None for path in real_paths ]
+
+    def cached(self, kind: str, keys: list[Optional[str]]) -> set[str]:
+        """Which of `keys` have `kind` entries (without loading their values)."""
+        present = set()
+        wanted = [ key for key in dict.fromkeys(keys) if key is not None ]
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(wanted), 500):
+            chunk = wanted[start:start + 500]
+            rows = self.db.execute(
+                f'SELECT key FROM entries WHERE kind = ? AND key IN ({", ".join("?" * len(chunk))})',
+                (kind, *chunk),
+            )
+            present.update( key for (key,) in rows )
+        return present
+
+    def get(self, kind: str, key: Optional[str]) -> Optional[Any]:
+        if key is None:
+            return None
+        row = self.db.execute('SELECT value FROM entries WHERE kind = ? AND key = ?', (kind, key)).fetchone()
+        if row is None:
+            return None
+        self.db.execute('UPDATE entries SET atime = ? WHERE kind = ? AND key = ?', (time.time(), kind, key))
+        return pickle.loads(row[0])
+
+    def put(self, kind: str, key: Optional[str], value: Any):
+        if key is None:
+            return
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        self.db.execute(
+            'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+            (kind, key, blob, len(blob), time.time()),
+        )
+        self.evict()
+
+    def evict(self):
+        """Delete least-recently-used entries until their total size is within `max_bytes`."""
+        [total] = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for kind, key, size in self.db.execute('SELECT kind, key, size FROM entries ORDER BY atime'):
+            if total <= self.max_bytes:
+                break
+            evicted.append((kind, key))
+            total -= size
+        self.db.executemany('DELETE FROM entries WHERE kind = ? AND key = ?', evicted)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class NullCache:
+    """No-op stand-in for `NbCache` (e.g. for `--no-cache`)."""
+
+    def key(self, path: str, *params) -> Optional[str]:
+        return None
+
+    def keys(self, paths: list[str], *params, map_fn: Callable = map) -> list[Optional[str]]:
+        return [ None ] * len(paths)
+
+    def cached(self, kind: str, keys: list[Optional[str]]) -> set[str]:
+        return set()
+
+    def get(self, kind: str, key: Optional[str]) -> Optional[Any]:
+        return None
+
+    def put(self, kind: str, key: Optional[str], value: Any):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+def open_cache(enabled: bool = True) -> NbCache | NullCache:
+    return NbCache() if enabled else NullCache()
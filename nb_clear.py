@@ -0,0 +1,185 @@
+#!/usr/bin/env -S uv run
+# /// script
+# requires-python = ">=3.10"
+# dependencies = [
+#     "click",
+# ]
+# ///
+"""Clear Jupyter notebooks' outputs and execution counts, without nbconvert.
+
+Lightweight equivalent of `jupyter nbconvert --clear-output --inplace`: same cell changes as nbconvert's
+`ClearOutputPreprocessor`, serialized the way `nbformat` writes notebooks. Many notebooks are processed in one process
+(or a process pool); files that are already clean aren't rewritten, and the rest are replaced atomically (write to a
+temporary file, then rename).
+"""
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from os.path import basename, dirname
+
+import click
+
+err = partial(print, file=sys.stderr)
+
+# Output-related cell metadata removed by nbconvert's `ClearOutputPreprocessor`
+REMOVE_METADATA_FIELDS = ('collapsed', 'scrolled')
+# Besides `text/*`, mimetypes whose string values `nbformat` splits into line-arrays
+SPLIT_MIMETYPES = { 'application/javascript', 'image/svg+xml' }
+
+CLEAN = 'clean'
+CLEARED = 'cleared'
+ERROR = 'error'
+
+
+def is_json_mimetype(mimetype: str) -> bool:
+    return mimetype == 'application/json' or (mimetype.startswith('application/') and mimetype.endswith('+json'))
+
+
+def split_lines(value: str | list) -> list:
+    """Re-split a multiline string (or line-array, whose elements may contain newlines) as `nbformat` does."""
+    if isinstance(value, list):
+        value = ''.join(value)
+    return value.splitlines(True)
+
+
+def normalize_mimebundle(bundle: dict):
+    """Rejoin line-arrays and re-split text values, as `nbformat` does on read + write."""
+    for mimetype, value in bundle.items():
+        if is_json_mimetype(mimetype):
+            continue
+        if isinstance(value, list) and all( isinstance(line, str) for line in value ):
+            value = bundle[mimetype] = ''.join(value)
+        if isinstance(value, str) and (mimetype.startswith('text/') or mimetype in SPLIT_MIMETYPES):
+            bundle[mimetype] = split_lines(value)
+
+
+def clear_nb(nb: dict) -> dict:
+    """Clear code cells' outputs and execution counts (in place), normalizing multiline strings like `nbformat`."""
+    for cell in nb.get('cells', []):
+        if cell.get('cell_type') == 'code':
+            cell['outputs'] = []
+            cell['execution_count'] = None
+            metadata = cell.get('metadata')
+            if metadata:
+                for field in REMOVE_METADATA_FIELDS:
+                    metadata.pop(field, None)
+        source = cell.get('source')
+        if isinstance(source, (str, list)):
+            cell['source'] = split_lines(source)
+        for attachment in cell.get('attachments', {}).values():
+            normalize_mimebundle(attachment)
+    return nb
+
+
+def dumps_nb(nb: dict) -> str:
+    """Serialize a notebook the way `nbformat.write` does."""
+    return json.dumps(nb, sort_keys=True, indent=1, ensure_ascii=False) + '\n'
+
+
+def clear_bytes(data: bytes) -> bytes:
+    """Clear a serialized notebook's outputs; returns the cleaned serialization."""
+    return dumps_nb(clear_nb(json.loads(data))).encode()
+
+
+def default_mode() -> int:
+    """Permissions a plain `open(path, 'w')` would create a file with (0o666, less the umask)."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def write_atomic(path: str, data: bytes):
+    """Replace `path` with `data` via a temporary file in the same directory, preserving its permissions (or, for a new
+    file, using the umask's defaults, rather than `mkstemp`'s 0600)."""
+    fd, tmp_path = tempfile.mkstemp(dir=dirname(path) or '.', prefix=f'.{basename(path)}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        try:
+            mode = os.stat(path).st_mode & 0o7777
+        except FileNotFoundError:
+            mode = default_mode()
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def clear_file(in_path: str, out_path: str | None = None, check: bool = False) -> str:
+    """Clear `in_path`'s outputs, writing to `out_path` (default: in place).
+
+    Returns `CLEAN` if the notebook was already clean (in which case an in-place file isn't rewritten), else `CLEARED`.
+    With `check`, nothing is written.
+    """
+    with open(in_path, 'rb') as f:
+        data = f.read()
+    cleared = clear_bytes(data)
+    status = CLEAN if cleared == data else CLEARED
+    if check:
+        return status
+    if out_path == '-':
+        sys.stdout.buffer.write(cleared)
+    elif out_path and out_path != in_path:
+        write_atomic(out_path, cleared)
+    elif status == CLEARED:
+        write_atomic(in_path, cleared)
+    return status
+
+
+def try_clear_file(in_path: str, check: bool = False) -> tuple[str, str | None]:
+    """Wrap `clear_file`, returning `(status, error message)` so one bad notebook doesn't abort a batch."""
+    try:
+        return clear_file(in_path, check=check), None
+    except (OSError, ValueError) as e:
+        return ERROR, str(e)
+
+
+@click.command()
+@click.option('-c', '--check', is_flag=True, help="Don't write anything; list notebooks that clearing would rewrite (those with outputs or execution counts, and any not serialized as `nbformat.write` would, even without outputs), and exit 1 if there are any")
+@click.option('-j', '--jobs', type=int, default=1, help='Number of worker processes (default: 1, i.e. clean in this process; 0: one per CPU)')
+@click.option('-o', '--output-path', help='Write the cleaned notebook here ("-" for stdout) instead of in place (requires exactly one NB_PATH)')
+@click.option('-q', '--quiet', is_flag=True, help="Don't log cleared notebooks to stderr")
+@click.argument('nb_paths', nargs=-1, required=True)
+def main(check, jobs, output_path, quiet, nb_paths):
+    """Clear outputs and execution counts of one or more notebooks (in place, by default)."""
+    if output_path:
+        if len(nb_paths) != 1:
+            raise click.UsageError('-o/--output-path requires exactly one NB_PATH')
+        clear_file(nb_paths[0], output_path)
+        return
+
+    fn = partial(try_clear_file, check=check)
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(nb_paths) == 1:
+        results = map(fn, nb_paths)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(jobs)
+        results = executor.map(fn, nb_paths, chunksize=max(1, len(nb_paths) // (jobs * 4)))
+
+    num_cleared = num_errors = 0
+    try:
+        for nb_path, (status, error) in zip(nb_paths, results):
+            if error:
+                num_errors += 1
+                err(f'Error clearing {nb_path}: {error}')
+            elif status == CLEARED:
+                num_cleared += 1
+                if check:
+                    print(nb_path)
+                elif not quiet:
+                    err(f'Cleared {nb_path}')
+    finally:
+        if executor:
+            executor.shutdown()
+
+    if num_errors or (check and num_cleared):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.9"
+# dependencies = []
+# ///
+"""Discover installed Python interpreters (pyenv, uv-managed, and on $PATH), and resolve version specs against them.
+
+Interpreters are indexed per directory (`$PYENV_ROOT/versions`, uv's managed-Python dir, and each $PATH dir), and the
+index is cached: a directory is only re-listed when its mtime changes, and an interpreter is only re-queried (run, to
+print its version) when its executable's mtime changes. Versions of pyenv and uv installs are parsed from their
+directory names where possible, so a warm lookup doesn't run any interpreters at all.
+
+Usage (stdlib-only, so any `python3` can run it, including from shell helpers):
+
+    py_interpreters.py 3.11 3.12 3.13   # "<full version>\t<path>" per spec
+    py_interpreters.py -V 3.12          # "3.12.7"
+    py_interpreters.py -l               # all discovered interpreters
+
+Environment:
+    PY_INTERPRETERS_CACHE: JSON file to cache the index in (default: $XDG_CACHE_HOME/py-helpers/interpreters.json)
+"""
+import json
+import os
+import re
+import sys
+from argparse import ArgumentParser
+from os.path import dirname, expanduser, isdir, join, realpath
+from typing import NamedTuple, Optional
+
+CACHE_PATH = os.environ.get('PY_INTERPRETERS_CACHE') or join(
+    os.environ.get('XDG_CACHE_HOME') or expanduser('~/.cache'),
+    'py-helpers',
+    'interpreters.json',
+)
+CACHE_VERSION = 1
+
+# Preference among interpreters with the same version (uv prefers its managed installs, then ones found on $PATH)
+SOURCES = ('uv', 'pyenv', 'system')
+
+# `3.12.7`, `3.13.0rc1`, `3.13.0+freethreaded`
+VERSION_RGX = re.compile(r'(?P<version>\d+\.\d+\.\d+(?:(?:a|b|rc)\d+)?)(?P<variant>\+\w+)?')
+# uv-managed install dirs: `cpython-3.12.7-linux-x86_64-gnu`, `pypy-3.10.14-linux-x86_64-gnu`
+UV_DIR_RGX = re.compile(r'^(?P<impl>[a-z]+)-' + VERSION_RGX.pattern + r'-')
+# pyenv version dirs named by a plain CPython version
+PYENV_DIR_RGX = re.compile(r'^' + VERSION_RGX.pattern + r'$')
+# Executables on $PATH worth querying
+PATH_EXE_RGX = re.compile(r'^(?:python|python3|python3\.\d+|pypy3?(?:\.\d+)?)$')
+# `3.12`, `3.12.x`, `312`, `12` (→ 3.12), `cpython3.12`, `cpython@3.12`, `pypy3.10`, `python3.12`
+SPEC_RGX = re.compile(r'^(?:(?P<impl>cpython|pypy|python)[-@]?)?(?P<version>\d+(?:\.\d+)*)?(?:\.x)?$')
+
+QUERY_CODE = "import sys; print(getattr(getattr(sys, 'implementation', None), 'name', 'cpython'), sys.version.split()[0])"
+
+
+class Interpreter(NamedTuple):
+    path: str
+    version: str
+    implementation: str
+    source: str
+
+    @property
+    def version_key(self) -> tuple:
+        m = re.match(r'(\d+)\.(\d+)\.(\d+)(?:(a|b|rc)(\d+))?', self.version)
+        if not m:
+            return ()
+        major, minor, micro, pre, pre_num = m.groups()
+        # Final releases sort after their pre-releases
+        pre_key = (0, pre, int(pre_num)) if pre else (1, '', 0)
+        return (int(major), int(minor), int(micro), pre_key)
+
+
+def mtime_ns(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def query_interpreter(path: str) -> Optional[tuple[str, str]]:
+    """`(implementation, version)` reported by running an interpreter."""
+    import subprocess
+    try:
+        out = subprocess.run([path, '-c', QUERY_CODE], capture_output=True, text=True, timeout=10).stdout.split()
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if len(out) != 2:
+        return None
+    impl, version = out
+    return impl, version
+
+
+def pyenv_root() -> str:
+    return os.environ.get('PYENV_ROOT') or expanduser('~/.pyenv')
+
+
+def uv_python_dir() -> str:
+    return os.environ.get('UV_PYTHON_INSTALL_DIR') or join(
+        os.environ.get('XDG_DATA_HOME') or expanduser('~/.local/share'),
+        'uv',
+        'python',
+    )
+
+
+def source_dirs() -> list[tuple[str, str]]:
+    """`(source, dir)` pairs to index, in preference order."""
+    dirs = [ ('uv', uv_python_dir()), ('pyenv', join(pyenv_root(), 'versions')) ]
+    shims = join(pyenv_root(), 'shims')
+    seen = set()
+    for entry in os.environ.get('PATH', '').split(os.pathsep):
+        if not entry or entry in seen or entry == shims:
+            continue
+        seen.add(entry)
+        # Skip virtualenvs' bin dirs; they're not interpreters to build venvs from
+        if os.path.exists(join(dirname(entry), 'pyvenv.cfg')):
+            continue
+        dirs.append(('system', entry))
+    return dirs
+
+
+def list_dir(source: str, path: str) -> list[tuple[str, Optional[tuple[str, str]]]]:
+    """Candidate executables in an indexed dir, with `(implementation, version)` if it's known from the path alone."""
+    try:
+        names = sorted(os.listdir(path))
+    except OSError:
+        return []
+    candidates = []
+    if source == 'system':
+        for name in names:
+            if PATH_EXE_RGX.match(name):
+                exe = join(path, name)
+                if os.access(exe, os.X_OK) and not isdir(exe):
+                    candidates.append((exe, None))
+    elif source == 'uv':
+        for name in names:
+            m = UV_DIR_RGX.match(name)
+            if not m:
+                continue
+            exe = join(path, name, 'bin', 'python3')
+            if os.access(exe, os.X_OK):
+                known = (m['impl'], m['version']) if not m['variant'] else None
+                candidates.append((exe, known))
+    else:
+        for name in names:
+            exe = next(
+                ( join(path, name, 'bin', exe_name) for exe_name in ('python3', 'python') if os.access(join(path, name, 'bin', exe_name), os.X_OK) ),
+                None,
+            )
+            if exe is None:
+                continue
+            m = PYENV_DIR_RGX.match(name)
+            candidates.append((exe, ('cpython', m['version']) if m and not m['variant'] else None))
+    return candidates
+
+
+class Index:
+    """Interpreters found in each indexed dir, cached in a JSON file.
+
+    Cache layout: `{"version": 1, "dirs": {dir: {"mtime_ns": int, "interpreters": {exe: {"mtime_ns", "realpath",
+    "implementation", "version"}}}}}`.
+    """
+
+    def __init__(self, path: Optional[str] = CACHE_PATH, refresh: bool = False):
+        self.path = path
+        self.dirs = {}
+        self.dirty = False
+        if path and not refresh:
+            try:
+                with open(path, 'r') as f:
+                    cache = json.load(f)
+                if cache.get('version') == CACHE_VERSION:
+                    self.dirs = cache['dirs']
+            except (OSError, ValueError, KeyError):
+                pass
+
+    def scan(self) -> list[Interpreter]:
+        """All interpreters, in preference order of source, deduplicated by real path."""
+        pending = []
+        scanned = []
+        for source, path in source_dirs():
+            dir_mtime = mtime_ns(path)
+            if dir_mtime is None:
+                continue
+            cached = self.dirs.get(path)
+            if cached and cached['mtime_ns'] == dir_mtime:
+                entries = cached['interpreters']
+                # Executables replaced in place (e.g. `pyenv install -f`) don't change their dir's mtime
+                stale = [ exe for exe, entry in entries.items() if mtime_ns(exe) != entry['mtime_ns'] ]
+                for exe in stale:
+                    pending.append((path, exe))
+            else:
+                old = cached['interpreters'] if cached else {}
+                entries = {}
+                for exe, known in list_dir(source, path):
+                    exe_mtime = mtime_ns(exe)
+                    if exe in old and old[exe]['mtime_ns'] == exe_mtime:
+                        entries[exe] = old[exe]
+                    elif known:
+                        impl, version = known
+                        entries[exe] = dict(mtime_ns=exe_mtime, realpath=realpath(exe), implementation=impl, version=version)
+                    else:
+                        entries[exe] = None
+                        pending.append((path, exe))
+                self.dirs[path] = dict(mtime_ns=dir_mtime, interpreters=entries)
+                self.dirty = True
+            scanned.append((source, path))
+
+        if pending:
+            # Run unknown interpreters concurrently (each costs a process startup); warm lookups never get here, so they
+            # skip importing this
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(min(len(pending), os.cpu_count() or 4)) as executor:
+                results = executor.map(query_interpreter, [ exe for _, exe in pending ])
+                for (path, exe), result in zip(pending, results):
+                    entries = self.dirs[path]['interpreters']
+                    if result is None:
+                        entries.pop(exe, None)
+                    else:
+                        impl, version = result
+                        entries[exe] = dict(mtime_ns=mtime_ns(exe), realpath=realpath(exe), implementation=impl, version=version)
+            self.dirty = True
+
+        interpreters = []
+        seen = set()
+        for source, path in scanned:
+            for exe, entry in self.dirs[path]['interpreters'].items():
+                if entry is None or entry['realpath'] in seen:
+                    continue
+                seen.add(entry['realpath'])
+                interpreters.append(Interpreter(path=exe, version=entry['version'], implementation=entry['implementation'], source=source))
+        return interpreters
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        os.makedirs(dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(dict(version=CACHE_VERSION, dirs=self.dirs), f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+def parse_spec(spec: str) -> Optional[tuple[Optional[str], tuple[int, ...]]]:
+    """`(implementation, version prefix)` for a spec like `3.12`, `3.12.x`, `12`, or `pypy3.10` (`None` if invalid)."""
+    m = SPEC_RGX.match(spec.strip().lower())
+    if not m:
+        return None
+    impl = m['impl']
+    impl = None if impl in (None, 'python') else impl
+    version = tuple( int(part) for part in m['version'].split('.') ) if m['version'] else ()
+    if len(version) == 1 and version[0] >= 100:
+        # `312` → 3.12
+        version = (version[0] // 100, version[0] % 100)
+    elif len(version) == 1 and version[0] >= 10:
+        # `12` → 3.12, as `find_venv` does
+        version = (3, version[0])
+    return impl, version
+
+
+def resolve(spec: str, interpreters: list[Interpreter]) -> Optional[Interpreter]:
+    """Newest interpreter matching `spec` (preferring uv-managed, then pyenv, then $PATH ones, for equal versions)."""
+    parsed = parse_spec(spec)
+    if parsed is None:
+        return None
+    impl, prefix = parsed
+    matches = [
+        interpreter
+        for interpreter in interpreters
+        if (impl is None or interpreter.implementation == impl)
+        and interpreter.version_key
+        and interpreter.version_key[:len(prefix)] == prefix
+    ]
+    if not matches:
+        return None
+    if len(prefix) < 3:
+        # Bare `3.13` shouldn't resolve to a pre-release when a final release is installed
+        finals = [ interpreter for interpreter in matches if interpreter.version_key[3][0] == 1 ]
+        matches = finals or matches
+    return max(
+        matches,
+        key=lambda interpreter: (interpreter.version_key, -SOURCES.index(interpreter.source)),
+    )
+
+
+def resolve_all(specs: list[str], cache_path: Optional[str] = CACHE_PATH, refresh: bool = False) -> list[Optional[Interpreter]]:
+    index = Index(cache_path, refresh=refresh)
+    interpreters = index.scan()
+    try:
+        index.save()
+    except OSError as e:
+        sys.stderr.write(f"Couldn't save interpreter cache {cache_path}: {e}\n")
+    return [ resolve(spec, interpreters) for spec in specs ]
+
+
+def main():
+    parser = ArgumentParser(description='Resolve Python version specs (e.g. 3.12) to installed interpreters, using a cached index.')
+    parser.add_argument('-j', '--json', action='store_true', help='Print a JSON array of objects (spec, version, path, implementation, source)')
+    parser.add_argument('-l', '--list', action='store_true', help='List all discovered interpreters')
+    parser.add_argument('-n', '--no-cache', action='store_true', help="Don't read or write the cache")
+    parser.add_argument('-r', '--refresh', action='store_true', help='Ignore cached entries (re-scan and re-query everything)')
+    parser.add_argument('-V', '--versions-only', action='store_true', help='Print only full versions (unresolved specs are echoed as-is)')
+    parser.add_argument('specs', nargs='*', help='Version specs: 3.12, 3.12.x, 3.12.7, 12, pypy3.10, …')
+    args = parser.parse_args()
+
+    cache_path = None if args.no_cache else CACHE_PATH
+    if args.list or not args.specs:
+        index = Index(cache_path, refresh=args.refresh)
+        interpreters = sorted(index.scan(), key=lambda interpreter: interpreter.version_key, reverse=True)
+        index.save()
+        if args.json:
+            print(json.dumps([ interpreter._asdict() for interpreter in interpreters ], indent=2))
+        else:
+            for interpreter in interpreters:
+                print(f'{interpreter.version}\t{interpreter.implementation}\t{interpreter.source}\t{interpreter.path}')
+        return
+
+    resolved = resolve_all(args.specs, cache_path, refresh=args.refresh)
+    unresolved = [ spec for spec, interpreter in zip(args.specs, resolved) if interpreter is None ]
+    for spec in unresolved:
+        sys.stderr.write(f"Warning: no installed interpreter matches Python {spec}\n")
+    if args.json:
+        print(json.dumps([
+            dict(spec=spec, **(interpreter._asdict() if interpreter else dict(path=None, version=None, implementation=None, source=None)))
+            for spec, interpreter in zip(args.specs, resolved)
+        ], indent=2))
+    else:
+        for spec, interpreter in zip(args.specs, resolved):
+            if args.versions_only:
+                print(interpreter.version if interpreter else spec.removesuffix('.x'))
+            else:
+                print(f'{interpreter.version}\t{interpreter.path}' if interpreter else f'{spec.removesuffix(".x")}\t')
+    if unresolved:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
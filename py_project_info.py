@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.9"
+# dependencies = []
+# ///
+"""Resolve a Python project's environment facts (env type, conda env name, uv groups/extras, …) in one pass.
+
+Replaces per-fact probing in shell helpers (`get_python_env_type`/`py_activate` in python-env-type.sh, and
+`uv_info`/`uv_groups`/`uv_extras` in .uv-rc), which each re-read `.python-env`, `environment.yml`, or
+`pyproject.toml` with `grep`/`awk`/`yq`. Manifests are parsed with `tomllib` (and PyYAML, if installed), and the facts
+are cached per project dir, keyed by the mtimes of every file they depend on.
+
+Output is `py_<fact>=<value>` lines for `eval` (lists as arrays), or JSON (-j):
+
+    eval "$(py_project_info.py)"; echo "$py_env_type" "${py_groups[@]}"
+
+Environment:
+    PY_PROJECT_INFO_CACHE_DIR: cache dir (default: $XDG_CACHE_HOME/py-helpers/project-info)
+"""
+import json
+import os
+import re
+import sys
+from argparse import ArgumentParser
+from os.path import expanduser, isdir, join, realpath
+from shlex import quote
+from typing import Optional
+
+CACHE_DIR = os.environ.get('PY_PROJECT_INFO_CACHE_DIR') or join(
+    os.environ.get('XDG_CACHE_HOME') or expanduser('~/.cache'),
+    'py-helpers',
+    'project-info',
+)
+CACHE_VERSION = 1
+
+PYTHON_ENV = '.python-env'
+CONDA_FILES = ('environment.yml', 'conda.yaml')
+PYPROJECT = 'pyproject.toml'
+UV_LOCK = 'uv.lock'
+PYTHON_VERSION = '.python-version'
+VENV_CURRENT = join('.venv', 'current')
+# Every file whose contents or existence the facts depend on
+INPUTS = (PYTHON_ENV, *CONDA_FILES, UV_LOCK, PYPROJECT, 'requirements.txt', 'setup.py', PYTHON_VERSION, '.venv', VENV_CURRENT)
+
+YAML_NAME_RGX = re.compile(r'^name:\s*["\']?([^"\'#\s]+)', re.MULTILINE)
+
+
+def input_mtimes(project: str) -> dict[str, Optional[int]]:
+    mtimes = {}
+    for name in INPUTS:
+        try:
+            mtimes[name] = os.stat(join(project, name)).st_mtime_ns
+        except OSError:
+            mtimes[name] = None
+    return mtimes
+
+
+def read_text(path: str) -> Optional[str]:
+    try:
+        with open(path, 'r') as f:
+            return f.read()
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def conda_env_name(path: str) -> Optional[str]:
+    """Top-level `name:` of a conda environment file."""
+    text = read_text(path)
+    if text is None:
+        return None
+    try:
+        import yaml
+    except ImportError:
+        m = YAML_NAME_RGX.search(text)
+        return m[1] if m else None
+    try:
+        env = yaml.safe_load(text)
+    except yaml.YAMLError:
+        return None
+    name = env.get('name') if isinstance(env, dict) else None
+    return str(name) if name is not None else None
+
+
+def load_pyproject(path: str) -> dict:
+    text = read_text(path)
+    if text is None:
+        return {}
+    try:
+        import tomllib
+    except ImportError:
+        try:
+            import tomli as tomllib
+        except ImportError:
+            # Python < 3.11 without tomli: exit non-zero, so shell callers fall back to their own parsing
+            sys.stderr.write(f"Can't parse {path}: needs Python ≥3.11 (or tomli)\n")
+            sys.exit(2)
+    try:
+        return tomllib.loads(text)
+    except tomllib.TOMLDecodeError as e:
+        sys.stderr.write(f"{path}: {e}\n")
+        return {}
+
+
+def count_lines(path: str) -> Optional[int]:
+    try:
+        with open(path, 'rb') as f:
+            return sum( chunk.count(b'\n') for chunk in iter(lambda: f.read(2 ** 20), b'') )
+    except OSError:
+        return None
+
+
+def resolve(project: str) -> dict:
+    """All facts for a project dir (see `get_python_env_type` for the env-type precedence)."""
+    exists = lambda name: os.path.exists(join(project, name))
+    conda_file = next(( name for name in CONDA_FILES if exists(name) ), None)
+
+    declared = read_text(join(project, PYTHON_ENV))
+    if declared is not None:
+        env_type = declared.splitlines()[0].strip() if declared.strip() else ''
+    elif conda_file:
+        env_type = 'conda'
+    elif exists(UV_LOCK):
+        env_type = 'uv'
+    else:
+        env_type = 'venv'
+
+    if env_type.startswith('conda:'):
+        conda_env = env_type.removeprefix('conda:')
+    elif env_type == 'conda' and conda_file:
+        conda_env = conda_env_name(join(project, conda_file))
+    else:
+        conda_env = None
+
+    pyproject = load_pyproject(join(project, PYPROJECT)) if exists(PYPROJECT) else {}
+    metadata = pyproject.get('project', {})
+    python_version = read_text(join(project, PYTHON_VERSION))
+    venv_current = read_text(join(project, VENV_CURRENT))
+    return dict(
+        env_type=env_type,
+        conda_env=conda_env,
+        conda_file=conda_file,
+        project_name=metadata.get('name'),
+        requires_python=metadata.get('requires-python'),
+        python_version=python_version.strip() if python_version else None,
+        groups=sorted(pyproject.get('dependency-groups', {})),
+        extras=sorted(metadata.get('optional-dependencies', {})),
+        has_pyproject=exists(PYPROJECT),
+        uv_lock_lines=count_lines(join(project, UV_LOCK)) if exists(UV_LOCK) else None,
+        venv_exists=isdir(join(project, '.venv')),
+        venv_current=venv_current.strip() if venv_current else None,
+    )
+
+
+def cache_path(project: str) -> str:
+    from zlib import crc32
+    return join(CACHE_DIR, f'{crc32(realpath(project).encode()):08x}.json')
+
+
+def cached_resolve(project: str, use_cache: bool = True) -> dict:
+    mtimes = input_mtimes(project)
+    path = cache_path(project)
+    if use_cache:
+        try:
+            with open(path, 'r') as f:
+                cached = json.load(f)
+            if cached.get('version') == CACHE_VERSION and cached.get('project') == realpath(project) and cached.get('mtimes') == mtimes:
+                return cached['facts']
+        except (OSError, ValueError):
+            pass
+    facts = resolve(project)
+    if use_cache:
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(dict(version=CACHE_VERSION, project=realpath(project), mtimes=mtimes, facts=facts), f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            sys.stderr.write(f"Couldn't cache project info in {path}: {e}\n")
+    return facts
+
+
+def shell_lines(facts: dict, prefix: str = 'py_') -> list[str]:
+    """`name=value` assignments: lists as arrays, booleans as 1/'' (for `[[ -n ... ]]`), missing values as ''."""
+    lines = []
+    for name, value in facts.items():
+        if isinstance(value, list):
+            rhs = f'({" ".join( quote(str(v)) for v in value )})'
+        elif isinstance(value, bool):
+            rhs = '1' if value else "''"
+        elif value is None:
+            rhs = "''"
+        else:
+            rhs = quote(str(value))
+        lines.append(f'{prefix}{name}={rhs}')
+    return lines
+
+
+def main():
+    parser = ArgumentParser(description="Print a Python project's environment facts, as shell assignments (default) or JSON.")
+    parser.add_argument('-j', '--json', action='store_true', help='Print JSON instead of shell assignments')
+    parser.add_argument('-n', '--no-cache', action='store_true', help="Don't read or write the cache")
+    parser.add_argument('-p', '--prefix', default='py_', help='Shell variable prefix (default: py_)')
+    parser.add_argument('project', nargs='?', default='.', help='Project directory (default: .)')
+    args = parser.parse_args()
+
+    facts = cached_resolve(args.project, use_cache=not args.no_cache)
+    if args.json:
+        print(json.dumps(facts, indent=2))
+    else:
+        print('\n'.join(shell_lines(facts, args.prefix)))
+
+
+if __name__ == '__main__':
+    main()
@@ -13,8 +13,32 @@
 #   echo "venv" > .python-env       # Use standard venv
 #   echo "conda:myproject" > .python-env  # Use specific conda env
 
+python_env_type_dir="$(cd "$(dirname "${BASH_SOURCE[0]:-$0}")" && pwd)"
+
+# Variables py_project_facts sets; callers declare them first (`local "${py_project_fact_vars[@]}"`), so the facts land
+# in the caller's scope instead of the interactive shell
+py_project_fact_vars=(
+    py_env_type py_conda_env py_conda_file py_project_name py_requires_python py_python_version
+    py_groups py_extras py_has_pyproject py_uv_lock_lines py_venv_exists py_venv_current
+)
+
+# Load the current directory's project facts (env type, conda env name, uv groups/extras, …) into py_* variables, from
+# one (mtime-cached) py_project_info.py call; returns 1 if it's unavailable, so callers fall back to their own parsing
+py_project_facts() {
+    local facts
+    command -v python3 &>/dev/null && [[ -f "$python_env_type_dir/py_project_info.py" ]] || return 1
+    facts="$(python3 "$python_env_type_dir/py_project_info.py" 2>/dev/null)" || return 1
+    eval "$facts"
+}
+
 # Get the Python environment type for current directory
 get_python_env_type() {
+    local "${py_project_fact_vars[@]}"
+    if py_project_facts; then
+        echo "$py_env_type"
+        return 0
+    fi
+
     # Check explicit declaration first
     if [[ -f .python-env ]]; then
         cat .python-env | head -1 | tr -d '\n'
@@ -35,12 +59,18 @@ get_python_env_type() {
 
 # Activate the appropriate Python environment based on type
 py_activate() {
-    local env_type=$(get_python_env_type)
+    local env_type env_name env_file facts= "${py_project_fact_vars[@]}"
+    if py_project_facts; then
+        facts=1
+        env_type="$py_env_type"
+    else
+        env_type=$(get_python_env_type)
+    fi
 
     case "$env_type" in
         conda:*)
             # Format: conda:env_name
-            local env_name="${env_type#conda:}"
+            env_name="${env_type#conda:}"
             if command -v conda &>/dev/null; then
                 echo "Activating conda environment: $env_name" >&2
                 conda activate "$env_name"
@@ -50,35 +80,34 @@ py_activate() {
             fi
             ;;
         conda)
-            # Look for env name in environment.yml
-            if [[ -f environment.yml ]]; then
-                local env_name=$(grep "^name:" environment.yml | awk '{print $2}')
-                if [[ -n "$env_name" ]]; then
-                    echo "Activating conda environment: $env_name" >&2
-                    conda activate "$env_name"
-                else
-                    echo "Error: No environment name found in environment.yml" >&2
-                    return 1
-                fi
-            elif [[ -f conda.yaml ]]; then
-                local env_name=$(grep "^name:" conda.yaml | awk '{print $2}')
-                if [[ -n "$env_name" ]]; then
-                    echo "Activating conda environment: $env_name" >&2
-                    conda activate "$env_name"
-                else
-                    echo "Error: No environment name found in conda.yaml" >&2
-                    return 1
-                fi
+            # Look for env name in environment.yml (or conda.yaml)
+            if [[ -n "$facts" ]]; then
+                env_file="$py_conda_file"
+                env_name="$py_conda_env"
             else
+                if [[ -f environment.yml ]]; then
+                    env_file=environment.yml
+                elif [[ -f conda.yaml ]]; then
+                    env_file=conda.yaml
+                fi
+                [[ -n "$env_file" ]] && env_name=$(grep "^name:" "$env_file" | awk '{print $2}')
+            fi
+            if [[ -z "$env_file" ]]; then
                 echo "Error: Conda environment specified but no environment.yml or conda.yaml found" >&2
                 return 1
+            elif [[ -n "$env_name" ]]; then
+                echo "Activating conda environment: $env_name" >&2
+                conda activate "$env_name"
+            else
+                echo "Error: No environment name found in $env_file" >&2
+                return 1
             fi
             ;;
         uv|venv)
             # Use venv with PATH (same handling for both)
             if [[ -d .venv/bin ]]; then
                 export PATH="$(pwd)/.venv/bin:$PATH"
-                echo "Added .venv/bin to PATH ($(get_python_env_type) mode)" >&2
+                echo "Added .venv/bin to PATH ($env_type mode)" >&2
                 python --version >&2
             elif [[ ! -d .venv ]]; then
                 echo "No .venv found, creating with default Python..." >&2
@@ -162,6 +191,7 @@ alias pyei=py_env_info
 alias pyet=set_python_env_type
 
 # Export functions for use in other scripts
+export -f py_project_facts
 export -f get_python_env_type
 export -f py_activate
 export -f set_python_env_type
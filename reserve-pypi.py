@@ -15,22 +15,39 @@ Usage:
 Environment:
     PYPI_TOKEN: PyPI API token for authentication (production)
     TEST_PYPI_TOKEN: TestPyPI API token for authentication (testing)
+    RESERVE_PYPI_GITHUB_URL: GitHub base URL, for resolving/verifying `user/repo` (default: https://github.com)
+    RESERVE_PYPI_GITLAB_URL: GitLab base URL, for resolving/verifying `user/[group/]repo` (default: https://gitlab.com)
+    RESERVE_PYPI_CACHE_TTL: Seconds to cache repository checks for (default: 600; 0 disables the cache)
 """
 
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
+import http.client
+import json
 import os
 from pathlib import Path
 import re
 import sys
 import tempfile
+import threading
+import time
 import shutil
 import subprocess
 import webbrowser
-from urllib.request import Request, urlopen
+from typing import Optional
+from urllib.parse import urljoin, urlsplit
 
 err = partial(print, file=sys.stderr)
 
+GITHUB_URL = os.environ.get("RESERVE_PYPI_GITHUB_URL", "https://github.com").rstrip("/")
+GITLAB_URL = os.environ.get("RESERVE_PYPI_GITLAB_URL", "https://gitlab.com").rstrip("/")
+USER_AGENT = "reserve-pypi/1.0"
+TIMEOUT = 5
+MAX_REDIRECTS = 5
+CACHE_TTL = float(os.environ.get("RESERVE_PYPI_CACHE_TTL", 600))
+CACHE_PATH = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "py-helpers" / "reserve-pypi-repos.json"
+
 
 def get_tracking_remote() -> str | None:
     """Get the remote name from the current branch's upstream tracking branch."""
@@ -114,52 +131,157 @@ def get_repo_url_from_remote(remote_name: str) -> str | None:
 def parse_repo_path(path: str) -> str | None:
     """
     Parse a repository path and return full URL.
-    - user/repo -> GitHub (verify it exists)
+    - user/repo -> GitHub (verify it exists), else GitLab
     - user/group/repo -> GitLab
     - https://... -> pass through if valid
+    All candidate URLs are verified concurrently.
     """
     # Already a full URL
-    if path.startswith("https://"):
-        return path if verify_repo_exists(path) else None
-
-    # Count path segments
-    segments = path.split('/')
-
-    if len(segments) == 2:
-        # Try GitHub first
-        gh_url = f"https://github.com/{path}"
-        if verify_repo_exists(gh_url):
-            return gh_url
-        # Fall back to GitLab
-        gl_url = f"https://gitlab.com/{path}"
-        if verify_repo_exists(gl_url):
-            return gl_url
-    elif len(segments) >= 3:
-        # Assume GitLab for 3+ segments
-        gl_url = f"https://gitlab.com/{path}"
-        if verify_repo_exists(gl_url):
-            return gl_url
+    if path.startswith(("https://", "http://")):
+        candidates = [path]
+    else:
+        # Count path segments
+        segments = path.split('/')
+        if len(segments) == 2:
+            # Prefer GitHub, fall back to GitLab
+            candidates = [f"{GITHUB_URL}/{path}", f"{GITLAB_URL}/{path}"]
+        elif len(segments) >= 3:
+            # Assume GitLab for 3+ segments
+            candidates = [f"{GITLAB_URL}/{path}"]
+        else:
+            return None
+
+    exists = verify_repos(candidates)
+    return next((url for url in candidates if exists[url]), None)
+
+
+class ConnectionPool:
+    """Idle keep-alive HTTP(S) connections, per (scheme, host, port), shared by verification threads."""
+
+    def __init__(self, timeout: float = TIMEOUT):
+        self.timeout = timeout
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    def _get(self, key: tuple[str, str, int | None]) -> http.client.HTTPConnection:
+        with self.lock:
+            conns = self.idle.get(key)
+            if conns:
+                return conns.pop()
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return cls(host, port, timeout=self.timeout)
+
+    def _put(self, key: tuple[str, str, int | None], conn: http.client.HTTPConnection):
+        with self.lock:
+            self.idle.setdefault(key, []).append(conn)
+
+    def status(self, method: str, url: str) -> int:
+        """Status of `method url`, following redirects; a reused connection the server closed is retried once."""
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            key = (parts.scheme, parts.hostname, parts.port)
+            target = parts.path or "/"
+            if parts.query:
+                target += f"?{parts.query}"
+            for attempt in range(2):
+                conn = self._get(key)
+                try:
+                    conn.request(method, target, headers={"User-Agent": USER_AGENT})
+                    response = conn.getresponse()
+                    # Drain the body, so the connection can be reused
+                    response.read()
+                    break
+                except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                    conn.close()
+                    if attempt:
+                        raise
+                except Exception:
+                    conn.close()
+                    raise
+            if response.will_close:
+                conn.close()
+            else:
+                self._put(key, conn)
+            location = response.getheader("Location")
+            if response.status in (301, 302, 303, 307, 308) and location:
+                url = urljoin(url, location)
+                continue
+            return response.status
+        raise http.client.HTTPException(f"Too many redirects: {url}")
+
+    def close(self):
+        with self.lock:
+            for conns in self.idle.values():
+                for conn in conns:
+                    conn.close()
+            self.idle.clear()
+
+
+def load_repo_cache() -> dict:
+    """URL → (exists, checked_at) for checks younger than CACHE_TTL."""
+    if CACHE_TTL <= 0:
+        return {}
+    try:
+        with open(CACHE_PATH) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    now = time.time()
+    return {url: entry for url, entry in cache.items() if now - entry[1] < CACHE_TTL}
 
+
+def save_repo_cache(cache: dict):
+    if CACHE_TTL <= 0:
+        return
+    try:
+        CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = CACHE_PATH.with_name(f"{CACHE_PATH.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, CACHE_PATH)
+    except OSError as e:
+        err(f"Warning: couldn't cache repository checks in {CACHE_PATH}: {e}")
+
+
+def check_repo(pool: ConnectionPool, url: str) -> Optional[bool]:
+    """HEAD `url` (falling back to GET if HEAD is inconclusive); whether it exists (200) or not (404/410), or None if
+    neither request gave a definite answer (transport errors, 5xx, rate limits, …)."""
+    for method in ("HEAD", "GET"):
+        try:
+            status = pool.status(method, url)
+        except (OSError, http.client.HTTPException):
+            continue
+        if status in (200, 404, 410):
+            return status == 200
     return None
 
 
+def verify_repos(urls: list[str]) -> dict[str, bool]:
+    """Check whether repositories exist at each URL, concurrently over pooled connections (and via the disk cache).
+
+    Only definite answers are cached; URLs that couldn't be checked count as missing, and are re-checked next time."""
+    cache = load_repo_cache()
+    results = {url: cache[url][0] for url in urls if url in cache}
+    pending = [url for url in dict.fromkeys(urls) if url not in results]
+    if pending:
+        pool = ConnectionPool()
+        try:
+            with ThreadPoolExecutor(len(pending)) as executor:
+                checked = dict(zip(pending, executor.map(partial(check_repo, pool), pending)))
+        finally:
+            pool.close()
+        results.update({url: bool(exists) for url, exists in checked.items()})
+        now = time.time()
+        definite = {url: [exists, now] for url, exists in checked.items() if exists is not None}
+        if definite:
+            save_repo_cache({**cache, **definite})
+    return results
+
+
 def verify_repo_exists(url: str) -> bool:
     """Check if a repository exists at the given URL."""
-    try:
-        # Try a HEAD request first (faster)
-        request = Request(url, method='HEAD')
-        request.add_header('User-Agent', 'reserve-pypi/1.0')
-        with urlopen(request, timeout=5) as response:
-            return response.status == 200
-    except:
-        try:
-            # Fallback to GET
-            request = Request(url)
-            request.add_header('User-Agent', 'reserve-pypi/1.0')
-            with urlopen(request, timeout=5) as response:
-                return response.status == 200
-        except:
-            return False
+    return verify_repos([url])[url]
 
 
 def create_minimal_package(package_name, description=None, repo_url=None):
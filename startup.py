@@ -1,10 +1,245 @@
 # Set this to run on Python REPL startup:
 #
 # export PYTHONSTARTUP=$HOME/.rc/py/startup.py
+#
+# Names exported by `utz` are resolved lazily: the first time the REPL looks up one of them, it's imported (from the
+# stdlib module that defines it, where possible, otherwise from `utz` itself, which then binds all of utz's names), so
+# startup costs about as much as a bare interpreter. Names are listed in a cache file, rebuilt (with an eager
+# `from utz import *`) when utz or the interpreter changes.
+#
+# Lazy names aren't in `__main__` until first used, so bare `dir()` and tab completion don't show them until then;
+# `dir(__builtins__)` lists them. This file runs in the REPL's namespace, and removes its own helpers when done.
+#
+# `python startup.py --importtime` reports what bare, lazy, and eager startups cost.
+
+import os
+import sys
+
+UTZ_NAMES_CACHE_DIR = os.environ.get('PY_STARTUP_CACHE_DIR') or os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+    'py-helpers',
+    'startup',
+)
+
+
+def _utz_names_cache():
+    """Path and validity key of the utz-names cache for this interpreter (`None` if utz isn't installed)."""
+    from zlib import crc32
+    # Scan `sys.path` directly (`importlib.util` costs about as much as the rest of a bare startup); fall back to
+    # `find_spec` for installs only meta-path finders know about (e.g. some editable installs)
+    for entry in sys.path:
+        origin = os.path.join(entry or os.getcwd(), 'utz', '__init__.py')
+        if os.path.isfile(origin):
+            break
+    else:
+        from importlib.util import find_spec
+        spec = find_spec('utz')
+        if spec is None or not spec.origin:
+            return None
+        origin = spec.origin
+    key = f'{origin}\t{os.stat(origin).st_mtime_ns}\t{sys.version}'
+    return os.path.join(UTZ_NAMES_CACHE_DIR, f'utz-names-{crc32(origin.encode()):08x}.tsv'), key
+
+
+def _read_utz_names(path, key):
+    """`{name: (module, attr)}` from the cache, or `None` if it's missing or stale."""
+    try:
+        with open(path, 'r') as f:
+            if f.readline().rstrip('\n') != key:
+                return None
+            names = {}
+            for line in f:
+                name, module, attr = line.rstrip('\n').split('\t')
+                names[name] = (module, attr)
+            return names
+    except (OSError, ValueError):
+        return None
+
+
+def _write_utz_names(path, key, utz):
+    """Record where each of utz's names can be imported from: a stdlib module that defines it, else `utz`."""
+    from types import ModuleType
+    stdlib = sys.stdlib_module_names
+    std_modules = [
+        (mod_name, mod)
+        for mod_name, mod in list(sys.modules.items())
+        if mod is not None and mod_name.partition('.')[0] in stdlib
+    ]
+    lines = [ key ]
+    for name in dir(utz):
+        if name.startswith('_'):
+            continue
+        obj = getattr(utz, name)
+        source = ('utz', name)
+        if isinstance(obj, ModuleType):
+            if obj.__name__.partition('.')[0] in stdlib:
+                source = (obj.__name__, '')
+        else:
+            module = getattr(obj, '__module__', None)
+            candidates = [ (module, sys.modules.get(module)) ] if isinstance(module, str) and module in sys.modules else []
+            candidates += std_modules
+            for mod_name, mod in candidates:
+                if mod_name.partition('.')[0] in stdlib and getattr(mod, name, None) is obj:
+                    source = (mod_name, name)
+                    break
+        lines.append('\t'.join((name, *source)))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(tmp_path, path)
+
+
+class _LazyBuiltins(dict):
+    """`__builtins__` for `__main__`, which imports lazy names on first lookup (and binds them in `__main__`).
+
+    The REPL falls back to `__builtins__` for names missing from `__main__`'s globals, and looks them up with
+    `__getitem__` when it's not exactly a `dict`, so `__missing__` here acts as a module-level `__getattr__` for
+    `__main__`. Real builtins are copied in up front (except those lazy names shadow, as `import *` would): some lookups
+    (e.g. `__import__`, by `import` statements) read this dict directly, and never reach `__missing__`.
+    """
+
+    def __init__(self, names, namespace):
+        import builtins
+        super().__init__( (name, value) for name, value in vars(builtins).items() if name not in names )
+        self.names = names
+        self.namespace = namespace
+
+    def _import_utz(self):
+        # Imported here: this file removes its module-level imports from `__main__` once installed
+        import builtins
+        import sys
+        import time
+        start = time.perf_counter()
+        import utz
+        for name in self.names:
+            if name not in self.namespace:
+                self.namespace[name] = getattr(utz, name)
+        self.names = {}
+        sys.stderr.write(f"Imported utz ({(time.perf_counter() - start) * 1000:.0f}ms)\n")
+        # Done with lazy lookups; hand `__main__` the real builtins back
+        self.namespace['__builtins__'] = builtins
+
+    def __missing__(self, name):
+        source = self.names.get(name)
+        if source is None:
+            # Not a builtin (those are already here) or a lazy name: the REPL raises `NameError`
+            raise KeyError(name)
+        module, attr = source
+        if module != 'utz':
+            from importlib import import_module
+            try:
+                value = import_module(module)
+                if attr:
+                    value = getattr(value, attr)
+                self.namespace[name] = value
+                return value
+            except (ImportError, AttributeError):
+                pass
+        self._import_utz()
+        return self.namespace[name]
+
+    def keys(self):
+        import builtins
+        return list(dict.fromkeys([ *dir(builtins), *self.names ]))
+
+    def __dir__(self):
+        return self.keys()
+
+    def __getattr__(self, name):
+        # Code that treats `__builtins__` as the `builtins` module
+        import builtins
+        return getattr(builtins, name)
+
+
+def _install():
+    """Bind utz's names in `__main__` (lazily, if they're cached); returns them."""
+    import __main__
+    cache = _utz_names_cache()
+    if cache is None:
+        sys.stderr.write("utz not found\n")
+        return set()
+    path, key = cache
+    names = _read_utz_names(path, key)
+    if names is None:
+        # First run (or utz / Python changed): import eagerly, and record utz's names for next time
+        import utz
+        names = [ name for name in dir(utz) if not name.startswith('_') ]
+        for name in names:
+            vars(__main__)[name] = getattr(utz, name)
+        try:
+            _write_utz_names(path, key, utz)
+        except OSError as e:
+            sys.stderr.write(f"Couldn't cache utz names: {e}\n")
+        sys.stderr.write("Imported utz\n")
+        return set(names)
+    vars(__main__)['__builtins__'] = _LazyBuiltins(names, vars(__main__))
+    return set(names)
+
+
+def _importtime_report(argv):
+    """Compare bare, lazy (this file), and eager (`from utz import *`) startup times, via `-X importtime`."""
+    from argparse import ArgumentParser
+    import re
+    import statistics
+    import subprocess
+    import time
+
+    parser = ArgumentParser(prog='startup.py --importtime', description=_importtime_report.__doc__)
+    parser.add_argument('-n', '--runs', type=int, default=5, help='Runs per mode; the median is reported (default: 5)')
+    parser.add_argument('-t', '--top', type=int, default=15, help='Show the N most expensive imports of the eager startup (default: 15)')
+    args = parser.parse_args(argv)
+
+    startup = os.path.abspath(__file__)
+    modes = {
+        'bare': 'pass',
+        'lazy': f'__file__ = {startup!r}; exec(compile(open(__file__).read(), __file__, "exec"))',
+        'eager': 'from utz import *',
+    }
+    line_rgx = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+    eager_imports = None
+    print(f'{"mode":<6} {"wall ms":>8} {"import ms":>10} {"modules":>8}')
+    for mode, code in modes.items():
+        walls, totals = [], []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            proc = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', code],
+                capture_output=True,
+                text=True,
+                env={ **os.environ, 'PYTHONSTARTUP': '' },
+            )
+            walls.append((time.perf_counter() - start) * 1000)
+            imports = [
+                (int(m[1]), int(m[2]), len(m[3]), m[4])
+                for line in proc.stderr.splitlines()
+                if (m := line_rgx.match(line))
+            ]
+            # Top-level imports' cumulative times sum to the total
+            totals.append(sum( cum for _, cum, indent, _ in imports if indent == 1 ) / 1000)
+        if mode == 'eager':
+            eager_imports = imports
+        print(f'{mode:<6} {statistics.median(walls):>8.1f} {statistics.median(totals):>10.1f} {len(imports):>8}')
+
+    if eager_imports and args.top:
+        print(f'\nMost expensive imports (eager):\n{"self ms":>8} {"cum ms":>8}  module')
+        for self_us, cum_us, _, module in sorted(eager_imports, key=lambda imp: -imp[0])[:args.top]:
+            print(f'{self_us / 1000:>8.1f} {cum_us / 1000:>8.1f}  {module}')
+
 
-try:
-    from utz import *
-    err("Imported utz")
-except ImportError:
-    import sys
-    sys.stderr.write("utz not found\n")
+if __name__ == '__main__' and sys.argv[1:2] == ['--importtime']:
+    _importtime_report(sys.argv[2:])
+elif __name__ == '__main__':
+    _utz_names = set()
+    try:
+        _utz_names = _install()
+    except ImportError:
+        sys.stderr.write("utz not found\n")
+    # Don't leave this file's helpers and imports in the REPL's namespace (unless utz exports the same names)
+    for _name in (
+        'os', 'sys', 'UTZ_NAMES_CACHE_DIR', '_utz_names_cache', '_read_utz_names', '_write_utz_names', '_LazyBuiltins',
+        '_install', '_importtime_report',
+    ):
+        if _name not in _utz_names:
+            globals().pop(_name, None)
+    del _name, _utz_names
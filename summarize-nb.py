@@ -0,0 +1,277 @@
+#!/usr/bin/env -S uv run
+# /// script
+# requires-python = ">=3.10"
+# dependencies = [
+#     "click",
+# ]
+# ///
+#
+# Streaming port of `summarize-nb.jq`: print each cell of a Jupyter notebook, with `outputs[].data` values replaced by
+# `{top5, length[, totalLength]}` summaries (see `summarize-nb.jq` for an example).
+#
+# The notebook is parsed incrementally, in fixed-size chunks: large base64 strings (e.g. "image/png") and line-arrays
+# (e.g. 17MB "text/html" outputs) are scanned without being materialized, keeping only running counts, so peak memory is
+# bounded by the chunk size and the largest non-output cell field, not the notebook size.
+#
+# With `-b/--batch`, arguments are directories, files, or git pathspecs; every matching `*.ipynb` is measured in a
+# process pool, and one JSONL record per notebook is streamed (serialized bytes per mimetype, largest outputs, heaviest
+# cells), followed by a `{"total": …}` record aggregating all of them.
+#
+# Results for notebook files (not stdin) are cached by content (see `nb_cache.py`); pass `--no-cache` to bypass it.
+import heapq
+import json
+import os
+import sys
+from functools import partial
+from typing import BinaryIO, Iterable, Iterator, Optional
+
+import click
+
+from nb_batch import cached_map, find_notebooks
+from json_stream import CHUNK_SIZE, JsonStream
+from nb_cache import NbCache, NullCache, open_cache
+
+TOP_N = 5
+# `nb_cache` kinds; bump the suffix when the cached values' format changes
+SUMMARY_KIND = 'summarize-nb/cells/1'
+WEIGH_KIND = 'summarize-nb/weigh/1'
+
+def jq_length(value) -> int:
+    """Mirror jq's `length` builtin."""
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        raise ValueError(f'boolean ({json.dumps(value)}) has no length')
+    if isinstance(value, (int, float)):
+        return abs(value)
+    return len(value)
+
+
+def summarize_data(stream: JsonStream) -> dict:
+    """Summarize one `outputs[].data` value (a string or line-array), without materializing it."""
+    c = stream.peek()
+    if c == b'"':
+        top, length = stream.scan_string(keep=TOP_N)
+        return dict(top5=top, length=length)
+    elif c == b'[':
+        top = []
+        length = 0
+        total_length = None  # jq's `add` of an empty array is `null`
+        for idx in stream.iter_array():
+            if idx < TOP_N:
+                elem = stream.parse_value()
+                top.append(elem)
+                n = jq_length(elem)
+            elif stream.peek() == b'"':
+                _, n = stream.scan_string()
+            else:
+                n = jq_length(stream.parse_value())
+            length += 1
+            total_length = n if total_length is None else total_length + n
+        return dict(top5=top, length=length, totalLength=total_length)
+    else:
+        # E.g. "application/json" objects; jq can't slice these, so only `length` is reported
+        value = stream.parse_value()
+        if value is None:
+            return dict(top5=None, length=0)
+        return dict(length=jq_length(value))
+
+
+def summarize_output(stream: JsonStream) -> dict:
+    output = {}
+    for key in stream.iter_object():
+        if key == 'data' and stream.peek() == b'{':
+            output[key] = { mimetype: summarize_data(stream) for mimetype in stream.iter_object() }
+        else:
+            output[key] = stream.parse_value()
+    output['data'] = output.get('data') or {}
+    return output
+
+
+def summarize_cell(stream: JsonStream) -> dict:
+    cell = {}
+    for key in stream.iter_object():
+        if key == 'outputs' and stream.peek() == b'[':
+            cell[key] = [ summarize_output(stream) for _ in stream.iter_array() ]
+        else:
+            cell[key] = stream.parse_value()
+    cell['outputs'] = cell.get('outputs') or []
+    return cell
+
+
+def summarize_cells(fd: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+    """Yield summarized cells from a notebook file, one at a time."""
+    stream = JsonStream(fd, chunk_size=chunk_size)
+    for key in stream.iter_object():
+        if key == 'cells':
+            for _ in stream.iter_array():
+                yield summarize_cell(stream)
+
+
+# Non-`data` output fields that hold output payloads, and the pseudo-mimetypes they're tallied under
+PAYLOAD_KEYS = { 'text': 'stream', 'traceback': 'error' }
+
+
+def measure(stream: JsonStream) -> int:
+    """Skip a value, returning its serialized size (in bytes)."""
+    stream.peek()
+    start = stream.offset
+    stream.skip_value()
+    return stream.offset - start
+
+
+def weigh_nb(nb_path: str, top_n: int = TOP_N) -> dict:
+    """Measure the serialized size of each cell's outputs (by mimetype) in a notebook, without materializing them."""
+    mimetypes = {}
+    values = []  # (bytes, cell idx, output idx, mimetype)
+    cells = []  # (bytes, cell idx)
+    num_outputs = 0
+    with open(nb_path, 'rb') as fd:
+        stream = JsonStream(fd)
+        for key in stream.iter_object():
+            if key != 'cells':
+                continue
+            for cell_idx in stream.iter_array():
+                cell_bytes = 0
+                for cell_key in stream.iter_object():
+                    if cell_key != 'outputs' or stream.peek() != b'[':
+                        continue
+                    for output_idx in stream.iter_array():
+                        num_outputs += 1
+                        start = stream.offset
+                        for output_key in stream.iter_object():
+                            if output_key == 'data' and stream.peek() == b'{':
+                                items = [ (mimetype, measure(stream)) for mimetype in stream.iter_object() ]
+                            elif output_key in PAYLOAD_KEYS:
+                                items = [ (PAYLOAD_KEYS[output_key], measure(stream)) ]
+                            else:
+                                continue
+                            for mimetype, size in items:
+                                mimetypes[mimetype] = mimetypes.get(mimetype, 0) + size
+                                values.append((size, cell_idx, output_idx, mimetype))
+                        cell_bytes += stream.offset - start
+                cells.append((cell_bytes, cell_idx))
+        size = os.fstat(fd.fileno()).st_size
+
+    return dict(
+        path=nb_path,
+        bytes=size,
+        cells=len(cells),
+        outputs=num_outputs,
+        output_bytes=sum(cell_bytes for cell_bytes, _ in cells),
+        mimetypes=dict(sorted(mimetypes.items(), key=lambda kv: -kv[1])),
+        largest=[
+            dict(cell=cell_idx, output=output_idx, mimetype=mimetype, bytes=size)
+            for size, cell_idx, output_idx, mimetype in heapq.nlargest(top_n, values)
+        ],
+        heaviest_cells=[
+            dict(cell=cell_idx, bytes=cell_bytes)
+            for cell_bytes, cell_idx in heapq.nlargest(top_n, cells)
+            if cell_bytes
+        ],
+    )
+
+
+def try_weigh_nb(nb_path: str, top_n: int = TOP_N) -> tuple[Optional[dict], Optional[str]]:
+    """`weigh_nb`'s record (without its `path`), or an error message."""
+    try:
+        record = weigh_nb(nb_path, top_n=top_n)
+    except (OSError, ValueError) as e:
+        return None, str(e)
+    del record['path']
+    return record, None
+
+
+def weigh_nbs(
+    nb_paths: list[str],
+    jobs: Optional[int] = None,
+    top_n: int = TOP_N,
+    cache: NbCache | NullCache | None = None,
+) -> Iterator[dict]:
+    """Yield `weigh_nb` records for many notebooks (in order); cache misses are computed across a process pool."""
+    fn = partial(try_weigh_nb, top_n=top_n)
+    for nb_path, record, error in cached_map(fn, nb_paths, WEIGH_KIND, cache=cache, params=(top_n,), jobs=jobs):
+        yield dict(path=nb_path, error=error) if error else dict(path=nb_path, **record)
+
+
+def total(records: Iterable[dict], top_n: int = TOP_N) -> Iterator[dict]:
+    """Pass through per-notebook records, then yield a `{"total": …}` record aggregating them."""
+    num_nbs = num_errors = num_cells = num_outputs = size = output_bytes = 0
+    mimetypes = {}
+    largest = []
+    heaviest_cells = []
+    for record in records:
+        yield record
+        num_nbs += 1
+        if 'error' in record:
+            num_errors += 1
+            continue
+        path = record['path']
+        num_cells += record['cells']
+        num_outputs += record['outputs']
+        size += record['bytes']
+        output_bytes += record['output_bytes']
+        for mimetype, n in record['mimetypes'].items():
+            mimetypes[mimetype] = mimetypes.get(mimetype, 0) + n
+        largest = heapq.nlargest(top_n, largest + [ (path, v) for v in record['largest'] ], key=lambda pv: pv[1]['bytes'])
+        heaviest_cells = heapq.nlargest(top_n, heaviest_cells + [ (path, c) for c in record['heaviest_cells'] ], key=lambda pc: pc[1]['bytes'])
+
+    yield dict(total=dict(
+        notebooks=num_nbs,
+        errors=num_errors,
+        cells=num_cells,
+        outputs=num_outputs,
+        bytes=size,
+        output_bytes=output_bytes,
+        mimetypes=dict(sorted(mimetypes.items(), key=lambda kv: -kv[1])),
+        largest=[ dict(path=path, **v) for path, v in largest ],
+        heaviest_cells=[ dict(path=path, **c) for path, c in heaviest_cells ],
+    ))
+
+
+@click.command()
+@click.option('-b', '--batch', is_flag=True, help='Measure many notebooks (directories, files, or git pathspecs) in parallel; print one JSONL record per notebook, then totals')
+@click.option('-c', '--compact-json', is_flag=True, help='Print one cell per line (like `jq -c`)')
+@click.option('-j', '--jobs', type=int, help='-b/--batch: number of worker processes (default: CPU count)')
+@click.option('-n', '--top-n', type=int, default=TOP_N, help=f'-b/--batch: number of largest outputs / heaviest cells to report (default: {TOP_N})')
+@click.option('--no-cache', is_flag=True, help="Don't read or write the content-hash cache (see `nb_cache.py`)")
+@click.argument('nb_paths', nargs=-1)
+def main(batch, compact_json, jobs, top_n, no_cache, nb_paths):
+    """Summarize notebook cells' outputs (streaming equivalent of `jq -f summarize-nb.jq`).
+
+    Reads stdin if no NB_PATHS are passed (or, with -b/--batch, scans the current directory).
+    """
+    with open_cache(not no_cache) as cache:
+        if batch:
+            paths = list(find_notebooks(nb_paths or ['.']))
+            for record in total(weigh_nbs(paths, jobs=jobs, top_n=top_n, cache=cache), top_n=top_n):
+                print(json.dumps(record, ensure_ascii=False), flush=True)
+            return
+
+        json_kwargs = dict(separators=(',', ':')) if compact_json else dict(indent=2)
+
+        def print_cell(cell):
+            print(json.dumps(cell, ensure_ascii=False, **json_kwargs))
+
+        if not nb_paths:
+            for cell in summarize_cells(sys.stdin.buffer):
+                print_cell(cell)
+            return
+
+        for nb_path in nb_paths:
+            key = cache.key(nb_path)
+            cells = cache.get(SUMMARY_KIND, key)
+            if cells is not None:
+                for cell in cells:
+                    print_cell(cell)
+                continue
+            cells = []
+            with open(nb_path, 'rb') as fd:
+                for cell in summarize_cells(fd):
+                    print_cell(cell)
+                    cells.append(cell)
+            cache.put(SUMMARY_KIND, key, cells)
+
+
+if __name__ == '__main__':
+    main()
@@ -556,6 +556,70 @@ test_multi_version_workflow() {
     TESTS_RUN=$((TESTS_RUN + 1))
 }
 
+# Test 11: Interpreter discovery (py_interpreters.py) against a fake pyenv root
+test_interpreter_resolution() {
+    echo -e "\n${YELLOW}Test 11: Interpreter discovery and caching${NC}"
+    local helpers="$HOME/.rc/py"
+    if [[ ! -f "$helpers/py_interpreters.py" ]]; then
+        echo -e "${YELLOW}⚠${NC} Skipping interpreter discovery test (py_interpreters.py not available)"
+        return
+    fi
+    local python=$(python3 -c 'import sys; print(sys.executable)' 2>/dev/null)
+    if [[ -z "$python" ]]; then
+        echo -e "${YELLOW}⚠${NC} Skipping interpreter discovery test (python3 not available)"
+        return
+    fi
+    local test_dir="$TEST_BASE/test11"
+    mkdir -p "$test_dir/empty-path"
+    cd "$test_dir"
+
+    # Fake interpreters: versioned dirs are parsed from their names, others are run to print their version
+    local v
+    for v in 3.11.9 3.12.4 3.12.10 miniforge3; do
+        mkdir -p "pyenv/versions/$v/bin"
+        printf '#!/bin/sh\necho cpython 3.10.14\n' > "pyenv/versions/$v/bin/python3"
+        chmod +x "pyenv/versions/$v/bin/python3"
+    done
+
+    resolve() {
+        PATH="$test_dir/empty-path" PYENV_ROOT="$test_dir/pyenv" UV_PYTHON_INSTALL_DIR="$test_dir/uv" \
+        PY_INTERPRETERS_CACHE="$test_dir/interpreters.json" \
+            "$python" "$helpers/py_interpreters.py" -V "$@" 2>/dev/null | tr '\n' ' '
+    }
+
+    assert_equals "3.12.10 3.11.9 3.10.14 " "$(resolve 3.12 11 3.10.x)" "Specs resolve to newest matching versions"
+    assert_exists "$test_dir/interpreters.json" "Interpreter index is cached"
+
+    # A newly installed version invalidates the cached listing
+    mkdir -p pyenv/versions/3.12.11/bin
+    cp pyenv/versions/3.12.4/bin/python3 pyenv/versions/3.12.11/bin/python3
+    touch pyenv/versions
+    assert_equals "3.12.11 " "$(resolve 3.12)" "New interpreter is picked up after its dir changes"
+}
+
+# Test 12: REPL startup (startup.py) with a warm utz-names cache, i.e. with lazy builtins installed
+test_repl_startup() {
+    echo -e "\n${YELLOW}Test 12: REPL startup with lazy utz names${NC}"
+    local helpers="$HOME/.rc/py"
+    if [[ ! -f "$helpers/startup.py" ]] || ! python3 -c 'import utz' &>/dev/null; then
+        echo -e "${YELLOW}⚠${NC} Skipping REPL startup test (startup.py or utz not available)"
+        return
+    fi
+    local test_dir="$TEST_BASE/test12"
+    mkdir -p "$test_dir"
+    cd "$test_dir"
+
+    repl() {
+        printf '%s\n' "$@" | PYTHONSTARTUP="$helpers/startup.py" PY_STARTUP_CACHE_DIR="$test_dir/cache" python3 -i 2>/dev/null
+    }
+
+    # First start imports utz eagerly, and caches its names
+    repl 'pass' >/dev/null
+    assert_equals "1" "$(ls "$test_dir/cache" | wc -l | tr -d ' ')" "utz names are cached"
+    assert_equals "[1] 2" "$(repl 'import json as _json' 'print(_json.dumps([1]), len("ab"))')" "import and builtins work with a warm cache"
+    assert_equals "False" "$(repl 'print("_install" in dir())')" "startup.py's helpers don't leak into the REPL"
+}
+
 # Run all tests
 main() {
     echo "========================================="
@@ -587,6 +651,8 @@ main() {
         test_real_python_execution
         test_subdirectory_path_resolution
         test_multi_version_workflow
+        test_interpreter_resolution
+        test_repl_startup
     fi
 
     # Summary
@@ -3,82 +3,340 @@
 # requires-python = ">=3.10"
 # dependencies = [
 #     "click",
-#     "pip",
+#     "tomli; python_version < '3.11'",
 # ]
 # ///
 import importlib.metadata
+import json
+import os
 import re
+import subprocess
+from abc import ABC, abstractmethod
 from functools import partial
+from glob import glob
+from os.path import basename, dirname, isdir, join, normpath, relpath
 from sys import stderr, stdout
+from typing import NamedTuple, Optional
 
 import click
-from pip._internal.network.session import PipSession
-from pip._internal.req import parse_requirements
 
-REQ_RGX = re.compile(r'(?P<name>[a-zA-Z0-9\-_.]+)(?:\[(?P<extra>[a-zA-Z0-9\-_]+)])?(?:(?P<op>[=><!~]+)(?P<version>[a-zA-Z0-9\-_.]+))?')
+try:
+    import tomllib
+except ImportError:
+    import tomli as tomllib
 
+# One requirement line: `name[extras] <specifier> ; <marker> --option ... # comment` (PEP 508, minus URL requirements)
+REQ_RGX = re.compile(r'''
+    ^(?P<indent>\s*)
+    (?P<name>[A-Za-z0-9](?:[A-Za-z0-9._-]*[A-Za-z0-9])?)
+    \s*(?:\[(?P<extras>[^\]]*)\])?
+    \s*(?P<specifier>(?:[=<>!~][^;#]*?)?)
+    \s*?(?P<marker>;[^#]*?)?
+    (?P<options>\s+--[a-z-]+[^#]*?)?
+    (?P<comment>\s+\#.*)?
+    \s*$
+''', re.VERBOSE)
+INCLUDE_RGX = re.compile(r'^\s*(?:-r|--requirement|-c|--constraint)(?:\s*=\s*|\s+)(?P<path>\S+)')
+FREEZE_RGX = re.compile(r'^\s*(?P<name>[A-Za-z0-9][A-Za-z0-9._-]*)(?:\[[^\]]*\])?\s*===?\s*(?P<version>[^\s;#]+)')
+UV_LOCK_PACKAGE_RGX = re.compile(r'^\[\[package\]\]\s*$', re.MULTILINE)
+REQUIREMENTS_FILE_RGX = re.compile(r'(?:^|/)(?:[^/]*requirements[^/]*\.txt|requirements/[^/]+\.txt)$')
 
 err = partial(print, file=stderr)
 
 
+def normalize(name: str) -> str:
+    """PEP 503 normalized project name (e.g. `Foo.Bar_baz` → `foo-bar-baz`)."""
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+class Line(NamedTuple):
+    """One logical line of a requirements file (physical lines joined by trailing backslashes)."""
+    text: str
+    raw: str
+
+
+def read_lines(path: str) -> list[Line]:
+    lines = []
+    parts = []
+    with open(path, 'r', newline='') as f:
+        for physical in f:
+            parts.append(physical)
+            stripped = physical.rstrip('\r\n')
+            if stripped.endswith('\\') and not stripped.lstrip().startswith('#'):
+                continue
+            text = ''.join( part.rstrip('\r\n').removesuffix('\\') for part in parts )
+            lines.append(Line(text=text, raw=''.join(parts)))
+            parts = []
+    if parts:
+        lines.append(Line(text=''.join(parts).rstrip('\r\n').removesuffix('\\'), raw=''.join(parts)))
+    return lines
+
+
+def includes(path: str, lines: list[Line]) -> list[str]:
+    """Paths of files included (`-r`/`-c`) by a requirements file, relative to it."""
+    paths = []
+    for line in lines:
+        m = INCLUDE_RGX.match(line.text)
+        if m and '://' not in m['path']:
+            paths.append(normpath(join(dirname(path), m['path'])))
+    return paths
+
+
+def pin_line(line: Line, versions: 'Versions', path: str) -> str:
+    """Rewrite a requirement line to pin its installed version (keeping extras, markers, options and comments)."""
+    text = line.text
+    if not text.strip() or text.lstrip().startswith(('#', '-')):
+        return line.raw
+    m = REQ_RGX.match(text)
+    if not m:
+        err(f"{path}: could not parse requirement {text.strip()}")
+        return line.raw
+    name = m['name']
+    version = versions.get(normalize(name))
+    if version is None:
+        err(f"{path}: name {name} not found in deps")
+        return line.raw
+    extras = f'[{m["extras"]}]' if m['extras'] is not None else ''
+    marker = f' {m["marker"]}' if m['marker'] else ''
+    options = m['options'] or ''
+    if '--hash' in options and m['specifier'].strip() != f'=={version}':
+        err(f"{path}: {name}: --hash options will be stale after re-pinning")
+    pinned = f'{m["indent"]}{name}{extras}=={version}{marker}{options}{m["comment"] or ""}'
+    if pinned == text:
+        return line.raw
+    newline = '\r\n' if line.raw.endswith('\r\n') else '\n' if line.raw.endswith('\n') else ''
+    return f'{pinned}{newline}'
+
+
+def pin_file(path: str, versions: 'Versions') -> tuple[str, list[str]]:
+    """Return a requirements file's pinned contents, and the paths of files it includes."""
+    lines = read_lines(path)
+    return ''.join( pin_line(line, versions, path) for line in lines ), includes(path, lines)
+
+
+def pin_flattened(path: str, versions: 'Versions', seen: Optional[set[str]] = None) -> str:
+    """A requirements file's pinned contents, with each `-r`/`-c` include replaced by its own (pinned, flattened)
+    contents, as pip's `parse_requirements` flattens them (for writing one file, rather than updating each in place)."""
+    seen = set() if seen is None else seen
+    seen.add(normpath(path))
+    out = []
+    for line in read_lines(path):
+        m = INCLUDE_RGX.match(line.text)
+        if m and '://' not in m['path']:
+            included = normpath(join(dirname(path), m['path']))
+            if included not in seen:
+                text = pin_flattened(included, versions, seen)
+                out.append(text if not text or text.endswith('\n') else f'{text}\n')
+            continue
+        out.append(pin_line(line, versions, path))
+    return ''.join(out)
+
+
+class Versions(ABC):
+    """Source of package versions, looked up by normalized name."""
+
+    @abstractmethod
+    def get(self, name: str) -> Optional[str]:
+        ...
+
+
+class IndexedVersions(Versions):
+    """Versions from a file at `path`.
+
+    Subclasses `load` a `{normalized name: version}` index on first lookup (so e.g. a lockfile is only parsed if some
+    requirement needs it), and then each lookup is a dict access.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index = None
+
+    @abstractmethod
+    def load(self) -> dict[str, str]:
+        ...
+
+    def get(self, name: str) -> Optional[str]:
+        if self.index is None:
+            self.index = self.load()
+        return self.index.get(name)
+
+
+class DistributionVersions(Versions):
+    """Versions of distributions installed in `paths` (default: this interpreter's `sys.path`).
+
+    Uses `importlib.metadata`'s per-name discovery, which matches `*.dist-info` / `*.egg-info` directory names against
+    a cached directory listing, so only the METADATA files of requested packages are read.
+    """
+
+    def __init__(self, paths: Optional[list[str]] = None):
+        self.paths = paths
+        self.cache = {}
+
+    def get(self, name: str) -> Optional[str]:
+        if name not in self.cache:
+            kwargs = {} if self.paths is None else { 'path': self.paths }
+            dist = next(importlib.metadata.Distribution.discover(name=name, **kwargs), None)
+            self.cache[name] = dist.version if dist else None
+        return self.cache[name]
+
+
+class UvLockVersions(IndexedVersions):
+    """Versions resolved in a `uv.lock`."""
+
+    def load(self) -> dict[str, str]:
+        with open(self.path, 'rb') as f:
+            lock = tomllib.load(f)
+        index = {}
+        for package in lock.get('package', []):
+            if 'version' not in package:
+                continue
+            name = normalize(package['name'])
+            if name in index and index[name] != package['version']:
+                err(f"{self.path}: multiple versions of {name} ({index[name]}, {package['version']}); using {index[name]}")
+                continue
+            index[name] = package['version']
+        return index
+
+
+class FreezeVersions(IndexedVersions):
+    """Versions from a `pip freeze` snapshot (`name==version` lines; editable / URL requirements are skipped)."""
+
+    def load(self) -> dict[str, str]:
+        index = {}
+        with open(self.path, 'r') as f:
+            for line in f:
+                m = FREEZE_RGX.match(line)
+                if m:
+                    index.setdefault(normalize(m['name']), m['version'])
+        return index
+
+
+class CondaListVersions(IndexedVersions):
+    """Versions from a `conda list --json` snapshot (conda and pip-installed packages, by conda package name)."""
+
+    def load(self) -> dict[str, str]:
+        with open(self.path, 'r') as f:
+            entries = json.load(f)
+        index = {}
+        # Prefer pip-installed ("pypi" channel) entries, whose names are PyPI names
+        for entry in sorted(entries, key=lambda entry: entry.get('channel') != 'pypi'):
+            index.setdefault(normalize(entry['name']), entry['version'])
+        return index
+
+
+def site_packages_dirs(path: str) -> list[str]:
+    """`path` itself if it contains distributions' metadata, else the site-packages dirs of the venv / prefix at `path`."""
+    if glob(join(path, '*.dist-info')) or glob(join(path, '*.egg-info')):
+        return [ path ]
+    return sorted(glob(join(path, 'lib', 'python*', 'site-packages')) + glob(join(path, 'Lib', 'site-packages')))
+
+
+def open_versions(source: Optional[str]) -> Versions:
+    """Version source for a `-s/--source` path (default: the current interpreter's installed distributions)."""
+    if not source:
+        return DistributionVersions()
+    if isdir(source):
+        dirs = site_packages_dirs(source)
+        if not dirs:
+            raise click.BadParameter(f"No site-packages found in {source}", param_hint='-s/--source')
+        return DistributionVersions(dirs)
+    if basename(source).endswith(('.lock', '.toml')):
+        # e.g. a `pyproject.toml` has no resolved versions; only accept files with `[[package]]` tables
+        with open(source, 'r') as f:
+            if not UV_LOCK_PACKAGE_RGX.search(f.read()):
+                raise click.BadParameter(f"{source} has no [[package]] entries (expected a uv.lock)", param_hint='-s/--source')
+        return UvLockVersions(source)
+    with open(source, 'r') as f:
+        head = f.read(1024).lstrip()
+    if head.startswith('['):
+        return CondaListVersions(source)
+    return FreezeVersions(source)
+
+
+def find_requirements_files(root: str) -> list[str]:
+    """Requirements files (`*requirements*.txt`, `requirements/*.txt`) under `root`, via `git ls-files` where possible."""
+    try:
+        listed = subprocess.run(
+            ['git', 'ls-files', '-z', '--cached', '--others', '--exclude-standard'],
+            cwd=root,
+            capture_output=True,
+            check=True,
+        ).stdout.decode().split('\0')
+        paths = [ join(root, path) for path in listed if path ]
+    except (OSError, subprocess.CalledProcessError):
+        paths = []
+        for dirpath, dirs, files in os.walk(root):
+            dirs[:] = sorted( d for d in dirs if not d.startswith('.') and d not in ('node_modules', 'site-packages') )
+            paths.extend( join(dirpath, name) for name in sorted(files) )
+    return [ normpath(path) for path in paths if REQUIREMENTS_FILE_RGX.search(relpath(path, root)) ]
+
+
 @click.command()
-@click.option('-i', '--in-place', is_flag=True, help='Update the requirements file in place')
+@click.option('-i', '--in-place', is_flag=True, help='Update the requirements file(s) in place (including files they include via `-r`/`-c`)')
 @click.option('-o', '--output-path', help='Output path for the updated requirements file; "-" for stdout')
-@click.argument('requirements_path', default='requirements.txt')
-def main(in_place, output_path, requirements_path):
-    """Update pinned dependencies in a requirements file to match the currently installed versions.
+@click.option('-s', '--source', help="Pin to versions from this `uv.lock`, `pip freeze` snapshot, `conda list --json` snapshot, or site-packages (or venv) directory, instead of the distributions installed for this interpreter")
+@click.option('-R', '--recursive', is_flag=True, help='Treat REQUIREMENTS_PATHS as directories, and update every `*requirements*.txt` / `requirements/*.txt` under them (implies -i)')
+@click.argument('requirements_paths', nargs=-1)
+def main(in_place, output_path, source, recursive, requirements_paths):
+    """Update pinned dependencies in requirements files to match the currently installed versions.
 
     Expects a couple steps to take place before-hand:
     1. Remove version constraints from the requirements file
     2. Make a new virtualenv and perform a `pip install -r`, to pick up a recent, mutually-compatible set of dependency versions
 
-    Then this script will populate the requirements file with the currently installed versions.
+    Then this script will populate the requirements file with the currently installed versions. Comments, blank lines,
+    options, extras, and environment markers are preserved; names are matched after PEP 503 normalization.
+
+    Many files (or, with -R/--recursive, every requirements file in a repo) can be updated in one run, which scans the
+    installed distributions' metadata once. With -s/--source, versions come from a lockfile, environment snapshot, or
+    site-packages directory instead, so no virtualenv needs to be built (or activated) to pin against it.
     """
-    installed_packages = importlib.metadata.distributions()
-    deps = {
-        package.metadata['Name'].lower(): package.version
-        for package in installed_packages
-    }
-
-    session = PipSession()
-    parsed_requirements = list(parse_requirements(requirements_path, session=session))
-
-    if in_place:
-        if output_path:
-            raise ValueError("Cannot specify both --in-place and --output-path")
-        else:
-            output_path = requirements_path
-
-    if not output_path or output_path == '-':
-        out_fd = stdout
-        close = False
-    else:
-        out_fd = open(output_path, 'w')
-        close = True
-
-    out = partial(print, file=out_fd)
-
-    for req in parsed_requirements:
-        dep = req.requirement
-        m = REQ_RGX.match(dep)
-        if m:
-            name = m.group('name').lower()
-            if name in deps:
-                version = deps[name]
-                extra = m.group('extra')
-                if extra:
-                    out(f"{name}[{extra}]=={version}")
-                else:
-                    out(f"{name}=={version}")
-            else:
-                err(f"Name {name} not found in deps")
-                out(dep)
+    if recursive:
+        roots = requirements_paths or ('.',)
+        requirements_paths = [
+            path
+            for root in roots
+            for path in (find_requirements_files(root) if isdir(root) else [root])
+        ]
+        in_place = True
+    requirements_paths = list(requirements_paths or ['requirements.txt'])
+
+    if in_place and output_path:
+        raise ValueError("Cannot specify both --in-place and --output-path")
+    if len(requirements_paths) > 1 and not in_place:
+        raise click.UsageError("Pass -i/--in-place (or -R/--recursive) to update multiple requirements files")
+
+    versions = open_versions(source)
+
+    if not in_place:
+        [requirements_path] = requirements_paths
+        pinned = pin_flattened(requirements_path, versions)
+        if not output_path or output_path == '-':
+            stdout.write(pinned)
         else:
-            err(f"Could not parse requirement {dep}")
-            out(dep)
+            with open(output_path, 'w') as f:
+                f.write(pinned)
+        return
 
-    if close:
-        out_fd.close()
+    pending = list(requirements_paths)
+    seen = set()
+    while pending:
+        path = pending.pop(0)
+        if path in seen:
+            continue
+        seen.add(path)
+        try:
+            with open(path, 'r', newline='') as f:
+                before = f.read()
+            pinned, included = pin_file(path, versions)
+        except OSError as e:
+            err(f"{path}: {e}")
+            continue
+        pending.extend(included)
+        if pinned != before:
+            with open(path, 'w', newline='') as f:
+                f.write(pinned)
+            err(f"Updated {path}")
 
 
 if __name__ == '__main__':
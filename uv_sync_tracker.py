@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.9"
+# dependencies = []
+# ///
+"""Keep a uv project's versioned venvs (`.venv/X.Y.Z`) synced with its `uv.lock` / `pyproject.toml`.
+
+Each venv records a hash of those files as of its last successful `uv sync --frozen`, in `.venv/X.Y.Z/.uv-sync.json`
+(along with how long syncs took). A check re-hashes the files (only if their mtimes or sizes changed), and re-syncs
+just when the hash differs, so a `git pull` that changes `uv.lock` is picked up, and an unchanged one costs nothing.
+
+Syncs run under an exclusive lock (`.venv/X.Y.Z/.uv-sync.lock`), so concurrent shells don't sync the same venv at
+once; with -b/--background, the sync runs in a detached process (logging to `.venv/X.Y.Z/.uv-sync.log`), and a shell
+that finds the lock held just moves on. A failed sync records the hash it failed on, and isn't retried automatically
+until the inputs change (or -f/--force is passed); a sync whose inputs changed mid-sync leaves the state file
+back-dated to before the inputs' mtimes, so the next check re-syncs.
+
+`venv_path_check` (in venv-path-init.sh) runs this when either file is newer than the state file.
+"""
+import fcntl
+import json
+import os
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from hashlib import sha256
+from os.path import abspath, exists, isdir, islink, join
+from typing import Optional
+
+INPUTS = ('uv.lock', 'pyproject.toml')
+STATE_NAME = '.uv-sync.json'
+LOCK_NAME = '.uv-sync.lock'
+LOG_NAME = '.uv-sync.log'
+# Timings of this many recent syncs are kept
+MAX_TIMINGS = 10
+
+
+def current_venv(project: str) -> Optional[str]:
+    """The venv `.venv` currently points at: `.venv/<version>` (per `.venv/current`), or an unversioned `.venv`."""
+    venvs_dir = join(project, '.venv')
+    try:
+        with open(join(venvs_dir, 'current'), 'r') as f:
+            version = f.read().strip()
+    except OSError:
+        version = None
+    if version and isdir(join(venvs_dir, version, 'bin')):
+        return join(venvs_dir, version)
+    if isdir(join(venvs_dir, 'bin')) and not islink(join(venvs_dir, 'bin')):
+        return venvs_dir
+    return None
+
+
+def input_stats(project: str) -> dict[str, Optional[list[int]]]:
+    stats = {}
+    for name in INPUTS:
+        try:
+            stat = os.stat(join(project, name))
+            stats[name] = [ stat.st_mtime_ns, stat.st_size ]
+        except OSError:
+            stats[name] = None
+    return stats
+
+
+def inputs_hash(project: str) -> str:
+    h = sha256()
+    for name in INPUTS:
+        path = join(project, name)
+        h.update(name.encode() + b'\0')
+        if exists(path):
+            with open(path, 'rb') as f:
+                h.update(f.read())
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+class Tracker:
+    """Sync state of one venv of a project."""
+
+    def __init__(self, project: str, venv: str):
+        self.project = project
+        self.venv = venv
+        self.state_path = join(venv, STATE_NAME)
+        self.lock_path = join(venv, LOCK_NAME)
+        self.log_path = join(venv, LOG_NAME)
+
+    def load(self) -> dict:
+        try:
+            with open(self.state_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self, state: dict, stale: bool = False):
+        """Write the state file; with `stale`, back-date it to before the inputs' mtimes, so the shell hook's `-nt`
+        check calls this script again (which then re-checks the hash)."""
+        tmp_path = f'{self.state_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=2)
+        if stale:
+            mtimes = [ stat[0] for stat in input_stats(self.project).values() if stat ]
+            if mtimes:
+                mtime_ns = min(mtimes) - 10 ** 9
+                os.utime(tmp_path, ns=(mtime_ns, mtime_ns))
+        os.replace(tmp_path, self.state_path)
+
+    def stale(self) -> Optional[str]:
+        """Hash of the project's current inputs, if the venv was last synced against different ones (else `None`).
+
+        If the inputs' stats changed but their contents didn't (e.g. `git checkout` rewrote an identical `uv.lock`),
+        the new stats are recorded, which also bumps the state file's mtime past the inputs' (the shell hook's check).
+        """
+        state = self.load()
+        stats = input_stats(self.project)
+        if state.get('stats') == stats and state.get('hash'):
+            return None
+        digest = inputs_hash(self.project)
+        if state.get('hash') == digest:
+            self.save({ **state, 'stats': stats })
+            return None
+        return digest
+
+    def sync(self, blocking: bool = True) -> Optional[float]:
+        """Run `uv sync --frozen` under the lock, recording the new hash and timing; `None` if the lock was busy."""
+        with open(self.lock_path, 'w') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                return None
+            # Another process may have synced while we waited for the lock
+            stats = input_stats(self.project)
+            digest = self.stale()
+            if digest is None:
+                return 0.
+            start = time.monotonic()
+            with open(self.log_path, 'w') as log:
+                proc = subprocess.run(
+                    [ 'uv', 'sync', '--frozen', '--quiet' ],
+                    cwd=self.project,
+                    env={ **os.environ, 'UV_PROJECT_ENVIRONMENT': abspath(self.venv) },
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                )
+            seconds = time.monotonic() - start
+            state = self.load()
+            timings = state.get('timings', [])
+            timings = [ *timings, dict(at=time.time(), seconds=round(seconds, 3), ok=not proc.returncode) ][-MAX_TIMINGS:]
+            # If the inputs changed mid-sync, back-date the state file, so the next check sees them as newer, and
+            # re-syncs
+            changed = input_stats(self.project) != stats
+            if proc.returncode:
+                # Keep the last successful sync's hash, and note the one that failed, so it isn't retried on every prompt
+                self.save({ **state, 'failed_hash': digest, 'timings': timings }, stale=changed)
+                raise subprocess.CalledProcessError(proc.returncode, 'uv sync --frozen')
+            # Record the hash the sync started from
+            self.save({ 'hash': digest, 'stats': stats, 'synced_at': time.time(), 'timings': timings }, stale=changed)
+            return seconds
+
+    def failed(self, digest: str) -> bool:
+        """Whether a sync of these inputs (`digest`) already failed; if so, re-saves the state file, bumping its mtime
+        past the inputs' (so the shell hook stops calling this script until they change again)."""
+        state = self.load()
+        if state.get('failed_hash') != digest:
+            return False
+        self.save(state)
+        return True
+
+    def last_failed(self) -> bool:
+        timings = self.load().get('timings')
+        return bool(timings) and not timings[-1]['ok']
+
+    def busy(self) -> bool:
+        """Whether another process holds the sync lock (i.e. is syncing this venv)."""
+        try:
+            with open(self.lock_path, 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        return False
+
+    def sync_in_background(self):
+        """Re-run this script (in the foreground, non-blocking on the lock) as a detached process."""
+        subprocess.Popen(
+            [ sys.executable, abspath(__file__), '--worker', '--venv', self.venv, self.project ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+
+
+def status(tracker: Tracker):
+    state = tracker.load()
+    stale = tracker.stale()
+    print(f'{tracker.venv}: {"stale" if stale else "synced"}')
+    if state.get('synced_at'):
+        print(f'  last synced: {time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(state["synced_at"]))}')
+    for timing in state.get('timings', []):
+        at = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timing['at']))
+        print(f'  {at}  {timing["seconds"]:7.2f}s  {"ok" if timing["ok"] else "failed"}')
+
+
+def main():
+    parser = ArgumentParser(description="Re-sync a uv project's current venv when its uv.lock / pyproject.toml change.")
+    parser.add_argument('-b', '--background', action='store_true', help='Sync in a detached process (skipped if another sync holds the lock)')
+    parser.add_argument('-f', '--force', action='store_true', help='Sync even if the inputs are unchanged')
+    parser.add_argument('-s', '--status', action='store_true', help="Print the venv's sync state and recent sync timings")
+    parser.add_argument('-V', '--venv', help='Venv to sync (default: the one .venv/current points at)')
+    parser.add_argument('--worker', action='store_true', help='(internal) background sync process')
+    parser.add_argument('project', nargs='?', default='.', help='Project directory (default: .)')
+    args = parser.parse_args()
+
+    project = args.project
+    if not exists(join(project, 'uv.lock')):
+        sys.stderr.write(f"No uv.lock in {project}\n")
+        sys.exit(1)
+    venv = args.venv or current_venv(project)
+    if not venv:
+        sys.stderr.write(f"No venv found in {join(project, '.venv')}\n")
+        sys.exit(1)
+    tracker = Tracker(project, venv)
+
+    if args.status:
+        status(tracker)
+        return
+
+    if args.force:
+        # Forget the recorded hash, so the (lock-holding) sync sees the venv as stale
+        tracker.save({ **tracker.load(), 'hash': None, 'stats': None, 'failed_hash': None })
+    else:
+        digest = tracker.stale()
+        if digest is None:
+            return
+        if tracker.failed(digest):
+            # Failed on these inputs before; wait for them to change (or -f/--force)
+            if not args.background and not args.worker:
+                sys.stderr.write(f"Last uv sync of {os.path.basename(venv)} failed on these inputs (log: {tracker.log_path}); pass -f to retry\n")
+            return
+    name = os.path.basename(venv)
+    if args.background:
+        if tracker.busy():
+            # Already syncing (e.g. started by an earlier prompt, or another shell)
+            return
+        if tracker.last_failed():
+            sys.stderr.write(f"Last uv sync of {name} failed (log: {tracker.log_path}); retrying\n")
+        sys.stderr.write(f"Syncing uv dependencies for {name} in the background (log: {tracker.log_path})\n")
+        tracker.sync_in_background()
+        return
+    if not args.worker:
+        sys.stderr.write(f"Syncing uv dependencies for {name}...\n")
+    try:
+        seconds = tracker.sync(blocking=not args.worker)
+    except subprocess.CalledProcessError:
+        sys.stderr.write(f"uv sync failed for {name}; see {tracker.log_path}\n")
+        sys.exit(1)
+    if not args.worker and seconds is not None:
+        sys.stderr.write(f"Synced {name} in {seconds:.1f}s\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -18,11 +18,13 @@ source "$py_dir/venv-path-init.sh"  # Required - fail if missing
 #   py312/py313/py311/py310 - Quick switches to specific Python versions
 #   vei                   - Show current Python environment info
 #   vclean                - Clean up old venvs (keeps currently active)
+#   vgc [opts] [roots]    - Inventory venvs across many projects; -x prunes unused ones, -d hardlinks duplicate files
 #   vconv                 - Convert unversioned .venv to versioned format
 #   spd/spdm              - Setup .envrc for Python projects with direnv
 #
 # Environment variables:
 #   PYTHON_VERSION        - Set to use specific Python version (e.g., export PYTHON_VERSION=3.12)
+#   VENV_WHEELHOUSE       - Local wheel dir for vvi to install from offline (no package index access)
 #
 # Usage options:
 #   1. Simple PATH-based (recommended): Add to .bashrc/.zshrc:
@@ -35,42 +37,65 @@ source "$py_dir/venv-path-init.sh"  # Required - fail if missing
 # Ensure pip wrapper exists in UV-created venvs (no longer needed with new structure)
 # pip wrapper is created during venv_create for each version
 
-# Get the full Python version for a given spec
-# e.g., "3.12" -> "3.12.7", "3.12.x" -> "3.12.7", "3.13" -> "3.13.5"
-get_python_full_version() {
-    local spec="$1"
-    local full_version=""
-
-    # Remove .x suffix if present
-    spec="${spec%.x}"
-
-    # If UV is available, ask it which Python it would actually use
-    if command -v uv &>/dev/null; then
-        # Create a temp venv to see which Python UV actually uses
-        local temp_dir=$(mktemp -d)
-        local uv_output=$(uv venv "$temp_dir" --python "$spec" 2>&1)
-        rm -rf "$temp_dir"
-
-        # Extract version from "Using CPython 3.13.5" or "Using CPython 3.13.5 interpreter at: ..."
-        # Use grep and sed to extract just the version number
-        full_version=$(echo "$uv_output" | grep "Using CPython" | sed -n 's/.*CPython \([0-9.]*\).*/\1/p' | head -1)
-    fi
+# Directory containing these helpers (and py_interpreters.py)
+venv_helpers_dir="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+
+# Ask uv which Python it would use for a spec, by creating a throwaway venv (slow; fallback for specs that no installed
+# interpreter matches, which uv may download)
+uv_python_full_version() {
+    local spec="${1%.x}"
+    local temp_dir=$(mktemp -d)
+    local uv_output=$(uv venv "$temp_dir" --python "$spec" 2>&1)
+    rm -rf "$temp_dir"
+    # Extract version from "Using CPython 3.13.5" or "Using CPython 3.13.5 interpreter at: ..."
+    echo "$uv_output" | grep "Using CPython" | sed -n 's/.*CPython \([0-9.]*\).*/\1/p' | head -1
+}
 
-    # Fallback: try to find installed Python
-    if [[ -z "$full_version" ]]; then
-        if command -v "python${spec}" &>/dev/null; then
-            full_version=$("python${spec}" --version 2>&1 | awk '{print $2}')
-        else
-            echo "Warning: Cannot determine full version for Python ${spec}" >&2
-            full_version="$spec"
-        fi
+# Resolve Python version specs to "<full version><TAB><interpreter path>" lines, one per spec (in order)
+# Uses py_interpreters.py's cached index of pyenv, uv-managed, and $PATH interpreters, so many specs resolve in one
+# fast call; specs it can't resolve fall back to asking uv (path empty), then to the spec itself
+# e.g., "3.12" -> "3.12.7	/home/user/.pyenv/versions/3.12.7/bin/python3"
+resolve_python_specs() {
+    local lines=() line spec version
+    if command -v python3 &>/dev/null && [[ -f "$venv_helpers_dir/py_interpreters.py" ]]; then
+        while IFS= read -r line; do
+            lines+=("$line")
+        done < <(python3 "$venv_helpers_dir/py_interpreters.py" "$@" 2>/dev/null)
     fi
+    local i=0
+    for spec in "$@"; do
+        line="${lines[$i]}"
+        i=$((i + 1))
+        if [[ -n "$line" ]] && [[ -n "${line#*$'\t'}" ]]; then
+            echo "$line"
+            continue
+        fi
+        version=""
+        if command -v uv &>/dev/null; then
+            version=$(uv_python_full_version "$spec")
+        fi
+        if [[ -z "$version" ]]; then
+            if command -v "python${spec%.x}" &>/dev/null; then
+                version=$("python${spec%.x}" --version 2>&1 | awk '{print $2}')
+            else
+                echo "Warning: Cannot determine full version for Python ${spec}" >&2
+                version="${spec%.x}"
+            fi
+        fi
+        printf '%s\t\n' "$version"
+    done
+}
 
-    echo "$full_version"
+# Get the full Python version for a given spec
+# e.g., "3.12" -> "3.12.7", "3.12.x" -> "3.12.7", "3.13" -> "3.13.5"
+get_python_full_version() {
+    resolve_python_specs "$1" | cut -f1
 }
 
 # Initialize multiple Python venvs at once
 # Usage: vvi 3.11 3.12 3.13
+# Venvs are created concurrently by venv_provision.py, which resolves dependencies once per Python ABI and hardlinks
+# packages from a shared cache; set VENV_WHEELHOUSE=<dir> to install offline from a local wheelhouse
 venv_init() {
     local versions="${*:-3.13}"
     # Convert space-separated arguments to array
@@ -78,11 +103,23 @@ venv_init() {
 
     echo "Initializing Python venvs for: ${VERSION_ARRAY[@]}" >&2
 
-    for spec in "${VERSION_ARRAY[@]}"; do
-        # Trim whitespace
-        spec=$(echo "$spec" | xargs)
-        venv_create "$spec"
-    done
+    local provisioned="" status=1
+    if command -v python3 &>/dev/null && [[ -f "$venv_helpers_dir/venv_provision.py" ]]; then
+        # Its errors go to stderr; say so when falling back, rather than silently switching to venv_create
+        provisioned=$(python3 "$venv_helpers_dir/venv_provision.py" ${VENV_WHEELHOUSE:+-w "$VENV_WHEELHOUSE"} "${VERSION_ARRAY[@]}")
+        status=$?
+        if [[ $status -ne 0 ]]; then
+            echo "venv_provision.py failed (exit $status); falling back to venv_create" >&2
+        fi
+    fi
+    if [[ $status -eq 0 && -n "$provisioned" ]]; then
+        # Last version provisioned becomes current, as with venv_create
+        venv_set_current "$(echo "$provisioned" | tail -1)"
+        venv_path_check -f
+    else
+        # venv_create resolves all specs' full versions in one call
+        venv_create "${VERSION_ARRAY[@]}"
+    fi
 
     echo "Done! Available venvs:" >&2
     venv_list
@@ -101,9 +138,16 @@ venv_create() {
 
     local last_version=""
 
-    # Process each Python version argument
+    # Resolve all specs in one call, then process each Python version argument
+    local resolved=() line
+    while IFS= read -r line; do
+        resolved+=("$line")
+    done < <(resolve_python_specs "$@")
+    local i=0
     for py_spec in "$@"; do
-        local full_version=$(get_python_full_version "$py_spec")
+        local full_version="${resolved[$i]%%$'\t'*}"
+        local py_path="${resolved[$i]#*$'\t'}"
+        i=$((i + 1))
 
         # Use .venv/X.Y.Z structure with .venv/cur as symlink
         mkdir -p .venv
@@ -114,7 +158,8 @@ venv_create() {
         else
             echo "Creating $venv_name with Python $py_spec..." >&2
             if command -v uv &>/dev/null; then
-                uv venv "$venv_name" --python "$py_spec"
+                # Use the interpreter the version was resolved from, so the venv matches its name
+                uv venv "$venv_name" --python "${py_path:-$py_spec}"
 
                 # Create pip wrapper for UV projects
                 if [[ ! -f "$venv_name/bin/pip" ]]; then
@@ -142,6 +187,8 @@ fi
 EOF
                     chmod +x "$venv_name/bin/pip"
                 fi
+            elif [[ -n "$py_path" ]]; then
+                "$py_path" -m venv "$venv_name"
             else
                 python${py_spec} -m venv "$venv_name"
             fi
@@ -173,7 +220,7 @@ EOF
         venv_set_current "${last_version}"
 
         # Trigger path check to activate it
-        venv_path_check
+        venv_path_check -f
     fi
 }
 defn vc venv_create
@@ -292,7 +339,7 @@ venv_switch() {
 
     # Don't source activate script - let venv_path_check handle PATH
     # This prevents duplicate/absolute path entries
-    venv_path_check  # Update PATH using our dedupe logic
+    venv_path_check -f  # Update PATH using our dedupe logic
 }
 defn vsw venv_switch  # switch Python venv
 defn vw venv_switch   # shorter alias for vsw
@@ -349,7 +396,7 @@ activate_venv() {
     fi
 
     # Don't source activate script - let venv_path_check handle PATH
-    venv_path_check  # Update PATH using our dedupe logic
+    venv_path_check -f  # Update PATH using our dedupe logic
     echo "Activated $(python --version 2>&1)" >&2
 }
 defn va activate_venv  # activate venv (respects versioned scheme)
@@ -422,6 +469,13 @@ venv_clean() {
 }
 defn vclean venv_clean  # clean up venvs
 
+# Inventory (and with -x/-d, prune or dedupe) the venvs of every project under the given roots (default: .), by
+# last-use time and hardlink-aware disk usage; see venv_gc.py -h
+venv_gc() {
+    python3 "$venv_helpers_dir/venv_gc.py" "$@"
+}
+defn vgc venv_gc  # venv inventory / GC across projects
+
 # pyenv deactivation removed - no longer using pyenv
 
 # Simple PATH-based activation (no direnv needed)
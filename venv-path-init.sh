@@ -5,11 +5,89 @@
 #
 # Requires: dedupe_path_var function (from ~/.rc/bash/vars/.vars-rc)
 
+# Directory containing these helpers (and venv_index.py)
+venv_path_init_dir="$(cd "$(dirname "${BASH_SOURCE[0]:-$0}")" && pwd)"
+
+# Set VENV_PATH_DAEMON=1 (bash only) to answer lookups from a resident venv_index.py coprocess, which keeps a
+# directory→venv index in memory (invalidated by inotify), instead of testing each ancestor dir on every $PWD change
+venv_index_start() {
+    [[ -n "$BASH_VERSION" ]] && [[ "${VENV_PATH_DAEMON:-}" == 1 ]] || return 1
+    [[ -n "${VENV_INDEX[1]:-}" ]] && return 0
+    command -v python3 &>/dev/null && [[ -f "$venv_path_init_dir/venv_index.py" ]] || return 1
+    coproc VENV_INDEX { exec python3 "$venv_path_init_dir/venv_index.py" --serve 2>/dev/null; }
+}
+
+# Stop the venv_index.py coprocess (e.g. after it timed out); venv_find then walks the tree, until venv_index_start
+venv_index_stop() {
+    [[ -n "${VENV_INDEX_PID:-}" ]] && kill "$VENV_INDEX_PID" 2>/dev/null
+    unset VENV_INDEX VENV_INDEX_PID
+}
+
+# Set _venv_found to the nearest .venv (with a bin dir) at or above $1, without spawning subprocesses
+venv_find() {
+    _venv_found=""
+    if [[ -n "${VENV_INDEX[1]:-}" ]]; then
+        local reply
+        if { printf '%s\n' "$1" >&"${VENV_INDEX[1]}"; } 2>/dev/null; then
+            # Replies are "<queried dir>\t<venv>"; skip late replies to earlier (timed-out) queries
+            while { IFS= read -r -t 2 reply <&"${VENV_INDEX[0]}"; } 2>/dev/null; do
+                if [[ "$reply" == "$1"$'\t'* ]]; then
+                    _venv_found="${reply#"$1"$'\t'}"
+                    return
+                fi
+            done
+            # Timed out (or died): stop it, rather than risk its late replies answering later lookups
+            venv_index_stop
+        fi
+        # Coprocess died or hung (or this is a subshell, where its fds are closed); fall back to walking the tree
+        _venv_found=""
+    fi
+    local check_dir="$1"
+    while [[ -n "$check_dir" ]] && [[ "$check_dir" != "/" ]]; do
+        if [[ -d "$check_dir/.venv/bin" ]]; then
+            _venv_found="$check_dir/.venv"
+            return
+        fi
+        check_dir="${check_dir%/*}"
+    done
+}
+
+# For UV projects, re-sync the current venv (in the background, under a lock) when uv.lock / pyproject.toml changed
+# since its last sync (see uv_sync_tracker.py); the -nt tests are builtins, so this spawns nothing while the venv is up
+# to date, and it's cheap enough to run on every prompt (catching e.g. a `git pull` that changed uv.lock)
+venv_uv_sync_check() {
+    local venv_dir="$1"
+    local project_dir="${venv_dir%/.venv}"
+    [[ -f "$project_dir/uv.lock" ]] || return 0
+    local current_version="" sync_state
+    [[ -f "$venv_dir/current" ]] && read -r current_version < "$venv_dir/current"
+    sync_state="$venv_dir/${current_version:+$current_version/}.uv-sync.json"
+    if [[ ! -f "$sync_state" ]] || [[ "$project_dir/uv.lock" -nt "$sync_state" ]] || [[ "$project_dir/pyproject.toml" -nt "$sync_state" ]]; then
+        if command -v uv &>/dev/null && command -v python3 &>/dev/null; then
+            python3 "$venv_path_init_dir/uv_sync_tracker.py" --background "$project_dir"
+        fi
+    fi
+}
+
 # Function to check and add .venv/bin to PATH when entering directories
+# Runs on every prompt: if $PWD and $PATH are unchanged since the last run, and the venv found then still exists (or,
+# if none was, $PWD still has none), it returns after a few builtin tests. Pass -f to re-check anyway
 venv_path_check() {
     # Preserve the exit status from the previous command
     local previous_exit_status=$?
 
+    # Fast path: nothing to do if we're where we were, with the PATH we left
+    if [[ "$1" != "-f" ]] && [[ "$PWD" == "${_venv_path_last_pwd:-}" ]] && [[ "$PATH" == "${_venv_path_last_path:-}" ]]; then
+        if [[ -n "${_venv_path_last_venv:-}" ]]; then
+            if [[ -d "$_venv_path_last_venv/bin" ]]; then
+                venv_uv_sync_check "$_venv_path_last_venv"
+                return $previous_exit_status
+            fi
+        elif [[ ! -d "$PWD/.venv/bin" ]]; then
+            return $previous_exit_status
+        fi
+    fi
+
     # Clean up ALL .venv/bin and .venv/cur/bin entries from PATH to prevent duplicates
     # Optimized: use bash built-ins instead of spawning 8+ subprocesses
     local cleaned_path=""
@@ -25,45 +103,23 @@ venv_path_check() {
     done
 
     # Search up the directory tree for a .venv
-    local check_dir="$PWD"
-    local venv_dir=""
-
-    while [[ "$check_dir" != "/" ]]; do
-        if [[ -d "$check_dir/.venv/bin" ]]; then
-            venv_dir="$check_dir/.venv"
-            break
-        fi
-        check_dir=$(dirname "$check_dir")
-    done
+    venv_find "$PWD"
+    local venv_dir="$_venv_found"
 
     # Check if we found a .venv
     if [[ -n "$venv_dir" ]]; then
         # Add absolute path to the front of PATH
         PATH="$venv_dir/bin:$cleaned_path"
 
-        # For UV projects, ensure synced (but only once per venv)
-        if [[ -f "${venv_dir%/.venv}/uv.lock" ]] && command -v uv &>/dev/null; then
-            # Use the actual venv directory for the marker, not the symlink
-            if [[ -L "$venv_dir/cur" ]]; then
-                local actual_venv=$(readlink "$venv_dir/cur")
-                if [[ -n "$actual_venv" ]]; then
-                    local marker_file="$venv_dir/${actual_venv}/.uv-synced"
-                    # Only sync if this specific venv hasn't been synced yet
-                    if [[ ! -f "$marker_file" ]]; then
-                        echo "Syncing UV dependencies for ${actual_venv}..." >&2
-                        # Tell UV to use .venv (it will follow symlinks)
-                        if (cd "${venv_dir%/.venv}" && UV_PROJECT_ENVIRONMENT="$venv_dir" uv sync --frozen --quiet 2>/dev/null); then
-                            touch "$marker_file"
-                        fi
-                    fi
-                fi
-            fi
-        fi
+        venv_uv_sync_check "$venv_dir"
     else
         PATH="$cleaned_path"
     fi
 
     export PATH
+    _venv_path_last_pwd="$PWD"
+    _venv_path_last_path="$PATH"
+    _venv_path_last_venv="$venv_dir"
 
     # Note: PATH is already deduped by the bash built-in loop above
     # No need to call dedupe_path_var which spawns 30+ subprocesses
@@ -91,7 +147,8 @@ venv_cd() {
 }
 
 # Check on shell startup
+venv_index_start
 venv_path_check
 
 # Export the function so it's available
-export -f venv_path_check 2>/dev/null || true
\ No newline at end of file
+export -f venv_path_check venv_find venv_index_stop venv_uv_sync_check 2>/dev/null || true
\ No newline at end of file
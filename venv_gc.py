@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.9"
+# dependencies = []
+# ///
+"""Inventory the venvs under many project checkouts, and prune or dedupe the stale ones.
+
+Project roots are walked in parallel, for dirs containing a `.venv`; each `.venv/X.Y.Z` (or unversioned `.venv`) with a
+`pyvenv.cfg` is a venv, and the one `.venv/current` names is "current". Disk usage is measured by concurrent
+`os.scandir` traversals, and is hardlink-aware: a file linked from several venvs (or from uv's cache, with
+`--link-mode hardlink`) is only counted once in totals, and only counts toward a venv's "reclaimable" bytes if all
+of its links are inside that venv.
+
+A venv's last use is the later of its `pyvenv.cfg` atime (read by every interpreter start) and its `site-packages`
+mtime (bumped by installs). With -x/--prune, non-current venvs unused for -a/--age days are removed; with -d/--dedupe,
+identical files in the remaining venvs' `site-packages` are replaced by hardlinks to one copy.
+
+On `noatime` mounts (per `/proc/self/mountinfo`), atimes never change, so a venv's last use can't be told from its
+last install: those venvs are reported (as `[noatime]`), but never pruned.
+
+`venv_clean`/`venv_list` (in venv-helpers.sh) do the same for the current project only.
+
+Usage:
+
+    venv_gc.py ~/src ~/work           # report every venv under these roots
+    venv_gc.py -x -a 60 -n ~/src      # show which venvs unused for 60 days would be removed
+    venv_gc.py -x -d ~/src            # remove venvs unused for 30 days, then hardlink identical files in the rest
+"""
+import json
+import os
+import shutil
+import stat
+import sys
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from hashlib import sha256
+from os.path import basename, dirname, join
+from typing import NamedTuple, Optional
+
+# Dirs never searched for projects (beyond the `.venv` a project dir is recognized by)
+SKIP_DIRS = { '.git', '.hg', '.svn', '.venv', '.tox', '.nox', 'node_modules', '__pycache__', 'site-packages' }
+DEFAULT_JOBS = min(32, (os.cpu_count() or 1) * 4)
+
+err = partial(print, file=sys.stderr)
+
+
+class Venv(NamedTuple):
+    path: str
+    project: str
+    version: Optional[str]
+    current: bool
+    last_used: float
+    # Whether `last_used` reflects interpreter starts (`False` on `noatime` mounts, where it's just the last install)
+    atime: bool
+
+
+class Usage(NamedTuple):
+    """A venv's disk usage: bytes of singly-linked files (and dirs), plus (dev, ino) → (bytes, nlink, links inside the
+    venv) for multiply-linked files."""
+    single: int
+    shared: dict
+
+    @property
+    def reclaimable(self) -> int:
+        return self.single + sum( size for size, nlink, links in self.shared.values() if links == nlink )
+
+
+def find_projects(roots: list[str], max_depth: int, executor: ThreadPoolExecutor) -> list[str]:
+    """Dirs (at most `max_depth` below a root) containing a `.venv` dir; each level's dirs are scanned concurrently."""
+    def scan(path: str) -> tuple[bool, list[str]]:
+        try:
+            entries = list(os.scandir(path))
+        except OSError:
+            return False, []
+        is_project = any( e.name == '.venv' and e.is_dir(follow_symlinks=False) for e in entries )
+        subdirs = [
+            e.path
+            for e in entries
+            if e.name not in SKIP_DIRS and e.is_dir(follow_symlinks=False)
+        ]
+        return is_project, subdirs
+
+    projects = []
+    level = [ os.path.abspath(root) for root in roots ]
+    for depth in range(max_depth + 1):
+        if not level:
+            break
+        next_level = []
+        for path, (is_project, subdirs) in zip(level, executor.map(scan, level)):
+            if is_project:
+                projects.append(path)
+            next_level.extend(subdirs)
+        level = next_level
+    return sorted(projects)
+
+
+def read_cfg(path: str) -> dict[str, str]:
+    """Parse a `pyvenv.cfg`, without bumping its atime (our last-use signal) where O_NOATIME is allowed."""
+    cfg = {}
+    noatime = getattr(os, 'O_NOATIME', 0)
+    try:
+        try:
+            fd = os.open(path, os.O_RDONLY | noatime)
+        except PermissionError:
+            # O_NOATIME requires owning the file
+            if not noatime:
+                raise
+            fd = os.open(path, os.O_RDONLY)
+        with open(fd, 'r') as f:
+            for line in f:
+                key, sep, value = line.partition('=')
+                if sep:
+                    cfg[key.strip()] = value.strip()
+    except (OSError, UnicodeDecodeError):
+        pass
+    return cfg
+
+
+def read_mounts() -> dict[str, bool]:
+    """Mount point → whether it's mounted `noatime` (Linux only; elsewhere, empty, and atimes are assumed updated)."""
+    mounts = {}
+    try:
+        with open('/proc/self/mountinfo', 'r') as f:
+            for line in f:
+                # <id> <parent id> <major:minor> <root> <mount point> <mount options> …
+                fields = line.split()
+                if len(fields) > 5:
+                    mounts[fields[4].replace('\\040', ' ')] = 'noatime' in fields[5].split(',')
+    except OSError:
+        pass
+    return mounts
+
+
+def atime_tracked(path: str, mounts: dict[str, bool]) -> bool:
+    """Whether `path` is on a mount that updates atimes (the innermost mount point containing it decides)."""
+    path = os.path.realpath(path)
+    containing = [ mount for mount in mounts if path == mount or path.startswith(mount.rstrip('/') + '/') ]
+    return not containing or not mounts[max(containing, key=len)]
+
+
+def site_packages(venv: str) -> list[str]:
+    lib = join(venv, 'lib')
+    try:
+        return [ join(lib, name, 'site-packages') for name in os.listdir(lib) if name.startswith(('python', 'pypy')) ]
+    except OSError:
+        return []
+
+
+def last_used(venv: str) -> float:
+    times = []
+    try:
+        times.append(os.stat(join(venv, 'pyvenv.cfg')).st_atime)
+    except OSError:
+        pass
+    for path in site_packages(venv):
+        try:
+            times.append(os.stat(path).st_mtime)
+        except OSError:
+            pass
+    return max(times, default=0.)
+
+
+def project_venvs(project: str, mounts: Optional[dict[str, bool]] = None) -> list[Venv]:
+    """`project`'s versioned venvs (`.venv/X.Y.Z`), or its unversioned `.venv` (`mounts`: see `read_mounts`)."""
+    venvs_dir = join(project, '.venv')
+    try:
+        with open(join(venvs_dir, 'current'), 'r') as f:
+            current = f.read().strip()
+    except OSError:
+        current = None
+
+    def venv(path: str, is_current: bool) -> Venv:
+        # Stat before reading `pyvenv.cfg`, in case reading it updates its atime
+        used = last_used(path)
+        cfg = read_cfg(join(path, 'pyvenv.cfg'))
+        version = cfg.get('version_info') or cfg.get('version')
+        atime = atime_tracked(path, mounts or {})
+        return Venv(path=path, project=project, version=version, current=is_current, last_used=used, atime=atime)
+
+    # `venv_set_current` symlinks `.venv/pyvenv.cfg` (and `bin`, …) to the current `X.Y.Z`'s; only a regular file
+    # means an unversioned `.venv`
+    cfg_path = join(venvs_dir, 'pyvenv.cfg')
+    if os.path.isfile(cfg_path) and not os.path.islink(cfg_path):
+        return [ venv(venvs_dir, True) ]
+    venvs = []
+    try:
+        entries = sorted(os.scandir(venvs_dir), key=lambda e: e.name)
+    except OSError:
+        return []
+    for entry in entries:
+        if entry.name[:1].isdigit() and entry.is_dir(follow_symlinks=False) and os.path.isfile(join(entry.path, 'pyvenv.cfg')):
+            venvs.append(venv(entry.path, entry.name == current))
+    return venvs
+
+
+def disk_usage(path: str) -> Usage:
+    """Walk `path` with `os.scandir` (not following symlinks), tallying allocated bytes."""
+    single = 0
+    shared = {}
+    stack = [ path ]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                if stat.S_ISDIR(st.st_mode):
+                    stack.append(entry.path)
+                size = st.st_blocks * 512
+                if st.st_nlink > 1 and not stat.S_ISDIR(st.st_mode):
+                    key = (st.st_dev, st.st_ino)
+                    _, _, links = shared.get(key, (size, st.st_nlink, 0))
+                    shared[key] = (size, st.st_nlink, links + 1)
+                else:
+                    single += size
+    return Usage(single=single, shared=shared)
+
+
+def total_bytes(usages: list[Usage]) -> int:
+    """Allocated bytes across venvs, counting each multiply-linked file once."""
+    shared = {}
+    for usage in usages:
+        shared.update(usage.shared)
+    return sum( usage.single for usage in usages ) + sum( size for size, _, _ in shared.values() )
+
+
+def file_digest(path: str) -> Optional[str]:
+    h = sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(2 ** 20), b''):
+                h.update(chunk)
+    except OSError:
+        return None
+    return h.hexdigest()
+
+
+def dedupe(venvs: list[Venv], executor: ThreadPoolExecutor, min_size: int, dry_run: bool) -> tuple[int, int]:
+    """Hardlink identical regular files (same size, mode, and sha256, on the same device) across venvs'
+    `site-packages`; returns (files linked, bytes saved, assuming the replaced inodes had no links elsewhere)."""
+    # (dev, size, mode) → {(dev, ino): path}; files already sharing an inode are only hashed once
+    by_size = {}
+    for venv in venvs:
+        for root in site_packages(venv.path):
+            for dirpath, dirnames, filenames in os.walk(root):
+                for name in filenames:
+                    path = join(dirpath, name)
+                    try:
+                        st = os.lstat(path)
+                    except OSError:
+                        continue
+                    if not stat.S_ISREG(st.st_mode) or st.st_size < min_size:
+                        continue
+                    group = by_size.setdefault((st.st_dev, st.st_size, st.st_mode), {})
+                    group.setdefault((st.st_dev, st.st_ino), []).append(path)
+    unique_paths = [ paths[0] for inodes in by_size.values() if len(inodes) > 1 for paths in inodes.values() ]
+    digests = dict(zip(unique_paths, executor.map(file_digest, unique_paths)))
+
+    linked = saved = 0
+    for (_, size, _), inodes in by_size.items():
+        if len(inodes) < 2:
+            continue
+        by_digest = {}
+        for paths in inodes.values():
+            digest = digests.get(paths[0])
+            if digest:
+                by_digest.setdefault(digest, []).append(paths)
+        for groups in by_digest.values():
+            if len(groups) < 2:
+                continue
+            # Link everything to the inode that already has the most links
+            groups.sort(key=len, reverse=True)
+            target = groups[0][0]
+            for paths in groups[1:]:
+                # The replaced inode is only freed once all of its paths are relinked
+                freed = True
+                for path in paths:
+                    if not dry_run:
+                        tmp_path = join(dirname(path), f'.{basename(path)}.{os.getpid()}.link')
+                        try:
+                            os.link(target, tmp_path)
+                            os.replace(tmp_path, path)
+                        except OSError as e:
+                            err(f"Couldn't link {path}: {e}")
+                            try:
+                                os.unlink(tmp_path)
+                            except OSError:
+                                pass
+                            freed = False
+                            continue
+                    linked += 1
+                if freed:
+                    saved += size
+    return linked, saved
+
+
+def human_size(n: float) -> str:
+    for unit in ('B', 'K', 'M', 'G'):
+        if abs(n) < 1024:
+            return f'{n:.0f}{unit}' if unit == 'B' else f'{n:.1f}{unit}'
+        n /= 1024
+    return f'{n:.1f}T'
+
+
+def main():
+    parser = ArgumentParser(description='Inventory venvs under project roots; optionally prune unused ones, and hardlink identical files in the rest.')
+    parser.add_argument('-a', '--age', type=float, default=30, help='With -x, remove non-current venvs unused for this many days (default: 30)')
+    parser.add_argument('-d', '--dedupe', action='store_true', help="Hardlink identical files across (remaining) venvs' site-packages")
+    parser.add_argument('-D', '--max-depth', type=int, default=4, help='How many dirs below each root to look for projects (default: 4)')
+    parser.add_argument('-j', '--json', action='store_true', help='Print the inventory as JSON')
+    parser.add_argument('-J', '--jobs', type=int, default=DEFAULT_JOBS, help=f'Concurrent directory scans (default: {DEFAULT_JOBS})')
+    parser.add_argument('-m', '--min-size', type=int, default=4096, help='With -d, skip files smaller than this many bytes (default: 4096)')
+    parser.add_argument('-n', '--dry-run', action='store_true', help='With -x/-d, print what would be removed/linked, without changing anything')
+    parser.add_argument('-x', '--prune', action='store_true', help="Remove stale (non-current, unused for -a days) venvs; venvs on `noatime` mounts are never removed, as their last use can't be told from their last install")
+    parser.add_argument('roots', nargs='*', help='Dirs to search for projects (default: .)')
+    args = parser.parse_args()
+
+    now = time.time()
+    with ThreadPoolExecutor(args.jobs) as executor:
+        projects = find_projects(args.roots or [ '.' ], args.max_depth, executor)
+        venvs = [ venv for venvs in executor.map(partial(project_venvs, mounts=read_mounts()), projects) for venv in venvs ]
+        usages = list(executor.map(disk_usage, [ venv.path for venv in venvs ]))
+        # Without atimes, "unused since" is really "installed at", so `noatime` venvs are never stale
+        stale = [
+            not venv.current and venv.atime and now - venv.last_used > args.age * 86400
+            for venv in venvs
+        ]
+
+        if args.json:
+            json.dump([
+                dict(
+                    **venv._asdict(),
+                    reclaimable=usage.reclaimable,
+                    size=total_bytes([ usage ]),
+                    stale=is_stale,
+                )
+                for venv, usage, is_stale in zip(venvs, usages, stale)
+            ], sys.stdout, indent=2)
+            print()
+        else:
+            for venv, usage, is_stale in zip(venvs, usages, stale):
+                days = (now - venv.last_used) / 86400
+                marker = ' [current]' if venv.current else ' [stale]' if is_stale else ' [noatime]' if not venv.atime else ''
+                print(f'{human_size(total_bytes([ usage ])):>7} {human_size(usage.reclaimable):>7}  {days:5.0f}d  {venv.version or "?":<8} {venv.path}{marker}')
+            err(f'{len(venvs)} venvs in {len(projects)} projects: {human_size(total_bytes(usages))} (hardlinks counted once)')
+
+        kept = venvs
+        if args.prune:
+            pruned = [ (venv, usage) for venv, usage, is_stale in zip(venvs, usages, stale) if is_stale ]
+            for venv, _ in pruned:
+                err(f'{"Would remove" if args.dry_run else "Removing"} {venv.path}')
+                if not args.dry_run:
+                    shutil.rmtree(venv.path, ignore_errors=True)
+            err(f'{"Would remove" if args.dry_run else "Removed"} {len(pruned)} venvs ({human_size(sum( usage.reclaimable for _, usage in pruned ))} reclaimable)')
+            kept = [ venv for venv, is_stale in zip(venvs, stale) if not is_stale ]
+
+        if args.dedupe:
+            linked, saved = dedupe(kept, executor, args.min_size, args.dry_run)
+            err(f'{"Would link" if args.dry_run else "Linked"} {linked} duplicate files ({human_size(saved)} saved)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.9"
+# dependencies = []
+# ///
+"""Find the nearest `.venv` (with a `bin` dir) at or above a directory, from an in-memory directory index.
+
+`venv-path-init.sh` runs this as a resident coprocess (`VENV_PATH_DAEMON=1`): each prompt whose $PWD changed writes the
+new $PWD on a line, and reads back the venv dir (or an empty line). Per-directory answers are kept in memory, and on
+Linux, invalidated by inotify watches on each indexed directory (and its `.venv`), so warm lookups don't touch the
+filesystem at all; elsewhere, entries are re-validated against directory mtimes. Each reply echoes the queried dir
+(`<dir>\t<venv>`), so a caller whose read timed out can discard the late reply.
+
+One-shot lookups load the index (with each entry's directory mtimes) from a cache file, re-validate the entries they
+use against current mtimes, and write it back if anything changed.
+
+Usage:
+
+    venv_index.py [DIR ...]    # one-shot: print each DIR's venv (or an empty line)
+    venv_index.py -s           # resident: serve lookups on stdin/stdout, until EOF
+
+Environment:
+    VENV_INDEX_CACHE: one-shot index file (default: $XDG_CACHE_HOME/py-helpers/venv-index.json)
+"""
+import ctypes
+import ctypes.util
+import json
+import os
+import struct
+import sys
+from argparse import ArgumentParser
+from os.path import dirname, expanduser, join
+from typing import Optional
+
+CACHE_PATH = os.environ.get('VENV_INDEX_CACHE') or join(
+    os.environ.get('XDG_CACHE_HOME') or expanduser('~/.cache'),
+    'py-helpers',
+    'venv-index.json',
+)
+
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_IGNORED = 0x8000
+IN_ONLYDIR = 0x1000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class Inotify:
+    """Minimal ctypes binding for Linux's inotify (directory watches, drained without blocking)."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.add_watch_fn = libc.inotify_add_watch
+        self.add_watch_fn.argtypes = [ ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32 ]
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+    def add_watch(self, path: str) -> Optional[int]:
+        wd = self.add_watch_fn(self.fd, os.fsencode(path), WATCH_MASK)
+        return wd if wd >= 0 else None
+
+    def read(self) -> list[tuple[int, int, str]]:
+        """Pending `(wd, mask, name)` events."""
+        events = []
+        while True:
+            try:
+                buf = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(buf):
+                wd, mask, _, size = EVENT_HEADER.unpack_from(buf, offset)
+                offset += EVENT_HEADER.size
+                name = buf[offset:offset + size].rstrip(b'\0').decode(errors='surrogateescape')
+                offset += size
+                events.append((wd, mask, name))
+
+
+def ancestors(path: str):
+    """`path` and its parents, up to (not including) `/`, as `venv_path_check` searches them."""
+    path = path.rstrip('/') or '/'
+    while path not in ('/', ''):
+        yield path
+        path = dirname(path)
+
+
+class VenvIndex:
+    """Whether each directory contains a `.venv/bin` dir, cached and invalidated by inotify or directory mtimes."""
+
+    def __init__(self, use_inotify: bool = True):
+        self.inotify = None
+        if use_inotify and sys.platform.startswith('linux'):
+            try:
+                self.inotify = Inotify()
+            except (OSError, AttributeError):
+                self.inotify = None
+        # dir → whether `dir/.venv/bin` is a dir
+        self.has_venv = {}
+        # dir → (dir mtime, `.venv` mtime), when validating by mtimes
+        self.mtimes = {}
+        # inotify watch descriptor → (dir, whether it's the `.venv` inside `dir`)
+        self.watches = {}
+        self.dirty = False
+
+    def load(self, path: str = CACHE_PATH):
+        """Load entries (and their mtimes) saved by `save`; only used when validating by mtimes."""
+        try:
+            with open(path, 'r') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        for entry_dir, (has_venv, mtimes) in entries.items():
+            self.has_venv[entry_dir] = has_venv
+            self.mtimes[entry_dir] = tuple(mtimes)
+
+    def save(self, path: str = CACHE_PATH):
+        if not self.dirty:
+            return
+        entries = {
+            entry_dir: [ has_venv, self.mtimes[entry_dir] ]
+            for entry_dir, has_venv in self.has_venv.items()
+            if entry_dir in self.mtimes
+        }
+        try:
+            os.makedirs(dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            sys.stderr.write(f"Couldn't save venv index to {path}: {e}\n")
+
+    def _check(self, path: str) -> bool:
+        venv = join(path, '.venv')
+        has_venv = os.path.isdir(join(venv, 'bin'))
+        if self.inotify:
+            for watched, is_venv in ((path, False), (venv, True)):
+                wd = self.inotify.add_watch(watched)
+                if wd is not None:
+                    self.watches[wd] = (path, is_venv)
+        else:
+            self.mtimes[path] = self._mtimes(path)
+        return has_venv
+
+    @staticmethod
+    def _mtimes(path: str) -> tuple[Optional[int], Optional[int]]:
+        mtimes = []
+        for p in (path, join(path, '.venv')):
+            try:
+                mtimes.append(os.stat(p).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def sync(self):
+        """Apply pending inotify events (dropping affected directories' entries)."""
+        if not self.inotify:
+            return
+        for wd, mask, name in self.inotify.read():
+            if wd not in self.watches:
+                continue
+            path, is_venv = self.watches[wd]
+            if mask & IN_IGNORED:
+                # Watched dir was removed (or its watch dropped): forget it, so it's re-checked (and re-watched)
+                del self.watches[wd]
+                self.has_venv.pop(path, None)
+            elif (is_venv and name == 'bin') or (not is_venv and name == '.venv') or mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                self.has_venv.pop(path, None)
+
+    def lookup(self, path: str) -> Optional[str]:
+        self.sync()
+        for ancestor in ancestors(path):
+            has_venv = self.has_venv.get(ancestor)
+            if has_venv is not None and not self.inotify and self.mtimes.get(ancestor) != self._mtimes(ancestor):
+                has_venv = None
+            if has_venv is None:
+                has_venv = self.has_venv[ancestor] = self._check(ancestor)
+                self.dirty = True
+            if has_venv:
+                return join(ancestor, '.venv')
+        return None
+
+    def serve(self, stdin=sys.stdin, stdout=sys.stdout):
+        """Answer one lookup per input line, until EOF."""
+        for line in stdin:
+            path = line.rstrip('\n')
+            venv = self.lookup(path) if path else None
+            stdout.write(f'{path}\t{venv or ""}\n')
+            stdout.flush()
+
+
+def main():
+    parser = ArgumentParser(description='Print the nearest .venv (with a bin dir) at or above each directory.')
+    parser.add_argument('-I', '--no-inotify', action='store_true', help='Validate cached entries by directory mtimes, instead of inotify watches')
+    parser.add_argument('-s', '--serve', action='store_true', help='Answer lookups (one directory per line) on stdin, with "<dir>\\t<venv>" lines, until EOF')
+    parser.add_argument('dirs', nargs='*', help='Directories to look up (default: $PWD)')
+    args = parser.parse_args()
+
+    index = VenvIndex(use_inotify=not args.no_inotify and args.serve)
+    if args.serve:
+        try:
+            index.serve()
+        except (BrokenPipeError, KeyboardInterrupt):
+            pass
+        return
+    index.load()
+    for path in args.dirs or [ os.environ.get('PWD') or os.getcwd() ]:
+        print(index.lookup(os.path.abspath(path)) or '')
+    index.save()
+
+
+if __name__ == '__main__':
+    main()
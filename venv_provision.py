@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.9"
+# dependencies = []
+# ///
+"""Create `.venv/X.Y.Z` venvs for several Python versions concurrently, and install the project into each.
+
+Dependencies are resolved once per Python ABI (e.g. `cp312`), not once per venv: with uv, `uv pip compile` pins them
+into a cached requirements file, and each venv installs from it with `--link-mode hardlink`, so package files are
+hardlinked from uv's (shared) cache rather than copied. Without uv, `pip wheel` builds each ABI's wheels once into a
+shared wheel dir, which each venv then installs from. `uv.lock` projects are `uv sync --frozen`ed into each venv.
+
+With `-w/--wheelhouse DIR`, nothing is fetched from an index: resolution and installs only use wheels in DIR (and the
+caches), so a CI runner can bootstrap a test matrix offline.
+
+Project detection matches `venv_create` (in venv-helpers.sh): `uv.lock` → `uv sync`, `pyproject.toml` → `-e .`,
+`requirements.txt` → `-r requirements.txt`.
+
+Environment:
+    VENV_PROVISION_CACHE: dir for pinned requirements and pip-built wheels (default: $XDG_CACHE_HOME/py-helpers/venv-provision)
+    VENV_PROVISION_TTL: seconds before dependencies resolved from an index are re-resolved, picking up new releases
+        (default: 86400); resolutions from a wheelhouse are keyed by its contents, and never expire
+"""
+import os
+import shutil
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from hashlib import sha256
+from os.path import exists, expanduser, isdir, join
+from typing import NamedTuple, Optional
+
+from py_interpreters import Interpreter, resolve_all
+
+CACHE_DIR = os.environ.get('VENV_PROVISION_CACHE') or join(
+    os.environ.get('XDG_CACHE_HOME') or expanduser('~/.cache'),
+    'py-helpers',
+    'venv-provision',
+)
+RESOLVE_TTL = float(os.environ.get('VENV_PROVISION_TTL') or 24 * 60 * 60)
+
+UV_LOCK = 'uv.lock'
+PYPROJECT = 'pyproject.toml'
+REQUIREMENTS = 'requirements.txt'
+
+# Same wrapper `venv_create` writes into uv venvs (which don't ship pip)
+PIP_WRAPPER = '''#!/bin/bash
+# Wrapper for uv pip to handle common pip commands
+# Get the directory where this script lives (the venv's bin directory)
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
+VENV_DIR="$(dirname "$SCRIPT_DIR")"
+
+if [[ "$1" == "--version" ]] || [[ "$1" == "-V" ]]; then
+    echo "pip (uv wrapper)"
+    uv --version
+else
+    # Pass the command with --python flag in the right place
+    # uv pip COMMAND --python PATH args...
+    if [[ -n "$1" ]]; then
+        COMMAND="$1"
+        shift
+        exec uv pip "$COMMAND" --python "$VENV_DIR/bin/python" "$@"
+    else
+        exec uv pip "$@"
+    fi
+fi
+'''
+
+err = partial(print, file=sys.stderr)
+
+
+class ProvisionError(Exception):
+    pass
+
+
+class Result(NamedTuple):
+    version: str
+    venv: str
+    created: bool
+    seconds: float
+    error: Optional[str] = None
+
+
+def run(cmd: list[str], **kwargs):
+    """Run a command, raising `ProvisionError` with its output if it fails."""
+    proc = subprocess.run(cmd, capture_output=True, text=True, **kwargs)
+    if proc.returncode:
+        output = (proc.stderr or proc.stdout).strip()
+        raise ProvisionError(f"`{' '.join(cmd)}` failed ({proc.returncode}):\n{output}")
+    return proc
+
+
+def abi(interpreter: Interpreter) -> str:
+    """`cp312`, `pp310`, …: interpreters sharing this can share resolved dependencies and built wheels."""
+    major, minor = interpreter.version.split('.')[:2]
+    prefix = { 'cpython': 'cp', 'pypy': 'pp' }.get(interpreter.implementation, interpreter.implementation)
+    return f'{prefix}{major}{minor}'
+
+
+def project_kind(project: str) -> Optional[str]:
+    for name in (UV_LOCK, PYPROJECT, REQUIREMENTS):
+        if exists(join(project, name)):
+            return name
+    return None
+
+
+def inputs_digest(project: str, kind: str, wheelhouse: Optional[str]) -> str:
+    """Digest of what a resolution depends on: the project's requirement files, and the wheelhouse's contents."""
+    h = sha256()
+    for name in (PYPROJECT, REQUIREMENTS) if kind == PYPROJECT else (kind,):
+        path = join(project, name)
+        if exists(path):
+            with open(path, 'rb') as f:
+                h.update(name.encode() + b'\0' + f.read() + b'\0')
+    if wheelhouse:
+        for entry in sorted(os.scandir(wheelhouse), key=lambda entry: entry.name):
+            h.update(f'{entry.name}\0{entry.stat().st_size}\0'.encode())
+    return h.hexdigest()[:16]
+
+
+class Provisioner:
+    """Creates and populates venvs, sharing per-ABI dependency resolution between them."""
+
+    def __init__(
+        self,
+        project: str = '.',
+        venvs_dir: str = '.venv',
+        wheelhouse: Optional[str] = None,
+        cache_dir: str = CACHE_DIR,
+        use_uv: Optional[bool] = None,
+        install: bool = True,
+    ):
+        self.project = project
+        self.venvs_dir = venvs_dir
+        self.wheelhouse = os.path.abspath(wheelhouse) if wheelhouse else None
+        self.cache_dir = cache_dir
+        self.uv = shutil.which('uv') if use_uv is not False else None
+        if use_uv and not self.uv:
+            raise ProvisionError("uv not found")
+        self.kind = project_kind(project) if install else None
+        self.digest = inputs_digest(project, self.kind, self.wheelhouse) if self.kind and self.kind != UV_LOCK else None
+
+    @property
+    def index_args(self) -> list[str]:
+        if not self.wheelhouse:
+            return []
+        args = [ '--no-index', '--find-links', self.wheelhouse ]
+        return [ '--offline', *args ] if self.uv else args
+
+    def fresh(self, path: str) -> bool:
+        """Whether a cached resolution exists and is current: the inputs digest can't see new releases on an index, so
+        those expire after `RESOLVE_TTL`."""
+        if not exists(path):
+            return False
+        return bool(self.wheelhouse) or time.time() - os.stat(path).st_mtime < RESOLVE_TTL
+
+    def resolve(self, interpreter: Interpreter) -> str:
+        """Resolve the project's dependencies for an interpreter's ABI; returns a pins file (uv) or wheel dir (pip)."""
+        key = f'{abi(interpreter)}-{self.digest}'
+        inputs = join(self.project, self.kind)
+        if self.uv:
+            pins = join(self.cache_dir, 'resolved', f'{key}.txt')
+            if not self.fresh(pins):
+                os.makedirs(join(self.cache_dir, 'resolved'), exist_ok=True)
+                tmp = f'{pins}.{os.getpid()}.tmp'
+                run([ self.uv, 'pip', 'compile', inputs, '--python', interpreter.path, '--quiet', '-o', tmp, *self.index_args ])
+                os.replace(tmp, pins)
+            return pins
+        wheels = join(self.cache_dir, 'wheels', key)
+        if not self.fresh(join(wheels, '.complete')):
+            os.makedirs(wheels, exist_ok=True)
+            reqs = [ '-r', inputs ] if self.kind == REQUIREMENTS else [ self.project ]
+            run([ interpreter.path, '-m', 'pip', 'wheel', '--quiet', '-w', wheels, '--find-links', wheels, *self.index_args, *reqs ])
+            open(join(wheels, '.complete'), 'w').close()
+        return wheels
+
+    def create(self, interpreter: Interpreter, venv: str):
+        if self.uv:
+            run([ self.uv, 'venv', venv, '--python', interpreter.path, '--quiet', *(['--offline'] if self.wheelhouse else []) ])
+            pip = join(venv, 'bin', 'pip')
+            if not exists(pip):
+                with open(pip, 'w') as f:
+                    f.write(PIP_WRAPPER)
+                os.chmod(pip, 0o755)
+        else:
+            run([ interpreter.path, '-m', 'venv', venv ])
+
+    def install(self, venv: str, resolved: Optional[str]):
+        python = join(venv, 'bin', 'python')
+        if self.kind == UV_LOCK:
+            run(
+                [ self.uv, 'sync', '--frozen', '--quiet', '--link-mode', 'hardlink', *self.index_args ],
+                cwd=self.project,
+                env={ **os.environ, 'UV_PROJECT_ENVIRONMENT': os.path.abspath(venv) },
+            )
+        elif self.uv:
+            uv_pip = [ self.uv, 'pip', 'install', '--quiet', '--python', python, '--link-mode', 'hardlink', *self.index_args ]
+            run([ *uv_pip, '-r', resolved ])
+            if self.kind == PYPROJECT:
+                run([ *uv_pip, '--no-deps', '-e', self.project ])
+        else:
+            pip = [ python, '-m', 'pip', 'install', '--quiet', '--find-links', resolved, *self.index_args ]
+            if self.kind == REQUIREMENTS:
+                # Every requirement was built into `resolved`, so the index isn't needed
+                run([ *pip, '--no-index', '-r', join(self.project, REQUIREMENTS) ])
+            else:
+                run([ *pip, '-e', self.project ])
+
+    def provision(self, interpreters: list[Interpreter], jobs: Optional[int] = None) -> list[Result]:
+        """Create (and populate) a venv per interpreter, concurrently; existing venvs are left as-is."""
+        os.makedirs(self.venvs_dir, exist_ok=True)
+        needs_resolution = self.kind in (PYPROJECT, REQUIREMENTS)
+        if self.kind == UV_LOCK and not self.uv:
+            err(f"{UV_LOCK} found but uv isn't installed; creating venvs without syncing them")
+            self.kind = None
+        with ThreadPoolExecutor(jobs or max(len(interpreters), 1) * 2) as executor:
+            # One resolution per ABI, started immediately, and shared by that ABI's venvs
+            resolutions = {}
+            if needs_resolution:
+                for interpreter in interpreters:
+                    key = abi(interpreter)
+                    if key not in resolutions and not isdir(join(self.venvs_dir, interpreter.version)):
+                        resolutions[key] = executor.submit(self.resolve, interpreter)
+
+            def provision_one(interpreter: Interpreter) -> Result:
+                venv = join(self.venvs_dir, interpreter.version)
+                start = time.monotonic()
+                if isdir(venv):
+                    return Result(interpreter.version, venv, created=False, seconds=0.)
+                try:
+                    self.create(interpreter, venv)
+                    if self.kind:
+                        resolution = resolutions.get(abi(interpreter))
+                        self.install(venv, resolution.result() if resolution else None)
+                except ProvisionError as e:
+                    # Don't leave a half-populated venv behind, which later runs would skip as "existing"
+                    shutil.rmtree(venv, ignore_errors=True)
+                    return Result(interpreter.version, venv, created=False, seconds=time.monotonic() - start, error=str(e))
+                return Result(interpreter.version, venv, created=True, seconds=time.monotonic() - start)
+
+            return list(executor.map(provision_one, interpreters))
+
+
+def main():
+    parser = ArgumentParser(description='Create .venv/X.Y.Z venvs for several Python versions concurrently, sharing dependency resolution and package files between them.')
+    parser.add_argument('-C', '--project', default='.', help='Project directory (default: .)')
+    parser.add_argument('-d', '--venvs-dir', help='Directory to create versioned venvs in (default: <project>/.venv)')
+    parser.add_argument('-j', '--jobs', type=int, help='Max concurrent commands (default: 2 per version)')
+    parser.add_argument('-N', '--no-install', action='store_true', help="Only create the venvs; don't install the project or its dependencies")
+    parser.add_argument('-P', '--pip', action='store_true', help="Use venv/pip even if uv is available")
+    parser.add_argument('-w', '--wheelhouse', help="Install offline, from wheels in this directory (and local caches) only")
+    parser.add_argument('specs', nargs='*', default=['3.13'], help='Python version specs (default: 3.13)')
+    args = parser.parse_args()
+
+    if args.wheelhouse and not isdir(args.wheelhouse):
+        parser.error(f"Wheelhouse {args.wheelhouse} is not a directory")
+    interpreters = resolve_all(args.specs)
+    missing = [ spec for spec, interpreter in zip(args.specs, interpreters) if interpreter is None ]
+    if missing:
+        err(f"No installed interpreter matches: {' '.join(missing)}")
+        sys.exit(1)
+    interpreters = list({ interpreter.version: interpreter for interpreter in interpreters }.values())
+
+    try:
+        provisioner = Provisioner(
+            project=args.project,
+            venvs_dir=args.venvs_dir or join(args.project, '.venv'),
+            wheelhouse=args.wheelhouse,
+            use_uv=False if args.pip else None,
+            install=not args.no_install,
+        )
+    except ProvisionError as e:
+        err(str(e))
+        sys.exit(1)
+    start = time.monotonic()
+    results = provisioner.provision(interpreters, jobs=args.jobs)
+    failed = False
+    for result in results:
+        if result.error:
+            failed = True
+            err(f"Error provisioning {result.venv} ({result.seconds:.1f}s): {result.error}")
+        elif result.created:
+            err(f"Created {result.venv} ({result.seconds:.1f}s)")
+        else:
+            err(f"Venv {result.venv} already exists")
+        # Versions on stdout, for callers (e.g. `venv_init`) to pick the current one from
+        if not result.error:
+            print(result.version)
+    err(f"Provisioned {len(results)} venv(s) in {time.monotonic() - start:.1f}s")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()